@@ -1,4 +1,5 @@
 import numpy as np
+from config import EXERCISE_ANGLES, MIN_SIDE_VISIBILITY
 
 def angle_abc(a, b, c, eps=1e-6):
     a, b, c = np.array(a), np.array(b), np.array(c)
@@ -7,16 +8,166 @@ def angle_abc(a, b, c, eps=1e-6):
     cos_val = np.clip(np.dot(ba, bc) / ((np.linalg.norm(ba)*np.linalg.norm(bc))+eps), -1, 1)
     return np.degrees(np.arccos(cos_val))
 
+def _rowdot(u, v):
+    # (...,2)·(...,2) → (...). np.dot과 같은 BLAS 경로(matmul)를 써서 스칼라 버전과 결과를 맞춘다
+    return (u[..., None, :] @ v[..., :, None])[..., 0, 0]
+
+def angle_abc_batch(a, b, c, eps=1e-6):
+    """angle_abc의 배치 버전: a, b, c는 (..., 2) 배열, 결과는 (...) 각도(도)"""
+    ba = a - b
+    bc = c - b
+    norm = np.sqrt(_rowdot(ba, ba)) * np.sqrt(_rowdot(bc, bc))
+    cos_val = np.clip(_rowdot(ba, bc) / (norm + eps), -1, 1)
+    return np.degrees(np.arccos(cos_val))
+
 RIGHT = {'hip': 24, 'knee': 26, 'ankle': 28, 'shoulder': 12, 'ear': 8}
 LEFT = {'hip': 23, 'knee': 25, 'ankle': 27, 'shoulder': 11, 'ear': 7}
+ANGLE_NAMES = ('knee', 'hip', 'torso_tilt')  # extract_angles_batch 결과 열 순서
+
+# 관절 각도 카탈로그 (MediaPipe Pose 랜드마크 인덱스)
+#   'abc'  : a-b-c 세 점에서 b를 꼭짓점으로 하는 각도
+#   'tilt' : a(위)-b(아래) 선분이 수평선과 이루는 각도 (0~90°)
+#   'rot'  : a-b 선분과 c-d 선분 사이 각도 (어깨선 vs 골반선 → 몸통 회전)
+JOINT_ANGLES = {
+    'r_elbow':        ('abc',  (12, 14, 16)),   # 어깨-팔꿈치-손목
+    'l_elbow':        ('abc',  (11, 13, 15)),
+    'r_shoulder':     ('abc',  (24, 12, 14)),   # 골반-어깨-팔꿈치
+    'l_shoulder':     ('abc',  (23, 11, 13)),
+    'r_hip':          ('abc',  (12, 24, 26)),   # 어깨-골반-무릎
+    'l_hip':          ('abc',  (11, 23, 25)),
+    'r_knee':         ('abc',  (24, 26, 28)),   # 골반-무릎-발목
+    'l_knee':         ('abc',  (23, 25, 27)),
+    'r_ankle':        ('abc',  (26, 28, 32)),   # 무릎-발목-발끝
+    'l_ankle':        ('abc',  (25, 27, 31)),
+    'r_torso_tilt':   ('tilt', (12, 24)),       # 어깨-골반
+    'l_torso_tilt':   ('tilt', (11, 23)),
+    'trunk_rotation': ('rot',  (11, 12, 23, 24)),
+}
+SIDE_PREFIX = {'right': 'r_', 'left': 'l_'}
+
+def _pixel_scale(n, w, h):
+    """w, h (스칼라 또는 프레임별 (N,))를 (N,1,2) 배율로 변환"""
+    w = np.broadcast_to(np.asarray(w, dtype=float), (n,))
+    h = np.broadcast_to(np.asarray(h, dtype=float), (n,))
+    return np.stack([w, h], axis=-1)[:, None, :]
+
+class AnglePlan:
+    """계산할 각도 목록을 인덱스 배열로 미리 컴파일 (필요한 랜드마크만 한 번에 gather)"""
+    def __init__(self, names):
+        self.names = tuple(names)
+        unknown = [n for n in self.names if n not in JOINT_ANGLES]
+        if unknown:
+            raise KeyError(f"Unknown angle(s): {unknown}")
+        landmarks = sorted({i for n in self.names for i in JOINT_ANGLES[n][1]})
+        self.landmarks = np.array(landmarks, dtype=np.intp)
+        pos = {lm: k for k, lm in enumerate(landmarks)}  # 원래 인덱스 → gather 후 위치
+
+        self.groups = {}
+        for kind in ('abc', 'tilt', 'rot'):
+            cols = [c for c, n in enumerate(self.names) if JOINT_ANGLES[n][0] == kind]
+            if cols:
+                pts = np.array([[pos[i] for i in JOINT_ANGLES[self.names[c]][1]] for c in cols], dtype=np.intp)
+                self.groups[kind] = (np.array(cols, dtype=np.intp), pts)
+
+    def compute(self, kpts_seq, w=1, h=1):
+        """(N, 33, 3) 키포인트 → (N, len(names)) 각도"""
+        kpts_seq = np.asarray(kpts_seq, dtype=float)
+        pts = kpts_seq[:, self.landmarks, :2] * _pixel_scale(len(kpts_seq), w, h)
+        out = np.empty((len(kpts_seq), len(self.names)))
+        if 'abc' in self.groups:
+            cols, p = self.groups['abc']
+            out[:, cols] = angle_abc_batch(pts[:, p[:, 0]], pts[:, p[:, 1]], pts[:, p[:, 2]])
+        if 'tilt' in self.groups:
+            cols, p = self.groups['tilt']
+            top, bottom = pts[:, p[:, 0]], pts[:, p[:, 1]]
+            out[:, cols] = np.degrees(np.arctan2(np.abs(bottom[..., 1]-top[..., 1]), np.abs(bottom[..., 0]-top[..., 0])+1e-6))
+        if 'rot' in self.groups:
+            cols, p = self.groups['rot']
+            out[:, cols] = angle_abc_batch(pts[:, p[:, 1]] - pts[:, p[:, 0]], 0.0, pts[:, p[:, 3]] - pts[:, p[:, 2]])
+        return out
+
+_PLANS = {}
+
+def angle_plan(names):
+    """같은 각도 목록에 대한 AnglePlan은 재사용"""
+    key = tuple(names)
+    plan = _PLANS.get(key)
+    if plan is None:
+        plan = _PLANS[key] = AnglePlan(key)
+    return plan
+
+def compute_angles(kpts_seq, names, w=1, h=1):
+    """카탈로그에서 고른 각도들을 (N, len(names)) 배열로 계산"""
+    return angle_plan(names).compute(kpts_seq, w, h)
+
+def exercise_angles(kpts_seq, exercise, w=1, h=1):
+    """config.EXERCISE_ANGLES에 선언된 운동별 각도만 계산 → (names, (N, k) 배열)"""
+    names = EXERCISE_ANGLES[exercise]
+    return tuple(names), compute_angles(kpts_seq, names, w, h)
+
+def extract_angles_batch(kpts_seq, side='right', w=1, h=1):
+    """
+    키포인트 시퀀스 전체의 각도를 한 번에 계산
+
+    Args:
+        kpts_seq: (N, 33, 3) 정규화 키포인트 (x, y, visibility)
+        side: 'right' 또는 'left'
+        w, h: 이미지 크기 (스칼라 또는 프레임별 (N,) 배열)
+
+    Returns:
+        (N, 3) 배열, 열 순서는 ANGLE_NAMES (knee, hip, torso_tilt)
+    """
+    prefix = SIDE_PREFIX.get(side, 'l_')
+    return compute_angles(kpts_seq, [prefix + n for n in ANGLE_NAMES], w, h)
 
 def extract_angles(kpts, side='right', w=1, h=1):
-    idx = RIGHT if side == 'right' else LEFT
-    def xy(i): return np.array([kpts[i,0]*w, kpts[i,1]*h])
-    hip, knee, ankle = xy(idx['hip']), xy(idx['knee']), xy(idx['ankle'])
-    shoulder, ear = xy(idx['shoulder']), xy(idx['ear'])
-
-    knee_angle = angle_abc(hip, knee, ankle)
-    hip_angle = angle_abc(shoulder, hip, knee)
-    torso_tilt = np.degrees(np.arctan2(abs(hip[1]-shoulder[1]), abs(hip[0]-shoulder[0])+1e-6))
-    return {'knee': float(knee_angle), 'hip': float(hip_angle), 'torso_tilt': float(torso_tilt)}
+    row = extract_angles_batch(np.asarray(kpts, dtype=float)[None], side=side, w=w, h=h)[0]
+    return {name: float(v) for name, v in zip(ANGLE_NAMES, row)}
+
+# 좌우 선택 시 가시성(visibility)을 볼 랜드마크: 어깨, 골반, 무릎, 발목
+SIDE_VIS_LANDMARKS = {'right': [12, 24, 26, 28], 'left': [11, 23, 25, 27]}
+_BILATERAL = [p + n for p in ('r_', 'l_') for n in ANGLE_NAMES]
+
+def extract_angles_bilateral(kpts_seq, w=1, h=1, mode='pick', min_vis=MIN_SIDE_VISIBILITY):
+    """
+    양쪽 각도를 한 번에 계산하고 프레임마다 가시성에 따라 좌/우를 고르거나 섞음
+
+    Args:
+        kpts_seq: (N, 33, 3) 정규화 키포인트 (x, y, visibility)
+        w, h: 이미지 크기 (스칼라 또는 프레임별 (N,) 배열)
+        mode: 'pick' (더 잘 보이는 쪽 사용) 또는 'blend' (가시성 가중 평균)
+        min_vis: 이 값보다 잘 보이는 쪽이 없으면 신뢰도 낮은 프레임으로 표시
+
+    Returns:
+        (angles, side, vis, confident)
+        angles: (N, 3) 배열 (ANGLE_NAMES 순서)
+        side: (N,) 0=right, 1=left (blend 모드에서는 가중치가 더 큰 쪽)
+        vis: (N,) 선택된 쪽 가시성 (해당 쪽 랜드마크 중 최솟값)
+        confident: (N,) bool, False인 프레임은 카운터/모델/DB 저장을 건너뛰면 됨
+    """
+    kpts_seq = np.asarray(kpts_seq, dtype=float)
+    both = compute_angles(kpts_seq, _BILATERAL, w, h)
+    right, left = both[:, :3], both[:, 3:]
+    vis_r = kpts_seq[:, SIDE_VIS_LANDMARKS['right'], 2].min(axis=1)
+    vis_l = kpts_seq[:, SIDE_VIS_LANDMARKS['left'], 2].min(axis=1)
+
+    side = (vis_l > vis_r).astype(np.int8)
+    vis = np.maximum(vis_r, vis_l)
+    if mode == 'blend':
+        wr, wl = vis_r[:, None], vis_l[:, None]
+        angles = (wr * right + wl * left) / (wr + wl + 1e-6)
+    else:
+        angles = np.where(side[:, None] == 1, left, right)
+    return angles, side, vis, vis >= min_vis
+
+def extract_angles_auto(kpts, w=1, h=1, mode='pick', min_vis=MIN_SIDE_VISIBILITY):
+    """
+    단일 프레임용: 가시성 기반 좌/우 자동 선택
+
+    Returns:
+        (angles dict, side ('right'/'left'), confident bool)
+    """
+    angles, side, _, confident = extract_angles_bilateral(
+        np.asarray(kpts, dtype=float)[None], w, h, mode=mode, min_vis=min_vis)
+    ang = {name: float(v) for name, v in zip(ANGLE_NAMES, angles[0])}
+    return ang, ('left' if side[0] else 'right'), bool(confident[0])
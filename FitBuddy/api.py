@@ -4,6 +4,7 @@
 from fastapi import FastAPI, Depends, HTTPException, status
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import PlainTextResponse
 from sqlalchemy.orm import Session
 from pydantic import BaseModel, EmailStr
 from typing import Optional, List
@@ -12,6 +13,7 @@ from datetime import datetime
 from .database import SessionLocal, get_db
 from .models import User, Workout, WorkoutFrame
 from .user_manager import hash_password, verify_user as verify_user_func
+from .timing import METRICS
 
 app = FastAPI(title="FitBuddy API", version="1.0.0")
 
@@ -178,6 +180,11 @@ def create_workout(
     db.refresh(workout)
     return workout
 
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """단계별 처리 시간 (Prometheus text format)"""
+    return METRICS.render_prometheus()
+
 @app.get("/")
 def root():
     """API 상태 확인"""
@@ -5,7 +5,6 @@ import os
 import sys
 import numpy as np
 from PIL import Image, ImageDraw, ImageFont
-import json
 from pathlib import Path
 
 # FitBuddy 디렉토리를 sys.path에 추가 (직접 실행 시)
@@ -17,20 +16,28 @@ if __name__ == "__main__":
 # 상대 import와 절대 import 모두 지원
 try:
     from .pose_detector import PoseDetector
-    from .angles import extract_angles
-    from .utils import EMA, RingBuffer
+    from .angles import extract_angles_auto, JOINT_ANGLES
+    from .utils import FilterBank
+    from .timing import METRICS
+    from .frame_source import open_source
     from .database import SessionLocal
     from .models import Workout, WorkoutFrame
+    from .frame_ingest import FrameIngestor, frame_row
+    from .config import FRAME_SAVE_INTERVAL
 except ImportError:
     # 직접 실행할 때를 위한 절대 import
-from pose_detector import PoseDetector
-from angles import extract_angles
-from utils import EMA, RingBuffer
+    from pose_detector import PoseDetector
+    from angles import extract_angles_auto, JOINT_ANGLES
+    from utils import FilterBank
+    from timing import METRICS
+    from frame_source import open_source
     from database import SessionLocal
     from models import Workout, WorkoutFrame
+    from frame_ingest import FrameIngestor, frame_row
+    from config import FRAME_SAVE_INTERVAL
 
 # --- PostgreSQL DB 관련 라이브러리 및 설정 (SQLAlchemy ORM 사용) ---
-from geoalchemy2 import WKTElement
+from sqlalchemy import insert
 from sqlalchemy.orm import Session
 
 def start_new_workout_session(user_id, workout_type):
@@ -64,7 +71,7 @@ def update_workout_session_end_time(workout_id, duration_seconds, distance_km):
             workout.duration_seconds = duration_seconds
             workout.distance_km = distance_km
             db.commit()
-        print(f"운동 세션 {workout_id} 종료 시간 및 요약 정보 업데이트 완료.")
+            print(f"운동 세션 {workout_id} 종료 시간 및 요약 정보 업데이트 완료.")
         else:
             print(f"운동 세션 {workout_id}를 찾을 수 없습니다.")
     except Exception as error:
@@ -75,29 +82,13 @@ def update_workout_session_end_time(workout_id, duration_seconds, distance_km):
 
 def save_frame_data(workout_id, frame_number, knee_angle, hip_angle, torso_tilt_angle, kpts_data, main_joint_loc):
     """
-    단일 프레임의 상세 데이터를 workout_frames 테이블에 저장하는 함수
+    단일 프레임의 상세 데이터를 workout_frames 테이블에 바로 저장하는 함수
+    (연속 기록은 FrameIngestor.put_frame 사용 - 프레임마다 세션/commit 하지 않음)
     """
     db: Session = SessionLocal()
     try:
-        # 키포인트 데이터를 JSON 문자열로 변환 (NumPy 배열은 직접 JSON 직렬화 불가)
-        kpts_json_str = json.dumps(kpts_data.tolist()) if kpts_data is not None else None
-
-        # main_joint_loc (핵심 관절 위치)를 PostGIS POINT로 변환
-        point_geom = None
-        if main_joint_loc:
-            # 픽셀 좌표를 PostGIS Point로 변환 (SRID 4326은 위경도용이지만, 여기서는 픽셀 좌표이므로 0 사용)
-            point_geom = WKTElement(f"POINT({main_joint_loc[0]:.6f} {main_joint_loc[1]:.6f})", srid=0)
-
-        frame = WorkoutFrame(
-            workout_id=workout_id,
-            frame_number=frame_number,
-            knee_angle=knee_angle,
-            hip_angle=hip_angle,
-            torso_tilt_angle=torso_tilt_angle,
-            keypoints_json=kpts_json_str,
-            main_joint_location=point_geom
-        )
-        db.add(frame)
+        row = frame_row(workout_id, frame_number, knee_angle, hip_angle, torso_tilt_angle, kpts_data, main_joint_loc)
+        db.execute(insert(WorkoutFrame.__table__), [row])
         db.commit()
     except Exception as error:
         print(f"프레임 데이터 저장 실패: {error}")
@@ -105,9 +96,19 @@ def save_frame_data(workout_id, frame_number, knee_angle, hip_angle, torso_tilt_
     finally:
         db.close()
 
+def flush_frames(ingestor):
+    """기록 중인 프레임을 모두 DB에 씀 (쓰기 스레드 오류는 출력만 하고 세션 종료는 계속 진행)"""
+    if ingestor is None:
+        return
+    try:
+        ingestor.flush()
+    except Exception as error:
+        print(f"프레임 데이터 flush 실패: {error}")
+
 # 특정 관절 인덱스 (MediaPipe Pose)
 R_HIP, R_KNEE, R_ANKLE = 24, 26, 28
 R_SHOULDER = 12
+SIDE_HIP = {'right': 24, 'left': 23}
 
 def px(pt, w, h):
     """정규화 좌표를 픽셀 좌표로 변환"""
@@ -157,7 +158,13 @@ def draw_angle_line(frame, kpts, idx_a, idx_b, idx_c, color=(0, 200, 255), label
         cv2.putText(frame, label, (B[0] + 8, B[1] - 8), 
                    cv2.FONT_HERSHEY_SIMPLEX, 0.6, color, 2)
 
-def main():
+def main(source="camera", headless=False, record=False):
+    """
+    Args:
+        source: 프레임 소스 (camera[:N] / 동영상 / 이미지 폴더 / 관절 좌표 CSV / synthetic[:N])
+        headless: True면 화면 없이 최대 속도로 처리하고 처리량만 출력
+        record: True면 시작하자마자 운동 세션을 열어 DB에 기록 (headless에서는 S 키를 쓸 수 없음)
+    """
     current_user_id = 1
     workout_type = "squat"
     
@@ -165,102 +172,127 @@ def main():
     workout_start_real_time = None
     frame_counter = 0
 
-    # --- 데이터 저장 간격 (1.0초) 및 마지막 저장 시간 ---
-    SAVE_INTERVAL_SECONDS = 1.0 
+    # --- 데이터 저장 간격 (config.FRAME_SAVE_INTERVAL초, 0이면 모든 프레임) 및 마지막 저장 시간 ---
+    SAVE_INTERVAL_SECONDS = FRAME_SAVE_INTERVAL
     last_save_time = time.time() 
+    # 프레임 DB 기록은 백그라운드 일괄 INSERT (처음 저장할 때 생성)
+    ingestor = None
 
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open camera")
+    try:
+        src = open_source(source)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
         return
-    pose = PoseDetector(model_complexity=1)
-    ema = EMA(alpha=0.25)
-    rb = RingBuffer(size=5)
+    pose = PoseDetector(model_complexity=1) if src.has_images else None
+    # knee/hip/tilt 세 각도를 한 번에 스무딩 (EMA → 5프레임 평균)
+    smoother = FilterBank(3, method='ema_window', alpha=0.25, window=5)
     
-    show_skeleton = True
-    show_angle_lines = True
+    show_skeleton = not headless
+    show_angle_lines = not headless
+
+    if record:
+        active_workout_id = start_new_workout_session(current_user_id, workout_type)
+        if active_workout_id:
+            workout_start_real_time = time.time()
     
+    t_start = time.perf_counter()
+    n_frames = 0
     try:
         while True:
-            ok, frame = cap.read()
-            if not ok:
+            with METRICS.time("capture"):
+                src_frame = src.read()
+            if src_frame is None:
                 break
-            h, w = frame.shape[:2]
+            n_frames += 1
+            h, w = src_frame.h, src_frame.w
+            frame = src_frame.image
+            if frame is None and not headless:
+                frame = src_frame.display_image()
             
-            lms = pose.process(frame)
-            kpts_norm = None
+            kpts_norm = src_frame.kpts
+            lms = kpts_norm
+            if src_frame.image is not None:
+                with METRICS.time("pose_process"):
+                    lms = pose.process(frame)
+            confident = False
             knee, hip, tilt = 0.0, 0.0, 0.0
 
             if lms is not None:
-                kpts_norm = pose.to_numpy()
+                if src_frame.image is not None:
+                    with METRICS.time("to_numpy"):
+                        kpts_norm = pose.to_numpy()
                 if kpts_norm is not None:
-                    ang = extract_angles(kpts_norm, side='right', w=w, h=h)
-                    
-                    knee_s = ema(ang['knee'])
-                    rb.push(knee_s)
-                    knee = rb.mean()
+                    # 가시성이 더 좋은 쪽(좌/우)을 자동 선택, 둘 다 가려지면 confident=False
+                    with METRICS.time("extract_angles"):
+                        ang, side, confident = extract_angles_auto(kpts_norm, w=w, h=h)
+                if kpts_norm is not None and confident:
+                    p = 'r_' if side == 'right' else 'l_'
                     
-                    if np.isnan(knee): knee = knee_s
-                    
-                    hip = ang['hip']
-                    tilt = ang['torso_tilt']
+                    knee, hip, tilt = smoother([ang['knee'], ang['hip'], ang['torso_tilt']]).tolist()
                     
                     # 시각화
-                    if show_skeleton:
+                    if show_skeleton and pose is not None:
                         pose.draw_landmarks(frame)
                     
                     if show_angle_lines:
-                        draw_angle_line(frame, kpts_norm, R_HIP, R_KNEE, R_ANKLE, 
+                        draw_angle_line(frame, kpts_norm, *JOINT_ANGLES[p + 'knee'][1], 
                                       (0, 200, 255), f"knee {knee:.0f}°")
-                        draw_angle_line(frame, kpts_norm, R_SHOULDER, R_HIP, R_KNEE, 
+                        draw_angle_line(frame, kpts_norm, *JOINT_ANGLES[p + 'hip'][1], 
                                       (255, 200, 0), f"hip {hip:.0f}°")
                     
-                    cv2.putText(frame, f"knee:{knee:.1f} hip:{hip:.1f} tilt:{tilt:.1f}", 
-                               (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
+                    if not headless:
+                        cv2.putText(frame, f"knee:{knee:.1f} hip:{hip:.1f} tilt:{tilt:.1f}", 
+                                   (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                 else:
-                    if show_skeleton:
+                    if show_skeleton and pose is not None:
                         pose.draw_landmarks(frame)
             
-            # --- 운동 세션 활성화 시 '일정 간격'으로 데이터 DB 저장 ---
-            if active_workout_id is not None:
+            # --- 운동 세션 활성화 시 '일정 간격'으로 데이터 DB 저장 (신뢰도 낮은 프레임은 건너뜀) ---
+            if active_workout_id is not None and confident:
                 current_real_time = time.time()
                 
-                # 1.0초 간격이 지났을 때만 데이터 저장
+                # 저장 간격이 지났을 때만 데이터 저장 (큐에 넣기만 하고 INSERT는 쓰기 스레드에서)
                 if (current_real_time - last_save_time) >= SAVE_INTERVAL_SECONDS:
                     frame_counter += 1
                     
-                    main_joint_pixel_loc = None
-                    if kpts_norm is not None:
-                        main_joint_pixel_loc = px(kpts_norm[R_HIP], w, h)
+                    main_joint_pixel_loc = px(kpts_norm[SIDE_HIP[side]], w, h)
                     
-                    save_frame_data(
-                        workout_id=active_workout_id,
-                        frame_number=frame_counter,
-                        knee_angle=round(knee, 1),
-                        hip_angle=round(hip, 1),
-                        torso_tilt_angle=round(tilt, 1),
-                        kpts_data=kpts_norm,
-                        main_joint_loc=main_joint_pixel_loc
-                    )
+                    if ingestor is None:
+                        ingestor = FrameIngestor()
+                    with METRICS.time("db_save"):
+                        ingestor.put_frame(
+                            workout_id=active_workout_id,
+                            frame_number=frame_counter,
+                            knee_angle=round(knee, 1),
+                            hip_angle=round(hip, 1),
+                            torso_tilt_angle=round(tilt, 1),
+                            kpts_data=kpts_norm,
+                            main_joint_loc=main_joint_pixel_loc
+                        )
                     last_save_time = current_real_time # 마지막 저장 시간 업데이트
             
+            if headless:
+                continue
+
             # 하단 안내 메시지
             status_text = "준비 완료 (S 키로 시작)"
             if active_workout_id is not None:
                 elapsed_time = int(time.time() - workout_start_real_time)
                 status_text = f"기록 중 (ID: {active_workout_id}, 샘플: {frame_counter}, 시간: {elapsed_time}s)"
             
-            frame = put_korean_text(frame, f"[V] 스켈레톤 [A] 각도선 [S] 시작/종료 [Q] 종료 | {status_text}", 
-                                    (20, h - 30), font_size=20, color=(180, 180, 180))
-            
-            cv2.imshow('FitBuddy - Squat', frame)
-            key = cv2.waitKey(1) & 0xFF
+            with METRICS.time("render"):
+                frame = put_korean_text(frame, f"[V] 스켈레톤 [A] 각도선 [S] 시작/종료 [Q] 종료 | {status_text}", 
+                                        (20, h - 30), font_size=20, color=(180, 180, 180))
+                
+                cv2.imshow('FitBuddy - Squat', frame)
+                key = cv2.waitKey(1) & 0xFF
             
             if key == 27 or key == ord('q') or key == ord('Q'):
                 if active_workout_id is not None:
                     print(f"운동 세션 {active_workout_id} 종료 중 (Q 키).")
                     workout_end_real_time = time.time()
                     total_duration_seconds = int(workout_end_real_time - workout_start_real_time)
+                    flush_frames(ingestor)  # 남은 프레임을 모두 쓴 뒤 세션 종료
                     update_workout_session_end_time(active_workout_id, total_duration_seconds, 0.0)
                 break
             elif key == ord('v') or key == ord('V'):
@@ -275,6 +307,7 @@ def main():
                         active_workout_id = new_id
                         workout_start_real_time = time.time()
                         frame_counter = 0 
+                        smoother.reset()
                         last_save_time = time.time() # 시작 시점에 저장 시간 초기화
                         print(f"운동 세션 {active_workout_id} 기록 시작!")
                     else:
@@ -283,7 +316,8 @@ def main():
                     print(f"운동 세션 {active_workout_id} 종료 중 (S 키).")
                     workout_end_real_time = time.time()
                     total_duration_seconds = int(workout_end_real_time - workout_start_real_time)
-                    # 종료 시점에 workouts 테이블의 요약 정보 업데이트
+                    # 종료 시점에 남은 프레임을 모두 쓰고 workouts 테이블의 요약 정보 업데이트
+                    flush_frames(ingestor)
                     update_workout_session_end_time(active_workout_id, total_duration_seconds, 0.0) 
                     
                     active_workout_id = None
@@ -298,9 +332,29 @@ def main():
                 break
     
     finally:
-        cap.release()
-        cv2.destroyAllWindows()
+        if ingestor is not None:
+            # 남은 프레임을 모두 쓰고 쓰기 스레드 종료 (실패해도 아래 세션 종료/정리는 계속)
+            try:
+                ingestor.close()
+            except Exception as error:
+                print(f"프레임 데이터 기록 종료 실패: {error}")
+            print(f"DB 기록: {ingestor.report()}")
+        if headless and active_workout_id is not None:
+            update_workout_session_end_time(active_workout_id, int(time.time() - workout_start_real_time), 0.0)
+        src.close()
+        if not headless:
+            cv2.destroyAllWindows()
+        elapsed = time.perf_counter() - t_start
+        print(f"\n처리한 프레임: {n_frames} ({elapsed:.2f}s, {n_frames / max(elapsed, 1e-9):.1f} frames/sec)")
+        print("\n단계별 처리 시간:")
+        print(METRICS.report())
         print("애플리케이션 종료.")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    import argparse
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", default="camera", help="camera[:N] / 동영상 / 이미지 폴더 / 관절 좌표 CSV / synthetic[:N]")
+    ap.add_argument("--headless", action="store_true", help="화면 없이 최대 속도로 처리")
+    ap.add_argument("--record", action="store_true", help="시작하자마자 운동 세션을 열어 DB에 기록")
+    args = ap.parse_args()
+    main(args.source, args.headless, args.record)
\ No newline at end of file
@@ -0,0 +1,262 @@
+# async_writer.py
+# 녹화 루프의 파일 쓰기를 백그라운드 스레드로 넘기는 버퍼 싱크
+# - 캡처 스레드는 크기 제한 큐에 넣기만 하고, 쓰기 스레드가 flush_size개 또는 flush_interval초마다 모아서 씀
+# - 디스크가 잠깐 느려져도 큐가 흡수하므로 프레임이 밀리지 않음 (큐가 가득 차면 기다리거나 버림)
+# - close() 시 남은 항목을 모두 쓰고 fsync
+# 사용법:
+#   sink = CSVSink(path, fieldnames)          # 또는 SessionSink(SessionWriter(...))
+#   sink.put(row)
+#   sink.close(); print(sink.stats())
+
+import csv
+import os
+import queue
+import threading
+import time
+
+_FLUSH = object()  # flush 요청 표시
+_CLOSE = object()  # 종료 표시
+_POLL = 0.1        # 쓰기 스레드 생존 확인 간격 (초)
+
+
+class BufferedSink:
+    def __init__(self, write_batch, flush_size=256, flush_interval=1.0, maxsize=4096, block=True,
+                 on_close=None, name="sink"):
+        """
+        Args:
+            write_batch: 항목 리스트를 받아 쓰는 함수 (쓴 바이트 수를 반환하면 통계에 반영)
+            flush_size: 이만큼 모이면 바로 씀
+            flush_interval: 마지막 쓰기 후 이 시간(초)이 지나면 모인 만큼 씀
+            maxsize: 큐 최대 항목 수
+            block: 큐가 가득 찼을 때 True면 기다림(데이터 보존), False면 버리고 dropped 증가
+            on_close: 쓰기 스레드에서 마지막 flush 후 호출 (fsync/파일 닫기)
+        """
+        self._write_batch = write_batch
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.block = block
+        self._on_close = on_close
+        self._q = queue.Queue(maxsize)
+        self._closed = False
+        self.error = None
+
+        # 통계
+        self.items_written = 0
+        self.bytes_written = 0
+        self.batches = 0
+        self.dropped = 0
+        self.queue_high_water = 0
+        self.blocked_seconds = 0.0
+        self.flush_total = 0.0
+        self.flush_max = 0.0
+
+        self._thread = threading.Thread(target=self._run, name=f"{name}-writer", daemon=True)
+        self._thread.start()
+
+    def _check_writer(self):
+        """쓰기 스레드가 실패했거나 끝났으면 예외 (큐를 비울 스레드가 없어 기다리면 멈춤)"""
+        if self.error is not None:
+            raise self.error
+        if not self._thread.is_alive():
+            raise RuntimeError("background writer is not running")
+
+    def _put_blocking(self, item):
+        """쓰기 스레드가 살아 있는 동안만 자리가 날 때까지 기다림"""
+        while True:
+            self._check_writer()
+            try:
+                self._q.put(item, timeout=_POLL)
+                return
+            except queue.Full:
+                pass
+
+    def put(self, item):
+        """항목 하나 넣기 (버려졌으면 False)"""
+        if self._closed:
+            raise RuntimeError("sink is closed")
+        self._check_writer()
+        try:
+            self._q.put_nowait(item)
+        except queue.Full:
+            if not self.block:
+                self.dropped += 1
+                return False
+            t0 = time.perf_counter()
+            try:
+                self._put_blocking(item)
+            finally:
+                self.blocked_seconds += time.perf_counter() - t0
+        depth = self._q.qsize()
+        if depth > self.queue_high_water:
+            self.queue_high_water = depth
+        return True
+
+    def flush(self, timeout=None):
+        """지금까지 넣은 항목을 모두 쓸 때까지 기다림 (쓰기 스레드가 실패하면 그 예외를 다시 발생)"""
+        done = threading.Event()
+        self._put_blocking((_FLUSH, done))
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not done.wait(_POLL):
+            self._check_writer()
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+
+    def _write(self, batch):
+        t0 = time.perf_counter()
+        n_bytes = self._write_batch(batch)
+        dt = time.perf_counter() - t0
+        self.flush_total += dt
+        self.flush_max = max(self.flush_max, dt)
+        self.batches += 1
+        self.items_written += len(batch)
+        if n_bytes:
+            self.bytes_written += n_bytes
+
+    @staticmethod
+    def _is_control(item):
+        return item is _CLOSE or (isinstance(item, tuple) and len(item) == 2 and item[0] is _FLUSH)
+
+    def _run(self):
+        batch = []
+        pending = None  # 배치를 모으다 만난 flush/close 요청 (다음 반복에서 처리)
+        last = time.monotonic()
+        closing = False
+        try:
+            while not closing:
+                if pending is not None:
+                    item, pending = pending, None
+                else:
+                    timeout = max(0.0, self.flush_interval - (time.monotonic() - last))
+                    try:
+                        item = self._q.get(timeout=timeout)
+                    except queue.Empty:
+                        item = None
+                done = None
+                if item is _CLOSE:
+                    closing = True
+                elif self._is_control(item):
+                    done = item[1]
+                elif item is not None:
+                    batch.append(item)
+                    # 큐에 이미 쌓인 것은 한 번에 가져옴
+                    while len(batch) < self.flush_size:
+                        try:
+                            nxt = self._q.get_nowait()
+                        except queue.Empty:
+                            break
+                        if self._is_control(nxt):
+                            pending = nxt
+                            break
+                        batch.append(nxt)
+
+                if batch and (closing or done is not None or len(batch) >= self.flush_size
+                              or time.monotonic() - last >= self.flush_interval):
+                    self._write(batch)
+                    batch = []
+                    last = time.monotonic()
+                elif not batch:
+                    last = time.monotonic()
+                if done is not None:
+                    done.set()
+        except Exception as e:
+            self.error = e
+            print(f"Warning: background writer failed: {e}")
+        finally:
+            if self._on_close is not None:
+                self._on_close()
+
+    def close(self):
+        """남은 항목을 모두 쓰고 on_close(fsync 등)까지 끝날 때까지 기다림"""
+        if self._closed:
+            return
+        self._closed = True
+        # 쓰기 스레드가 이미 죽었으면 _CLOSE를 넣을 필요 없이 바로 join (큐가 가득 차도 멈추지 않음)
+        while self._thread.is_alive():
+            try:
+                self._q.put(_CLOSE, timeout=_POLL)
+                break
+            except queue.Full:
+                pass
+        self._thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def stats(self):
+        return {
+            "items_written": self.items_written,
+            "bytes_written": self.bytes_written,
+            "batches": self.batches,
+            "dropped": self.dropped,
+            "queue_depth": self._q.qsize(),
+            "queue_high_water": self.queue_high_water,
+            "blocked_ms": self.blocked_seconds * 1000.0,
+            "flush_avg_ms": (self.flush_total / self.batches * 1000.0) if self.batches else 0.0,
+            "flush_max_ms": self.flush_max * 1000.0,
+        }
+
+    def report(self):
+        s = self.stats()
+        return (f"{s['items_written']} items, {s['bytes_written'] / 1e6:.2f} MB in {s['batches']} batches "
+                f"(flush avg {s['flush_avg_ms']:.2f} ms, max {s['flush_max_ms']:.2f} ms), "
+                f"queue high-water {s['queue_high_water']}, dropped {s['dropped']}, blocked {s['blocked_ms']:.1f} ms")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class CSVSink(BufferedSink):
+    """dict 행을 CSV로 쓰는 싱크 (헤더는 생성 시 바로 씀)"""
+
+    def __init__(self, path, fieldnames, **kwargs):
+        self._f = open(path, "w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._f, fieldnames=fieldnames)
+        self._writer.writeheader()
+        super().__init__(self._write_rows, on_close=self._close_file, name="csv", **kwargs)
+
+    def _write_rows(self, rows):
+        start = self._f.tell()
+        self._writer.writerows(rows)
+        self._f.flush()
+        return self._f.tell() - start
+
+    def _close_file(self):
+        self._f.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+
+class SessionSink(BufferedSink):
+    """(t, frame, angles, kpts) 항목을 session_store.SessionWriter로 쓰는 싱크"""
+
+    def __init__(self, writer, **kwargs):
+        self._writer = writer
+        self._meta = {}
+        self._meta_lock = threading.Lock()
+        kwargs.setdefault("flush_size", writer.chunk_frames)
+        super().__init__(self._write_frames, on_close=self._close_writer, name="session", **kwargs)
+
+    def update_meta(self, **meta):
+        """meta.json 값 갱신 (쓰기 스레드가 다음 배치 때 반영)"""
+        with self._meta_lock:
+            self._meta.update(meta)
+
+    def _apply_meta(self):
+        with self._meta_lock:
+            if self._meta:
+                self._writer.meta.update(self._meta)
+                self._meta = {}
+
+    def _write_frames(self, items):
+        self._apply_meta()
+        start = self._writer.bytes_written
+        for t, frame, angles, kpts in items:
+            self._writer.append(t, frame, angles, kpts)
+        self._writer.flush()
+        return self._writer.bytes_written - start
+
+    def _close_writer(self):
+        self._apply_meta()
+        self._writer.close(fsync=True)
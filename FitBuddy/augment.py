@@ -0,0 +1,143 @@
+# augment.py
+# 랜드마크 배열에서 바로 학습 데이터를 늘리는 증강 (포즈 추정을 다시 하지 않음)
+# - 좌우 반전 (x 뒤집기 + 왼쪽/오른쪽 랜드마크 인덱스 교환)
+# - 작은 회전 (카메라 roll), 카메라 상하 기울기 (세로 방향 축소), 전체 크기 조정
+# - 가시성 드롭아웃 (일부 랜드마크의 visibility를 0으로 → 가려진 관절 흉내)
+# 샘플당 N개 변형을 NumPy 배치 한 번으로 만들고 각도는 angles.extract_angles_bilateral로 다시 계산
+# 좌표 변환은 픽셀 좌표(종횡비 유지)에서 골반 중심을 기준으로 함
+# 사용법:
+#   kpts_aug, w_aug, h_aug, src = augment_keypoints(kpts, w, h, n=5, seed=42)
+#   df_aug = augmented_features(image_paths, labels, n=5)   # landmark_cache에 저장된 랜드마크 사용
+
+import numpy as np
+
+from angles import extract_angles_bilateral, ANGLE_NAMES
+from config import LANDMARK_CACHE
+
+N_LANDMARKS = 33
+
+# 좌우 반전 시 인덱스 교환표 (MediaPipe Pose: 0=코, 이후 왼쪽/오른쪽 쌍)
+_PAIRS = [(1, 4), (2, 5), (3, 6), (7, 8), (9, 10), (11, 12), (13, 14), (15, 16), (17, 18), (19, 20),
+          (21, 22), (23, 24), (25, 26), (27, 28), (29, 30), (31, 32)]
+MIRROR_INDEX = np.arange(N_LANDMARKS)
+for _l, _r in _PAIRS:
+    MIRROR_INDEX[_l], MIRROR_INDEX[_r] = _r, _l
+
+HIPS = [23, 24]
+
+# 기본 증강 강도 (자세 라벨이 바뀌지 않을 정도로 작게)
+DEFAULTS = {
+    "mirror_p": 0.5,        # 좌우 반전 확률
+    "rot_deg": 5.0,         # 회전 ±범위 (도)
+    "tilt_deg": 10.0,       # 카메라 상하 기울기 ±범위 (도, 세로 방향이 cos만큼 줄어듦)
+    "scale": (0.9, 1.1),    # 전체 크기 배율 범위
+    "dropout_p": 0.05,      # 랜드마크별 visibility 드롭아웃 확률
+}
+
+
+def mirror(kpts):
+    """(N, 33, 3) 정규화 키포인트 좌우 반전"""
+    out = kpts[:, MIRROR_INDEX].copy()
+    out[..., 0] = 1.0 - out[..., 0]
+    return out
+
+
+def augment_keypoints(kpts, w=1, h=1, n=5, seed=None, mirror_p=DEFAULTS["mirror_p"], rot_deg=DEFAULTS["rot_deg"],
+                      tilt_deg=DEFAULTS["tilt_deg"], scale=DEFAULTS["scale"], dropout_p=DEFAULTS["dropout_p"]):
+    """
+    샘플마다 n개의 증강 변형 생성
+
+    Args:
+        kpts: (N, 33, 3) 정규화 키포인트 (x, y, visibility)
+        w, h: 이미지 크기 (스칼라 또는 (N,))
+        n: 샘플당 변형 수
+        seed: 난수 시드 (같은 입력/시드면 같은 결과)
+
+    Returns:
+        (kpts_aug (N*n, 33, 3), w (N*n,), h (N*n,), src (N*n,) 원본 샘플 인덱스)
+    """
+    kpts = np.asarray(kpts, dtype=float)
+    N = len(kpts)
+    rng = np.random.default_rng(seed)
+    src = np.repeat(np.arange(N), n)
+    M = len(src)
+    w = np.broadcast_to(np.asarray(w, dtype=float), (N,))[src]
+    h = np.broadcast_to(np.asarray(h, dtype=float), (N,))[src]
+    out = kpts[src]
+
+    # 좌우 반전 (선택된 행만 인덱스 교환 + x 뒤집기)
+    flip = rng.random(M) < mirror_p
+    if flip.any():
+        out[flip] = mirror(out[flip])
+
+    # 픽셀 좌표로 옮겨 골반 중심 기준 변환: 회전 → 세로 축소(카메라 기울기) → 크기
+    wh = np.stack([w, h], axis=-1)[:, None, :]
+    xy = out[..., :2] * wh
+    center = xy[:, HIPS].mean(axis=1, keepdims=True)
+    theta = np.radians(rng.uniform(-rot_deg, rot_deg, M))
+    cos_t, sin_t = np.cos(theta), np.sin(theta)
+    tilt = np.cos(np.radians(rng.uniform(-tilt_deg, tilt_deg, M)))
+    s = rng.uniform(scale[0], scale[1], M)
+    # 행별 2x2 변환 행렬 A = S * T * R
+    A = np.empty((M, 2, 2))
+    A[:, 0, 0] = s * cos_t
+    A[:, 0, 1] = -s * sin_t
+    A[:, 1, 0] = s * tilt * sin_t
+    A[:, 1, 1] = s * tilt * cos_t
+    xy = np.einsum("mij,mkj->mki", A, xy - center) + center
+    out[..., :2] = xy / wh
+
+    # 가시성 드롭아웃
+    if dropout_p > 0:
+        drop = rng.random((M, N_LANDMARKS)) < dropout_p
+        out[..., 2] = np.where(drop, 0.0, out[..., 2])
+
+    return out, w, h, src
+
+
+def augment_angles(kpts, w=1, h=1, n=5, seed=None, **kwargs):
+    """
+    증강 후 각도까지 재계산
+
+    Returns:
+        (angles (N*n, 3) ANGLE_NAMES 순서, confident (N*n,), src (N*n,))
+    """
+    kpts_aug, w_aug, h_aug, src = augment_keypoints(kpts, w, h, n=n, seed=seed, **kwargs)
+    angles, _, _, confident = extract_angles_bilateral(kpts_aug, w_aug, h_aug)
+    return angles, confident, src
+
+
+def augmented_features(image_paths, labels, n=5, seed=42, cache_dir=LANDMARK_CACHE, model_complexity=1, **kwargs):
+    """
+    extract_from_images.py가 landmark_cache에 남긴 랜드마크로 증강 피처 생성
+
+    Args:
+        image_paths: 원본 이미지 경로 목록 (라벨링 CSV의 image_path)
+        labels: 같은 길이의 라벨
+        n: 이미지당 변형 수
+
+    Returns:
+        knee/hip/torso_tilt/label 열의 DataFrame (캐시에 없거나 가시성이 낮은 변형은 제외)
+    """
+    import pandas as pd
+    from landmark_cache import LandmarkCache, digest_file
+
+    digests = []
+    for p in image_paths:
+        try:
+            digests.append(digest_file(p)[0])
+        except OSError:
+            digests.append(b"")
+    with LandmarkCache(cache_dir, model_complexity=model_complexity, static_image_mode=True) as cache:
+        found, w, h, detected, kpts = cache.get_many(digests)
+    labels = np.asarray(labels)
+    idx = np.flatnonzero(detected)
+    if len(idx) < len(digests):
+        print(f"  augment: {len(digests) - len(idx)} images have no cached landmarks (run extract_from_images.py)")
+    if len(idx) == 0:
+        return pd.DataFrame(columns=[*ANGLE_NAMES, "label"])
+
+    angles, confident, src = augment_angles(kpts[idx], w[idx], h[idx], n=n, seed=seed, **kwargs)
+    df = pd.DataFrame(angles[confident], columns=list(ANGLE_NAMES))
+    df["label"] = labels[idx][src[confident]]
+    return df
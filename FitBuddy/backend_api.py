@@ -1,16 +1,23 @@
-from typing import Dict
+from typing import Dict, List
 
 import base64
-import cv2
-import numpy as np
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, HTTPException, Request, WebSocket, WebSocketDisconnect
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import PlainTextResponse
 from pydantic import BaseModel
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
 
 from pose_detector import PoseDetector
-from angles import extract_angles
+from pose_analysis import decode_image, knee_feedback
+from inference_executor import InferenceExecutor
+from angles import extract_angles_auto
+from utils import FilterBank
+from counter import SquatCounter
+from timing import METRICS
+from model_registry import MODEL_REGISTRY
+from config import POSE_POOL_SIZE, POSE_BATCH_MAX_FRAMES, INFERENCE_WORKERS
 from database import SessionLocal, get_db
 from models import User
 from user_manager import hash_password
@@ -26,6 +33,22 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# 포즈 추론 실행기 (워커 프로세스마다 미리 초기화한 detector 보유, 서버 시작 시 생성)
+inference = None
+
+
+@app.on_event("startup")
+def start_inference():
+    global inference
+    inference = InferenceExecutor(workers=INFERENCE_WORKERS, pool_size=POSE_POOL_SIZE, model_complexity=1)
+    inference.warmup()
+
+
+@app.on_event("shutdown")
+def stop_inference():
+    if inference is not None:
+        inference.shutdown()
+
 
 # ==============================
 # 요청/응답 모델 정의 (회원가입/로그인)
@@ -65,6 +88,10 @@ class PoseResponse(BaseModel):
     feedback: str
 
 
+class PoseBatchResponse(BaseModel):
+    results: List[PoseResponse]  # 요청한 프레임 순서대로
+
+
 # ==============================
 # 기본 ping 엔드포인트
 # ==============================
@@ -157,59 +184,175 @@ def login(req: LoginRequest, db: Session = Depends(get_db)):
 # 포즈 분석 API
 # ==============================
 @app.post("/pose/analyze", response_model=PoseResponse)
-def analyze_pose(req: PoseRequest):
+async def analyze_pose(req: PoseRequest):
+    # Base64 → 바이트 (디코딩/분석은 배치 경로와 동일, 추론 워커에서 실행)
+    with METRICS.time("request_analyze"):
+        with METRICS.time("b64decode"):
+            img_bytes = base64.b64decode(req.image_base64)
+        results = await inference.analyze([img_bytes])
+    return PoseResponse(**results[0])
+
+
+# ==============================
+# 포즈 배치 분석 API (Base64 없이 원본 바이트 전송)
+# ==============================
+@app.post("/pose/analyze_batch", response_model=PoseBatchResponse)
+async def analyze_pose_batch(request: Request):
+    """
+    여러 프레임을 JPEG/PNG 원본 바이트로 받아 한 번에 분석
+
+    - multipart/form-data: 파일 필드(이름 무관)마다 프레임 1장
+    - application/octet-stream: 본문에 프레임을 이어 붙이고
+      X-Frame-Lengths 헤더에 각 프레임 바이트 수를 콤마로 전달 (헤더가 없으면 1장)
+    """
+    content_type = request.headers.get("content-type", "")
+
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        blobs = [await v.read() for _, v in form.multi_items() if hasattr(v, "read")]
+    elif content_type.startswith("application/octet-stream"):
+        body = await request.body()
+        lengths = request.headers.get("x-frame-lengths")
+        if lengths:
+            try:
+                sizes = [int(n) for n in lengths.split(",")]
+            except ValueError:
+                raise HTTPException(status_code=400, detail="X-Frame-Lengths 형식이 올바르지 않습니다.")
+            if sum(sizes) != len(body) or any(n <= 0 for n in sizes):
+                raise HTTPException(status_code=400, detail="X-Frame-Lengths 합계가 본문 크기와 다릅니다.")
+            view = memoryview(body)
+            blobs, pos = [], 0
+            for n in sizes:
+                blobs.append(view[pos:pos + n])
+                pos += n
+        else:
+            blobs = [body]
+    else:
+        raise HTTPException(status_code=415, detail="multipart/form-data 또는 application/octet-stream만 지원합니다.")
+
+    if not blobs:
+        raise HTTPException(status_code=400, detail="프레임이 없습니다.")
+    if len(blobs) > POSE_BATCH_MAX_FRAMES:
+        raise HTTPException(status_code=413, detail=f"한 번에 최대 {POSE_BATCH_MAX_FRAMES}장까지 보낼 수 있습니다.")
+
+    # MediaPipe 추론은 CPU 작업이므로 이벤트 루프 밖(추론 워커)에서 실행
+    with METRICS.time("request_analyze_batch"):
+        results = await inference.analyze(blobs)
+    return PoseBatchResponse(results=[PoseResponse(**r) for r in results])
+
 
-    # 1. Base64 → OpenCV 이미지
-    img_bytes = base64.b64decode(req.image_base64)
-    # Base64 디코딩된 바이트를 numpy 배열로 변환
-    # NumPy의 frombuffer 함수 사용 (일부 버전에서는 없을 수 있음)
+# ==============================
+# 실시간 포즈 스트리밍 (WebSocket)
+# ==============================
+class PoseStreamSession:
+    """
+    WebSocket 연결 하나에 대응하는 실시간 분석 상태
+
+    연결 동안 같은 PoseDetector를 계속 쓰므로 MediaPipe가 추적(tracking) 모드로 동작하고,
+    스무딩(FilterBank)과 카운터 상태도 프레임 사이에 유지된다.
+    """
+    def __init__(self):
+        self.pose = PoseDetector(model_complexity=1)
+        self.smoother = FilterBank(3, method='ema_window', alpha=0.25, window=5)
+        self.counter = SquatCounter()
+        self.frame_idx = 0
+
+    def reset(self):
+        """카운트/스무딩 상태 초기화 (detector는 유지)"""
+        self.smoother.reset()
+        self.counter = SquatCounter()
+        self.frame_idx = 0
+
+    def process(self, img_bytes):
+        """프레임 한 장을 처리해 클라이언트에 보낼 dict 반환"""
+        self.frame_idx += 1
+        out = {"frame": self.frame_idx, "detected": False,
+               "count": self.counter.count, "state": self.counter.state}
+
+        frame = decode_image(img_bytes)
+        if frame is None:
+            out["feedback"] = "이미지를 처리할 수 없습니다."
+            return out
+
+        lms = self.pose.process(frame)
+        kpts = self.pose.to_numpy() if lms is not None else None
+        if kpts is None:
+            out["feedback"] = "사람이 화면에 정확히 나타나지 않습니다."
+            return out
+
+        h, w = frame.shape[:2]
+        ang, _, confident = extract_angles_auto(kpts, w=w, h=h)
+        if not confident:
+            # 가려진 프레임은 스무딩/카운터에 넣지 않음
+            out["feedback"] = "관절이 가려져 잘 보이지 않습니다. 몸 옆면 전체가 보이도록 서주세요."
+            return out
+
+        knee, hip, tilt = self.smoother([ang['knee'], ang['hip'], ang['torso_tilt']]).tolist()
+        count, state = self.counter.update(knee)
+
+        out.update({
+            "detected": True,
+            "knee_angle": knee,
+            "hip_angle": hip,
+            "torso_tilt": tilt,
+            "count": count,
+            "state": state,
+            "feedback": knee_feedback(knee),
+        })
+        return out
+
+    def close(self):
+        self.pose.pose.close()
+
+
+@app.websocket("/pose/stream")
+async def pose_stream(websocket: WebSocket):
+    """
+    실시간 포즈 스트림
+
+    - 클라이언트 → 서버: 바이너리 메시지 1개 = JPEG/PNG 프레임 1장,
+      텍스트 메시지 "reset" = 카운트 초기화
+    - 서버 → 클라이언트: 프레임마다 각도/카운트/피드백 JSON
+    """
+    await websocket.accept()
+    session = await run_in_threadpool(PoseStreamSession)
     try:
-        np_arr = np.frombuffer(img_bytes, dtype=np.uint8)
-    except (AttributeError, TypeError):
-        # 대안: bytearray를 numpy 배열로 변환
-        np_arr = np.array(bytearray(img_bytes), dtype=np.uint8)
-    frame = cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
-
-    if frame is None:
-        return PoseResponse(
-            knee_angle=-1, hip_angle=-1, torso_tilt=-1,
-            feedback="이미지를 처리할 수 없습니다."
-        )
+        while True:
+            msg = await websocket.receive()
+            if msg["type"] == "websocket.disconnect":
+                break
+            if msg.get("bytes") is not None:
+                with METRICS.time("stream_frame"):
+                    result = await run_in_threadpool(session.process, msg["bytes"])
+                await websocket.send_json(result)
+            elif msg.get("text") == "reset":
+                session.reset()
+                await websocket.send_json({"reset": True, "count": 0})
+    except WebSocketDisconnect:
+        pass
+    finally:
+        session.close()
 
-    # 2. Pose detection
-    pose = PoseDetector(model_complexity=1)
-    lms = pose.process(frame)
 
-    if lms is None:
-        return PoseResponse(
-            knee_angle=-1, hip_angle=-1, torso_tilt=-1,
-            feedback="사람이 화면에 정확히 나타나지 않습니다."
-        )
+# ==============================
+# 포즈 추론 실행기 / detector 풀 상태 확인
+# ==============================
+@app.get("/pose/pool")
+def pose_pool_stats():
+    return inference.stats()
 
-    kpts = pose.to_numpy()
 
-    # 3. 각도 계산
-    h, w = frame.shape[:2]
-    ang = extract_angles(kpts, side='right', w=w, h=h)
+# ==============================
+# 로드된 모델 상태 (버전, 로드 시간, 메모리)
+# ==============================
+@app.get("/models/stats")
+def model_stats():
+    return MODEL_REGISTRY.stats()
 
-    knee = float(ang.get("knee", -1))
-    hip = float(ang.get("hip", -1))
-    tilt = float(ang.get("torso_tilt", -1))
 
-    # 4. 피드백 생성 로직 (예시)
-    if knee < 40:
-        fb = "너무 깊어요! 무릎을 조금 펴주세요."
-    elif knee < 70:
-        fb = "좋아요! 안정적인 자세입니다."
-    elif knee < 110:
-        fb = "조금 더 내려가보세요!"
-    else:
-        fb = "무릎을 더 굽혀야 해요!"
-
-    # 5. 최종 응답
-    return PoseResponse(
-        knee_angle=knee,
-        hip_angle=hip,
-        torso_tilt=tilt,
-        feedback=fb
-    )
+# ==============================
+# 단계별 처리 시간 (Prometheus)
+# ==============================
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    return METRICS.render_prometheus()
@@ -0,0 +1,116 @@
+# compiled_forest.py
+# 학습된 sklearn 트리 앙상블(RandomForest/ExtraTrees)을 연속된 NumPy 노드 배열로 펼쳐서
+# 프레임마다 호출해도 부담 없는 속도로 추론한다. (sklearn 입력 검증/트리별 디스패치 비용 제거)
+# 결과는 sklearn predict_proba와 비트 단위로 같다.
+
+import numpy as np
+
+# predict_proba가 한 번에 처리하는 행 수 (배치가 커도 (행 × 트리) 인덱스 배열 크기를 제한)
+CHUNK_ROWS = 4096
+
+
+class CompiledForest:
+    def __init__(self, feature, threshold, left, right, missing_left, leaf_proba, roots,
+                 max_depth, n_features, classes):
+        self.feature = feature            # (n_nodes,) 분기에 쓰는 피처 인덱스 (리프는 0)
+        self.threshold = threshold        # (n_nodes,) float64 임계값
+        self.left = left                  # (n_nodes,) 왼쪽 자식 (리프는 자기 자신)
+        self.right = right                # (n_nodes,) 오른쪽 자식 (리프는 자기 자신)
+        self.missing_left = missing_left  # (n_nodes,) NaN 입력이 왼쪽으로 가는지
+        self.leaf_proba = leaf_proba      # (n_nodes, n_classes) 트리별 정규화된 클래스 확률
+        self.roots = roots                # (n_trees,) 각 트리의 루트 노드
+        self.max_depth = max_depth
+        self.n_features = n_features
+        self.classes_ = classes
+
+    @classmethod
+    def from_sklearn(cls, model):
+        """학습된 RandomForestClassifier / ExtraTreesClassifier를 노드 배열로 펼침"""
+        feats, thrs, lefts, rights, mls, probas, roots = [], [], [], [], [], [], []
+        offset = 0
+        max_depth = 0
+        for est in model.estimators_:
+            t = est.tree_
+            n = t.node_count
+            ids = np.arange(n) + offset
+            is_leaf = t.children_left == -1
+            feats.append(np.where(is_leaf, 0, t.feature))
+            thrs.append(np.where(is_leaf, np.inf, t.threshold))
+            lefts.append(np.where(is_leaf, ids, t.children_left + offset))
+            rights.append(np.where(is_leaf, ids, t.children_right + offset))
+            ml = getattr(t, "missing_go_to_left", None)
+            mls.append(np.zeros(n, dtype=bool) if ml is None else np.asarray(ml, dtype=bool))
+
+            # DecisionTreeClassifier.predict_proba와 같은 방식으로 노드별 확률 정규화
+            value = t.value[:, 0, :model.n_classes_].astype(np.float64)
+            normalizer = value.sum(axis=1)[:, None]
+            normalizer[normalizer == 0.0] = 1.0
+            probas.append(value / normalizer)
+
+            roots.append(offset)
+            offset += n
+            max_depth = max(max_depth, t.max_depth)
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(feats), dtype=np.intp),
+            threshold=np.ascontiguousarray(np.concatenate(thrs), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.intp),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.intp),
+            missing_left=np.concatenate(mls),
+            leaf_proba=np.ascontiguousarray(np.concatenate(probas)),
+            roots=np.asarray(roots, dtype=np.intp),
+            max_depth=int(max_depth),
+            n_features=int(model.n_features_in_),
+            classes=np.asarray(model.classes_),
+        )
+
+    def _leaves(self, X):
+        """(n, n_features) → 트리별 도달 리프 (n, n_trees)"""
+        # sklearn 트리는 입력을 float32로 바꾼 뒤 float64 임계값과 비교함
+        X = np.asarray(X, dtype=np.float32)
+        if X.ndim == 1:
+            X = X[None, :]
+        rows = np.arange(len(X))[:, None]
+        idx = np.broadcast_to(self.roots, (len(X), len(self.roots))).copy()
+        for _ in range(self.max_depth):
+            x = X[rows, self.feature[idx]]
+            go_left = x <= self.threshold[idx]
+            nan = np.isnan(x)
+            if nan.any():
+                go_left = np.where(nan, self.missing_left[idx], go_left)
+            idx = np.where(go_left, self.left[idx], self.right[idx])
+        return idx
+
+    def predict_proba(self, X):
+        """sklearn predict_proba와 동일한 (n, n_classes) 확률 (CHUNK_ROWS 행씩 나눠 처리)"""
+        X = np.asarray(X)
+        if X.ndim == 1:
+            X = X[None, :]
+        out = np.zeros((len(X), self.leaf_proba.shape[1]))
+        for start in range(0, len(X), CHUNK_ROWS):
+            leaves = self._leaves(X[start:start + CHUNK_ROWS])  # (chunk, n_trees)
+            acc = out[start:start + CHUNK_ROWS]
+            # sklearn처럼 트리 순서대로 누적한 뒤 트리 수로 나눔 (합산 순서까지 맞춰 결과를 일치시킴)
+            if len(leaves) < leaves.shape[1]:
+                # 행이 적으면(프레임당 1행) 행마다 (n_trees, n_classes)를 순차 누적
+                for i, row in enumerate(leaves):
+                    acc[i] = np.cumsum(self.leaf_proba[row], axis=0)[-1]
+            else:
+                for j in range(leaves.shape[1]):
+                    acc += self.leaf_proba[leaves[:, j]]
+        out /= len(self.roots)
+        return out
+
+    def predict(self, X):
+        return self.classes_[np.argmax(self.predict_proba(X), axis=1)]
+
+
+def compile_model(model):
+    """트리 앙상블 분류기면 CompiledForest로 변환, 아니면 그대로 반환"""
+    if isinstance(model, CompiledForest):
+        return model
+    estimators = getattr(model, "estimators_", None)
+    if (estimators and hasattr(model, "n_classes_") and isinstance(model.n_classes_, (int, np.integer))
+            and all(hasattr(e, "tree_") for e in estimators)):
+        return CompiledForest.from_sklearn(model)
+    return model
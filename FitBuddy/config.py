@@ -1,4 +1,5 @@
 # config.py
+import os
 from pathlib import Path
 
 ROOT = Path(__file__).resolve().parent
@@ -16,8 +17,70 @@ CATEGORIES = {
 }
 EXERCISES = {ex: cat for cat, lst in CATEGORIES.items() for ex in lst}
 
+# 운동별로 계산할 관절 각도 (angles.JOINT_ANGLES 이름)
+EXERCISE_ANGLES = {
+    "plank":            ["r_shoulder", "l_shoulder", "r_hip", "l_hip", "r_knee", "l_knee", "r_torso_tilt", "l_torso_tilt"],
+    "burpee":           ["r_elbow", "l_elbow", "r_hip", "l_hip", "r_knee", "l_knee", "r_torso_tilt", "l_torso_tilt"],
+    "mountain_climber": ["r_shoulder", "l_shoulder", "r_hip", "l_hip", "r_knee", "l_knee"],
+    "pushup":           ["r_elbow", "l_elbow", "r_shoulder", "l_shoulder", "r_hip", "l_hip", "r_torso_tilt", "l_torso_tilt"],
+    "pullup":           ["r_elbow", "l_elbow", "r_shoulder", "l_shoulder"],
+    "kickback":         ["r_elbow", "l_elbow", "r_shoulder", "l_shoulder", "r_torso_tilt", "l_torso_tilt"],
+    "squat":            ["r_knee", "l_knee", "r_hip", "l_hip", "r_ankle", "l_ankle", "r_torso_tilt", "l_torso_tilt"],
+    "lunge":            ["r_knee", "l_knee", "r_hip", "l_hip", "r_torso_tilt", "l_torso_tilt"],
+    "deadlift":         ["r_hip", "l_hip", "r_knee", "l_knee", "r_torso_tilt", "l_torso_tilt"],
+    "crunch":           ["r_hip", "l_hip", "r_knee", "l_knee", "r_torso_tilt", "l_torso_tilt"],
+    "leg_raise":        ["r_hip", "l_hip", "r_knee", "l_knee"],
+    "russian_twist":    ["trunk_rotation", "r_hip", "l_hip", "r_knee", "l_knee"],
+}
+
 FPS = 15
+# 좌/우 자동 선택 시 최소 가시성 (어깨·골반·무릎·발목 visibility 최솟값 기준)
+MIN_SIDE_VISIBILITY = 0.5
 THRESH = {
     "squat": {"down_knee": 95, "up_knee": 160},
     "pushup": {"min_elbow": 75},
 }
+
+# 운동별 rep 카운터 스펙 (counter.RepCounter)
+#   angle: 기준 각도 (knee/hip/elbow/shoulder/torso_tilt는 좌우 중 선택된 쪽, trunk_rotation은 양쪽 공통)
+#   down: 동작 구간으로 들어가는 임계값, up: 복귀로 인정하는 임계값
+#   min_dwell: down 구간에 연속으로 머물러야 하는 최소 프레임 수
+#   direction: "decrease" = 동작 시 각도가 작아짐 (스쿼트 무릎), "increase" = 커짐
+# plank처럼 자세를 유지하는 운동은 rep이 없으므로 제외
+REP_SPECS = {
+    "squat":            {"angle": "knee",  "down": THRESH["squat"]["down_knee"], "up": THRESH["squat"]["up_knee"],
+                         "min_dwell": 3, "direction": "decrease"},
+    "lunge":            {"angle": "knee",  "down": 100, "up": 160, "min_dwell": 3, "direction": "decrease"},
+    "deadlift":         {"angle": "hip",   "down": 110, "up": 165, "min_dwell": 3, "direction": "decrease"},
+    "burpee":           {"angle": "hip",   "down": 90,  "up": 160, "min_dwell": 2, "direction": "decrease"},
+    "mountain_climber": {"angle": "hip",   "down": 100, "up": 150, "min_dwell": 1, "direction": "decrease"},
+    "pushup":           {"angle": "elbow", "down": THRESH["pushup"]["min_elbow"], "up": 150,
+                         "min_dwell": 2, "direction": "decrease"},
+    "pullup":           {"angle": "elbow", "down": 70,  "up": 150, "min_dwell": 2, "direction": "decrease"},
+    "kickback":         {"angle": "elbow", "down": 150, "up": 100, "min_dwell": 2, "direction": "increase"},
+    "crunch":           {"angle": "hip",   "down": 95,  "up": 115, "min_dwell": 2, "direction": "decrease"},
+    "leg_raise":        {"angle": "hip",   "down": 110, "up": 160, "min_dwell": 2, "direction": "decrease"},
+    "russian_twist":    {"angle": "trunk_rotation", "down": 25, "up": 10, "min_dwell": 2, "direction": "increase"},
+}
+
+# 서버 포즈 추론 워커 프로세스 수 (0이면 프로세스 대신 스레드 + 공유 detector 풀)
+INFERENCE_WORKERS = int(os.environ.get("FITBUDDY_INFERENCE_WORKERS", str(os.cpu_count() or 1)))
+# 스레드 모드에서 쓰는 PoseDetector 풀 크기 (동시에 처리할 요청 수)
+POSE_POOL_SIZE = int(os.environ.get("FITBUDDY_POSE_POOL_SIZE", "4"))
+# /pose/analyze_batch 한 요청에 허용하는 최대 프레임 수
+POSE_BATCH_MAX_FRAMES = int(os.environ.get("FITBUDDY_POSE_BATCH_MAX_FRAMES", "32"))
+# 모델 레지스트리가 파일 변경(mtime)을 확인하는 최소 간격 (초, 0이면 매 호출마다 확인)
+MODEL_CHECK_INTERVAL = float(os.environ.get("FITBUDDY_MODEL_CHECK_INTERVAL", "2.0"))
+# features_agg.build_agg가 변경된 파일을 요약할 때 쓰는 프로세스 수 (1이면 현재 프로세스에서 처리)
+AGG_WORKERS = int(os.environ.get("FITBUDDY_AGG_WORKERS", str(os.cpu_count() or 1)))
+# 이미지/동영상 프레임 랜드마크 캐시 (landmark_cache.py, 내용 해시 + detector 설정별 파일)
+LANDMARK_CACHE = DATA / "landmark_cache"
+# train_all.py가 후보 모델을 고를 때 쓰는 1행 추론 지연 상한 (ms, 컴파일된 모델 기준 / FPS 프레임 예산의 일부)
+MODEL_LATENCY_BUDGET_MS = float(os.environ.get("FITBUDDY_MODEL_LATENCY_BUDGET_MS", "2.0"))
+# train_all.py 전체 코어 수 (운동별 학습 프로세스 × 교차 검증 작업 수로 나눠 씀)
+TRAIN_WORKERS = int(os.environ.get("FITBUDDY_TRAIN_WORKERS", str(os.cpu_count() or 1)))
+# app.py 프레임 DB 기록 (frame_ingest.FrameIngestor): 저장 간격(초, 0이면 모든 프레임), 일괄 INSERT 행 수/주기, 큐 크기
+FRAME_SAVE_INTERVAL = float(os.environ.get("FITBUDDY_FRAME_SAVE_INTERVAL", "0.0"))
+FRAME_FLUSH_SIZE = int(os.environ.get("FITBUDDY_FRAME_FLUSH_SIZE", "256"))
+FRAME_FLUSH_INTERVAL = float(os.environ.get("FITBUDDY_FRAME_FLUSH_INTERVAL", "1.0"))
+FRAME_QUEUE_SIZE = int(os.environ.get("FITBUDDY_FRAME_QUEUE_SIZE", "8192"))
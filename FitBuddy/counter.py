@@ -1,23 +1,165 @@
-class SquatCounter:
-    def __init__(self, down_knee_thresh=95, up_knee_thresh=160, min_depth_frames=3):
+# counter.py
+# 운동별 스펙(config.REP_SPECS)으로 동작하는 rep 카운터
+#   - update(): 실시간 루프에서 프레임마다 호출
+#   - replay(): 녹화된 세션 전체 각도 배열을 프레임별 파이썬 루프 없이 한 번에 카운트
+import numpy as np
+
+from config import REP_SPECS
+
+
+class RepCounter:
+    def __init__(self, down, up, min_dwell=3, direction='decrease'):
+        """
+        히스테리시스 기반 rep 카운터
+
+        Args:
+            down: 동작 구간(down 상태)으로 들어가는 임계값
+            up: 복귀(up 상태)로 인정하는 임계값
+            min_dwell: down 임계값을 넘은 상태로 연속 유지해야 하는 최소 프레임 수
+            direction: 'decrease' (동작 시 각도가 작아짐) 또는 'increase' (커짐)
+        """
+        if direction not in ('decrease', 'increase'):
+            raise ValueError(f"direction must be 'decrease' or 'increase', got {direction!r}")
+        self.down = down
+        self.up = up
+        self.min_dwell = min_dwell
+        self.direction = direction
+        # 'increase'는 부호를 뒤집어 'decrease'와 같은 비교로 처리
+        self._sign = 1.0 if direction == 'decrease' else -1.0
+        self.reset()
+
+    @classmethod
+    def from_spec(cls, exercise, **overrides):
+        """config.REP_SPECS[exercise]로 생성 (임계값 일부를 덮어쓸 수 있음)"""
+        spec = {**REP_SPECS[exercise], **overrides}
+        return cls(spec['down'], spec['up'], spec.get('min_dwell', 3), spec.get('direction', 'decrease'))
+
+    def reset(self):
         self.state = 'up'
         self.count = 0
-        self.depth_frames = 0
-        self.down_knee_thresh = down_knee_thresh
-        self.up_knee_thresh = up_knee_thresh
-        self.min_depth_frames = min_depth_frames
+        self.dwell_frames = 0
 
-    def update(self, knee_angle):
+    def update(self, angle):
+        x, down, up = self._sign * angle, self._sign * self.down, self._sign * self.up
         if self.state == 'up':
-            if knee_angle < self.down_knee_thresh:
-                self.depth_frames += 1
-                if self.depth_frames >= self.min_depth_frames:
+            if x < down:
+                self.dwell_frames += 1
+                if self.dwell_frames >= self.min_dwell:
                     self.state = 'down'
             else:
-                self.depth_frames = 0
+                self.dwell_frames = 0
         elif self.state == 'down':
-            if knee_angle > self.up_knee_thresh:
+            if x > up:
                 self.count += 1
                 self.state = 'up'
-                self.depth_frames = 0
+                self.dwell_frames = 0
         return self.count, self.state
+
+    def replay(self, angles):
+        """
+        세션 전체를 벡터 연산으로 카운트 (update()를 처음부터 반복 호출한 결과와 동일)
+
+        Args:
+            angles: (N,) 기준 각도 배열 (NaN 프레임은 어느 임계값도 넘지 않은 것으로 처리)
+
+        Returns:
+            (count, down_mask, rep_ends)
+            count: 총 rep 수
+            down_mask: (N,) bool, 각 프레임 처리 후 상태가 'down'이면 True
+            rep_ends: rep이 카운트된 프레임 인덱스 배열
+        """
+        x = self._sign * np.asarray(angles, dtype=float)
+        n = len(x)
+        below = x < self._sign * self.down
+        above = x > self._sign * self.up
+
+        # 연속 below 구간 길이가 min_dwell에 도달하는 프레임 = down 진입 후보
+        idx = np.arange(n)
+        last_not_below = np.maximum.accumulate(np.where(below, -1, idx))
+        arm = idx[below & (idx - last_not_below == max(self.min_dwell, 1))]
+        release = idx[above]
+
+        # 진입/복귀 이벤트를 시간순으로 합치고, 같은 종류가 연달아 나오면 첫 번째만 유효
+        # (up 상태에서의 복귀, down 상태에서의 재진입은 상태머신에서 무시됨)
+        pos = np.concatenate([arm, release])
+        kind = np.concatenate([np.ones(len(arm), np.int8), np.zeros(len(release), np.int8)])
+        order = np.argsort(pos, kind='stable')
+        pos, kind = pos[order], kind[order]
+        keep = kind != np.concatenate([[0], kind[:-1]])
+        pos, kind = pos[keep], kind[keep]
+
+        rep_ends = pos[kind == 0]
+        marks = np.zeros(n + 1, dtype=np.int8)
+        marks[pos[kind == 1]] += 1
+        marks[rep_ends] -= 1
+        down_mask = np.cumsum(marks[:n]) > 0
+        return len(rep_ends), down_mask, rep_ends
+
+
+def spec_angle_name(exercise, side='right'):
+    """스펙의 기준 각도를 angles.JOINT_ANGLES 이름으로 변환 (좌우 공통 각도는 그대로)"""
+    angle = REP_SPECS[exercise]['angle']
+    if angle == 'trunk_rotation':
+        return angle
+    return ('r_' if side == 'right' else 'l_') + angle
+
+
+class SquatCounter(RepCounter):
+    def __init__(self, down_knee_thresh=95, up_knee_thresh=160, min_depth_frames=3):
+        super().__init__(down_knee_thresh, up_knee_thresh, min_depth_frames, 'decrease')
+
+
+def recount_files(paths, exercise, column=None, **overrides):
+    """
+    녹화된 CSV / .session 세션들을 현재 스펙으로 다시 카운트
+
+    Args:
+        paths: CSV 또는 세션 디렉터리 경로 목록
+        exercise: config.REP_SPECS 키
+        column: 기준 각도 열 이름 (None이면 스펙 각도, 없으면 r_/l_ 접두사 열 순으로 찾음)
+
+    Returns:
+        {path: count}
+    """
+    import pandas as pd
+    from session_store import SessionReader, is_session
+    counter = RepCounter.from_spec(exercise, **overrides)
+    angle = REP_SPECS[exercise]['angle']
+    out = {}
+    for p in paths:
+        if is_session(p):
+            # 세션은 필요한 각도 열만 memmap으로 읽음
+            r = SessionReader(p)
+            names, read = r.angle_names, r.angle
+        else:
+            df = pd.read_csv(p)
+            names, read = df.columns, lambda c: df[c].to_numpy()
+        col = column or next((c for c in (angle, f"r_{angle}", f"l_{angle}", f"{angle}_angle") if c in names), None)
+        if col is None or col not in names:
+            print(f"skip {p}: no '{col or angle}' column")
+            continue
+        out[str(p)] = counter.replay(np.asarray(read(col), dtype=float))[0]
+    return out
+
+
+if __name__ == "__main__":
+    import argparse, time
+    from glob import glob
+    from pathlib import Path
+    from config import RAW
+    ap = argparse.ArgumentParser(description="Re-count stored sessions with the current REP_SPECS")
+    ap.add_argument("--exercise", required=True)
+    ap.add_argument("--glob", default=None,
+                    help="CSV/session glob (default: data/raw_kpt/{exercise}/*/*.csv and *.session)")
+    ap.add_argument("--column", default=None)
+    ap.add_argument("--down", type=float, default=None)
+    ap.add_argument("--up", type=float, default=None)
+    a = ap.parse_args()
+    overrides = {k: v for k, v in (("down", a.down), ("up", a.up)) if v is not None}
+    patterns = [a.glob] if a.glob else [str(RAW / a.exercise / "*" / "*.csv"), str(RAW / a.exercise / "*" / "*.session")]
+    files = sorted(f for pat in patterns for f in glob(pat) if not Path(f).stem.endswith("_seg"))
+    t0 = time.perf_counter()
+    counts = recount_files(files, a.exercise, a.column, **overrides)
+    for p, c in counts.items():
+        print(f"{c:5d}  {p}")
+    print(f"{len(counts)} sessions, {sum(counts.values())} reps in {time.perf_counter() - t0:.2f}s")
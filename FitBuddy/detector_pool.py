@@ -0,0 +1,122 @@
+# detector_pool.py
+# 미리 초기화해 둔 PoseDetector를 요청마다 빌려주고 돌려받는 풀
+# MediaPipe 그래프 초기화는 추론 자체보다 훨씬 비싸므로 요청마다 새로 만들지 않는다.
+# 같은 detector가 서로 무관한 요청에 돌아가며 쓰이므로 기본은 정지 이미지 모드
+# (추적 모드면 앞 요청의 랜드마크가 다음 요청의 검출 시작점이 됨)
+
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from pose_detector import PoseDetector
+
+
+class DetectorPool:
+    def __init__(self, size=2, model_complexity=1, prewarm=True, timeout=None, static_image_mode=True):
+        """
+        PoseDetector 풀
+
+        Args:
+            size: 풀에 유지할 최대 detector 수 (워커 스레드 수와 맞추는 것을 권장)
+            model_complexity: PoseDetector에 전달할 모델 복잡도
+            prewarm: True면 생성 시점에 size개를 미리 만들어 둠
+            timeout: 모든 detector가 사용 중일 때 최대 대기 시간 (초, None이면 무한 대기)
+            static_image_mode: True면 요청 간 추적 상태를 공유하지 않음 (False는 한 스트림 전용 풀에서만)
+        """
+        self.size = size
+        self.model_complexity = model_complexity
+        self.static_image_mode = static_image_mode
+        self.timeout = timeout
+        self._idle = queue.LifoQueue(maxsize=size)  # 최근에 쓴 detector를 먼저 재사용
+        self._lock = threading.Lock()
+        self._created = 0
+
+        # 통계
+        self.hits = 0        # 대기 없이 idle detector를 바로 받은 횟수
+        self.misses = 0      # 새로 만들었거나 반납을 기다려야 했던 횟수
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+        if prewarm:
+            for _ in range(size):
+                self._idle.put(self._create())
+
+    def _create(self):
+        with self._lock:
+            self._created += 1
+        return self._new_detector()
+
+    def _new_detector(self):
+        """_created를 먼저 올린 뒤 호출됨: 생성이 실패하면 자리를 되돌려 다음 요청이 다시 만들 수 있게 함"""
+        try:
+            return PoseDetector(model_complexity=self.model_complexity, static_image_mode=self.static_image_mode)
+        except Exception:
+            with self._lock:
+                self._created -= 1
+            raise
+
+    def acquire(self):
+        """idle detector를 하나 꺼냄 (없으면 새로 만들거나 반납될 때까지 대기)"""
+        t0 = time.perf_counter()
+        try:
+            det = self._idle.get_nowait()
+            hit = True
+        except queue.Empty:
+            hit = False
+            det = None
+            with self._lock:
+                can_create = self._created < self.size
+                if can_create:
+                    self._created += 1
+            if can_create:
+                det = self._new_detector()
+            else:
+                try:
+                    det = self._idle.get(timeout=self.timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"PoseDetector 풀 대기 시간 초과 ({self.timeout}s)")
+        waited = time.perf_counter() - t0
+
+        with self._lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+            self.wait_total += waited
+            self.wait_max = max(self.wait_max, waited)
+        return det
+
+    def release(self, det):
+        """사용이 끝난 detector를 풀에 반납"""
+        try:
+            self._idle.put_nowait(det)
+        except queue.Full:
+            # 풀 크기를 넘는 detector는 버림
+            with self._lock:
+                self._created -= 1
+
+    @contextmanager
+    def detector(self):
+        """with pool.detector() as det: ... 형태로 사용"""
+        det = self.acquire()
+        try:
+            yield det
+        finally:
+            self.release(det)
+
+    def stats(self):
+        """풀 상태 (hit/miss, 대기 시간, 크기)"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "size": self.size,
+                "created": self._created,
+                "idle": self._idle.qsize(),
+                "in_use": self._created - self._idle.qsize(),
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "wait_avg_ms": (self.wait_total / total * 1000.0) if total else 0.0,
+                "wait_max_ms": self.wait_max * 1000.0,
+            }
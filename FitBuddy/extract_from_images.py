@@ -1,102 +1,185 @@
 # extract_from_images.py
 # 정자세/오자세 라벨링된 이미지에서 관절 좌표를 추출하여 학습 데이터 생성
+# 1) 랜드마크: 이미지 내용 해시로 landmark_cache를 조회하고, 없는 이미지만 워커 프로세스에서 포즈 추정
+#    (워커마다 static_image_mode detector 1개, 결과는 끝나는 대로 캐시에 이어 씀 → 중단 후 다시 실행하면 이어서 처리)
+# 2) 피처: 캐시의 랜드마크로 각도를 한 번에 계산해서 CSV 저장 (각도/피처 정의를 바꿔도 포즈 추정은 다시 안 함)
+# 처리 속도(images/sec), 캐시 적중 수, 실패 사유별 개수를 출력
 # 사용법:
 #   python extract_from_images.py --exercise squat --good_dir data/images/squat/good --bad_dir data/images/squat/bad
+#   python extract_from_images.py --exercise squat --good_dir ... --bad_dir ... --workers 4
 
 import argparse
+import os
+import time
 import cv2
 import pandas as pd
 import numpy as np
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
 from pose_detector import PoseDetector
-from angles import extract_angles
-from config import DATA
+from angles import extract_angles_bilateral
+from config import DATA, LANDMARK_CACHE
+from frame_source import IMAGE_EXTS
+from landmark_cache import LandmarkCache, digest_file
 
-def extract_features_from_image(image_path, pose_detector):
-    """이미지에서 관절 좌표를 추출하고 피처 계산"""
-    img = cv2.imread(str(image_path))
-    if img is None:
-        return None
-    
-    h, w = img.shape[:2]
-    lms = pose_detector.process(img)
-    
-    if lms is None:
-        return None
-    
-    kpts = pose_detector.to_numpy()
-    if kpts is None:
-        return None
+FIELDNAMES = ['knee', 'hip', 'torso_tilt', 'image_path', 'label', 'label_name']
+LABELS = {1: 'good', 0: 'bad'}
+
+# 워커 프로세스 전역 detector (_init_worker에서 1회 생성)
+_pose = None
+
+def list_images(directory):
+    """디렉토리의 이미지 파일 목록 (확장자 대소문자 무관, 한 번만 훑음, 이름 순)"""
+    directory = Path(directory)
+    if not directory.is_dir():
+        return []
+    with os.scandir(directory) as it:
+        paths = [Path(e.path) for e in it if e.is_file() and os.path.splitext(e.name)[1].lower() in IMAGE_EXTS]
+    return sorted(paths)
+
+def _init_worker(model_complexity):
+    """워커 시작 시 1회 호출: 정지 이미지 모드 detector 생성"""
+    global _pose
+    _pose = PoseDetector(model_complexity=model_complexity, static_image_mode=True)
+
+def _detect_one(image_path):
+    """워커에서 실행: 이미지 경로 → (w, h, kpts 또는 None, 실패 사유)"""
+    try:
+        img = cv2.imread(str(image_path))
+        if img is None:
+            return 0, 0, None, 'unreadable'
+        h, w = img.shape[:2]
+        if _pose.process(img) is None:
+            return w, h, None, 'no_pose'
+        return w, h, _pose.to_numpy(), None
+    except Exception as e:  # 이미지 하나 때문에 전체가 멈추지 않게 사유만 기록
+        return 0, 0, None, f'error:{type(e).__name__}'
+
+def extract_landmarks(paths, cache, workers=None, model_complexity=1):
+    """
+    1단계: 캐시에 없는 이미지만 포즈 추정해서 캐시에 추가
     
-    # 각도 추출
-    ang = extract_angles(kpts, side='right', w=w, h=h)
+    Returns:
+        (digests, failures): 이미지별 내용 해시 (읽을 수 없으면 None), 실패 사유별 개수 (캐시에 남지 않는 실패만)
+    """
+    digests, todo, queued = [], [], set()
+    failures = {}
+    cached = 0
+    for p in paths:
+        try:
+            d, _ = digest_file(p)
+        except OSError:
+            d = None
+            failures['unreadable'] = failures.get('unreadable', 0) + 1
+        digests.append(d)
+        if d is None:
+            continue
+        if d in cache:
+            cached += 1
+        elif d not in queued:  # 같은 내용의 사본은 한 번만 추정
+            queued.add(d)
+            todo.append((p, d))
+    print(f"Landmarks: {cached} cached, {len(todo)} to detect")
+    if not todo:
+        return digests, failures
     
-    # 추가 피처 계산
-    # 무릎, 고관절, 상체 기울기
-    features = {
-        'knee': float(ang['knee']),
-        'hip': float(ang['hip']),
-        'torso_tilt': float(ang['torso_tilt']),
-        'image_path': str(image_path),
-    }
+    workers = (os.cpu_count() or 1) if workers is None else workers
+    workers = max(1, min(workers, len(todo)))
+    todo_paths = [p for p, _ in todo]
+    if workers > 1:
+        ex = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(model_complexity,))
+        results = ex.map(_detect_one, todo_paths, chunksize=max(1, min(32, len(todo) // (workers * 4))))
+    else:
+        ex = None
+        _init_worker(model_complexity)
+        results = map(_detect_one, todo_paths)
     
-    return features
+    start = time.perf_counter()
+    last_report = start
+    try:
+        # 끝나는 대로 캐시에 기록 (중간에 멈춰도 처리한 만큼은 다음 실행에서 재사용)
+        for done, ((path, d), (w, h, kpts, reason)) in enumerate(zip(todo, results), 1):
+            if reason in (None, 'no_pose'):
+                cache.put(d, w, h, kpts)  # 포즈 없음도 기록해서 다시 추정하지 않음
+            else:
+                failures[reason] = failures.get(reason, 0) + 1  # 캐시에 없으므로 2단계에서 자동으로 빠짐
+            now = time.perf_counter()
+            if now - last_report >= 5.0:
+                cache.flush()
+                print(f"  {done}/{len(todo)} images ({done / (now - start):.1f} images/sec)")
+                last_report = now
+    finally:
+        cache.flush()
+        if ex is not None:
+            ex.shutdown(wait=True, cancel_futures=True)
+    elapsed = time.perf_counter() - start
+    print(f"  detected {len(todo)} images in {elapsed:.1f}s "
+          f"({len(todo) / max(elapsed, 1e-9):.1f} images/sec, {workers} worker(s))")
+    return digests, failures
 
-def process_images(exercise, good_dir, bad_dir, output_path):
-    """정자세/오자세 이미지 디렉토리에서 피처 추출"""
-    pose = PoseDetector(model_complexity=1)
-    
-    good_dir = Path(good_dir)
-    bad_dir = Path(bad_dir)
+def features_from_landmarks(tasks, digests, cache):
+    """
+    2단계: 캐시된 랜드마크로 피처 행 생성 (포즈 추정 없음, 전체를 한 번에 벡터 계산)
     
+    Returns:
+        (rows, failures)
+    """
+    found, w, h, detected, kpts = cache.get_many([d if d is not None else b'' for d in digests])
+    angles, _, _, confident = extract_angles_bilateral(kpts, w, h)
+    failures = {'no_pose': int((found & ~detected).sum()),
+                'low_visibility': int((detected & ~confident).sum())}
     rows = []
+    for i in np.flatnonzero(detected & confident):
+        path, label = tasks[i]
+        rows.append({
+            'knee': float(angles[i, 0]),
+            'hip': float(angles[i, 1]),
+            'torso_tilt': float(angles[i, 2]),
+            'image_path': str(path),
+            'label': label,
+            'label_name': LABELS[label],
+        })
+    return rows, {k: v for k, v in failures.items() if v}
+
+def process_images(exercise, good_dir, bad_dir, output_path, workers=None, model_complexity=1, cache_dir=LANDMARK_CACHE):
+    """
+    정자세/오자세 이미지 디렉토리에서 피처 추출
     
-    # 정자세 이미지 처리
-    if good_dir.exists():
-        print(f"Processing good posture images from {good_dir}...")
-        for img_path in good_dir.glob("*.jpg"):
-            feat = extract_features_from_image(img_path, pose)
-            if feat:
-                feat['label'] = 1  # 정자세
-                feat['label_name'] = 'good'
-                rows.append(feat)
-        for img_path in good_dir.glob("*.png"):
-            feat = extract_features_from_image(img_path, pose)
-            if feat:
-                feat['label'] = 1
-                feat['label_name'] = 'good'
-                rows.append(feat)
-        print(f"  Found {len([r for r in rows if r['label'] == 1])} good posture images")
+    Args:
+        exercise: 운동 이름
+        good_dir, bad_dir: 정자세/오자세 이미지 디렉토리
+        output_path: 출력 CSV 경로
+        workers: 워커 프로세스 수 (None이면 CPU 코어 수, 1 이하면 현재 프로세스에서 처리)
+        model_complexity: PoseDetector 모델 복잡도
+        cache_dir: 랜드마크 캐시 디렉터리
+    """
+    tasks = [(p, 1) for p in list_images(good_dir)] + [(p, 0) for p in list_images(bad_dir)]
+    n_good = sum(1 for _, label in tasks if label == 1)
+    print(f"Found {n_good} good / {len(tasks) - n_good} bad images")
+    if not tasks:
+        print("Error: No images processed. Check directory paths.")
+        return
     
-    # 오자세 이미지 처리
-    if bad_dir.exists():
-        print(f"Processing bad posture images from {bad_dir}...")
-        bad_count = 0
-        for img_path in bad_dir.glob("*.jpg"):
-            feat = extract_features_from_image(img_path, pose)
-            if feat:
-                feat['label'] = 0  # 오자세
-                feat['label_name'] = 'bad'
-                rows.append(feat)
-                bad_count += 1
-        for img_path in bad_dir.glob("*.png"):
-            feat = extract_features_from_image(img_path, pose)
-            if feat:
-                feat['label'] = 0
-                feat['label_name'] = 'bad'
-                rows.append(feat)
-                bad_count += 1
-        print(f"  Found {bad_count} bad posture images")
+    start = time.perf_counter()
+    with LandmarkCache(cache_dir, model_complexity=model_complexity, static_image_mode=True) as cache:
+        digests, failures = extract_landmarks([p for p, _ in tasks], cache, workers, model_complexity)
+        rows, feat_failures = features_from_landmarks(tasks, digests, cache)
+    for k, v in feat_failures.items():
+        failures[k] = failures.get(k, 0) + v
+    elapsed = time.perf_counter() - start
     
+    print(f"\nProcessed {len(tasks)} images in {elapsed:.1f}s ({len(tasks) / max(elapsed, 1e-9):.1f} images/sec)")
+    if failures:
+        print("  Failed: " + ", ".join(f"{k}={v}" for k, v in sorted(failures.items())))
     if not rows:
-        print("Error: No images processed. Check directory paths.")
+        print("Error: No pose could be extracted from the images.")
         return
     
-    # DataFrame으로 변환 및 저장
-    df = pd.DataFrame(rows)
+    output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
+    df = pd.DataFrame(rows, columns=FIELDNAMES)
     df.to_csv(output_path, index=False)
-    print(f"\nSaved {len(df)} samples to {output_path}")
+    print(f"Saved {len(df)} samples to {output_path}")
     print(f"  Good: {len(df[df['label'] == 1])} samples")
     print(f"  Bad: {len(df[df['label'] == 0])} samples")
     
@@ -108,6 +191,9 @@ if __name__ == "__main__":
     ap.add_argument("--good_dir", required=True, help="Directory containing good posture images")
     ap.add_argument("--bad_dir", required=True, help="Directory containing bad posture images")
     ap.add_argument("--output", default=None, help="Output CSV path (default: data/labeled/{exercise}_labeled.csv)")
+    ap.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    ap.add_argument("--model_complexity", type=int, default=1, choices=[0, 1, 2], help="PoseDetector model complexity")
+    ap.add_argument("--cache_dir", default=str(LANDMARK_CACHE), help="Landmark cache directory")
     args = ap.parse_args()
     
     if args.output:
@@ -115,5 +201,5 @@ if __name__ == "__main__":
     else:
         output_path = DATA / "labeled" / f"{args.exercise}_labeled.csv"
     
-    process_images(args.exercise, args.good_dir, args.bad_dir, output_path)
-
+    process_images(args.exercise, args.good_dir, args.bad_dir, output_path, args.workers, args.model_complexity,
+                   args.cache_dir)
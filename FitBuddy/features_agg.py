@@ -1,41 +1,161 @@
 # features_agg.py
+# rep_id가 붙은 프레임 파일(*_seg.csv, *.session) → rep별 요약 피처 CSV (data/reps_agg/<운동>_reps.csv)
+# - 파일별 결과를 (경로, 크기, mtime) 키로 캐시해서 바뀐 파일만 다시 계산 (세션 하나 추가 후 재빌드는 거의 즉시)
+# - 바뀐 파일이 여러 개면 프로세스 풀로 나눠 처리
+# - rep별 요약은 groupby().agg 한 번으로 계산 (RepAccumulator.summary와 같은 값)
+# 사용법:
+#   python features_agg.py --exercise squat
+#   python features_agg.py --exercise squat --rebuild      # 캐시 무시하고 전부 다시 계산
+
+import os
+import numpy as np
 import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
 from glob import glob
 from pathlib import Path
-from config import RAW, REPS
-
-def summarize_rep(df):
-    g = {}
-    g["frames"] = len(df)
-    g["knee_min"] = df["knee"].min()
-    g["knee_max"] = df["knee"].max()
-    g["knee_rom"] = g["knee_max"] - g["knee_min"]
-    g["hip_min"]  = df["hip"].min()
-    g["tilt_max"] = df["torso_tilt"].max()
-    g["pct_deep"] = (df["knee"] < 95).mean()
-    g["duration"] = (df["t"].iloc[-1] - df["t"].iloc[0]) if len(df)>1 else 0
-    return g
-
-def build_agg(exercise):
-    files = glob(str(RAW / exercise / "*" / "*_seg.csv"))
-    rows = []
-    for fp in files:
-        df = pd.read_csv(fp)
-        for rid, grp in df.groupby("rep_id"):
-            if rid==-1: continue
-            feat = summarize_rep(grp)
-            feat["exercise"] = exercise
-            feat["source"] = Path(fp).name
-            feat["rep_id"] = int(rid)
-            rows.append(feat)
+from config import RAW, REPS, AGG_WORKERS
+from rep_summary import DEEP_KNEE, REP_FEATURES
+from session_store import SessionReader, is_session, META_FILE
+
+CACHE_DIR = REPS / ".cache"
+CACHE_VERSION = 1  # 피처 정의가 바뀌면 올려서 캐시 무효화
+
+def summarize_reps(df):
+    """
+    rep_id별 요약을 한 번에 계산 (score_live가 rep마다 쓰는 RepAccumulator.summary와 같은 값)
+
+    Args:
+        df: t, knee, hip, torso_tilt, rep_id 열 (DataFrame 또는 배열 dict, rep_id == -1은 rep 밖)
+
+    Returns:
+        rep_id + REP_FEATURES 열의 DataFrame (rep_id 순)
+    """
+    rep_id = np.asarray(df["rep_id"])
+    m = rep_id != -1
+    knee = np.asarray(df["knee"], dtype=float)[m]
+    d = pd.DataFrame({
+        "rep_id": rep_id[m].astype(np.int64),
+        "t": np.asarray(df["t"], dtype=float)[m],
+        "knee": knee,
+        "hip": np.asarray(df["hip"], dtype=float)[m],
+        "torso_tilt": np.asarray(df["torso_tilt"], dtype=float)[m],
+        "deep": (knee < DEEP_KNEE).astype(np.int64),
+    })
+    g = d.groupby("rep_id", sort=True).agg(
+        frames=("t", "size"),
+        knee_min=("knee", "min"),
+        knee_max=("knee", "max"),
+        hip_min=("hip", "min"),
+        tilt_max=("torso_tilt", "max"),
+        n_deep=("deep", "sum"),
+        t_first=("t", "first"),
+        t_last=("t", "last"),
+    )
+    frames = g["frames"].to_numpy(dtype=np.int64)
+    knee_min, knee_max = g["knee_min"].to_numpy(), g["knee_max"].to_numpy()
+    return pd.DataFrame({
+        "rep_id": g.index.to_numpy(dtype=np.int64),
+        "frames": frames,
+        "knee_min": knee_min,
+        "knee_max": knee_max,
+        "knee_rom": knee_max - knee_min,
+        "hip_min": g["hip_min"].to_numpy(),
+        "tilt_max": g["tilt_max"].to_numpy(),
+        "pct_deep": g["n_deep"].to_numpy() / frames,
+        "duration": np.where(frames > 1, g["t_last"].to_numpy() - g["t_first"].to_numpy(), 0.0),
+    }, columns=["rep_id", *REP_FEATURES])
+
+def summarize_session(path):
+    """rep_id 열이 있는 세션의 rep별 요약 (필요한 열만 memmap으로 읽음)"""
+    r = SessionReader(path)
+    if not r.has("rep_id"):
+        return summarize_reps({c: np.empty(0) for c in ("rep_id", "t", "knee", "hip", "torso_tilt")})
+    return summarize_reps({"rep_id": r.column("rep_id"), "t": r.t, "knee": r.angle("knee"),
+                           "hip": r.angle("hip"), "torso_tilt": r.angle("torso_tilt")})
+
+def file_reps(path):
+    """*_seg.csv 또는 세션 하나의 rep별 요약 (프로세스 풀 작업 단위)"""
+    if is_session(path):
+        return summarize_session(path)
+    return summarize_reps(pd.read_csv(path, usecols=["rep_id", "t", "knee", "hip", "torso_tilt"]))
+
+def file_key(path):
+    """캐시 키: (크기, mtime_ns), 세션은 rep_id/각도가 바뀌면 갱신되는 meta.json 기준"""
+    p = Path(path)
+    if p.is_dir():
+        p = p / META_FILE
+    st = p.stat()
+    return (st.st_size, st.st_mtime_ns)
+
+def _load_cache(path):
+    try:
+        cache = pd.read_pickle(path)
+    except Exception:  # 없거나 깨진 캐시는 새로 만듦
+        return {}
+    if not isinstance(cache, dict) or cache.get("version") != CACHE_VERSION:
+        return {}
+    return cache["files"]
+
+def _save_cache(path, files):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".tmp")
+    pd.to_pickle({"version": CACHE_VERSION, "files": files}, tmp)
+    os.replace(tmp, path)
+
+def _dedupe(paths):
+    """같은 녹화의 *_seg.csv와 rep_id가 든 세션(X_seg.session 또는 X.session)이 함께 있으면 세션만 사용"""
+    sessions = {Path(p) for p in paths if is_session(p) and SessionReader(p).has("rep_id")}
+    def twin(p):
+        p = Path(p)
+        return {p.with_suffix(".session"), p.with_name(p.stem[:-len("_seg")] + ".session")} & sessions
+    return [p for p in paths if is_session(p) or not twin(p)]
+
+def build_agg(exercise, workers=None, rebuild=False):
+    """
+    운동별 rep 요약 CSV 생성
+
+    Args:
+        workers: 바뀐 파일 요약에 쓸 프로세스 수 (None이면 config.AGG_WORKERS)
+        rebuild: True면 캐시를 무시하고 모든 파일을 다시 계산
+    """
+    paths = _dedupe(sorted(glob(str(RAW / exercise / "*" / "*_seg.csv")) + glob(str(RAW / exercise / "*" / "*.session"))))
+    cache_path = CACHE_DIR / f"{exercise}.pkl"
+    cache = {} if rebuild else _load_cache(cache_path)
+
+    keys = {p: file_key(p) for p in paths}
+    stale = [p for p in paths if p not in cache or cache[p][0] != keys[p]]
+    workers = AGG_WORKERS if workers is None else workers
+    if len(stale) > 1 and workers > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(stale))) as ex:
+            results = list(ex.map(file_reps, stale, chunksize=max(1, len(stale) // (4 * workers))))
+    else:
+        results = [file_reps(p) for p in stale]
+    for p, reps in zip(stale, results):
+        cache[p] = (keys[p], reps)
+    # 사라진 파일은 캐시에서도 제거
+    removed = len(cache) - len(paths)
+    cache = {p: cache[p] for p in paths}
+    if stale or removed:
+        _save_cache(cache_path, cache)
+
+    frames = []
+    for p in paths:
+        reps = cache[p][1]
+        if len(reps):
+            frames.append(reps.assign(exercise=exercise, source=Path(p).name))
+    cols = [*REP_FEATURES, "exercise", "source", "rep_id"]
+    agg = pd.concat(frames, ignore_index=True)[cols] if frames else pd.DataFrame(columns=cols)
+
     outdir = REPS; outdir.mkdir(parents=True, exist_ok=True)
     out = outdir / f"{exercise}_reps.csv"
-    pd.DataFrame(rows).to_csv(out, index=False)
-    print("saved:", out)
+    agg.to_csv(out, index=False)
+    print(f"saved: {out} ({len(agg)} reps from {len(paths)} files, {len(stale)} recomputed)")
 
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--exercise", required=True)
+    ap.add_argument("--workers", type=int, default=None, help="프로세스 수 (기본 config.AGG_WORKERS)")
+    ap.add_argument("--rebuild", action="store_true", help="캐시 무시하고 전부 다시 계산")
     a = ap.parse_args()
-    build_agg(a.exercise)
+    build_agg(a.exercise, a.workers, a.rebuild)
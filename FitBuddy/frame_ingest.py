@@ -0,0 +1,114 @@
+# frame_ingest.py
+# app.py의 프레임별 DB 기록을 백그라운드 일괄 INSERT로 처리하는 수집기
+# - 캡처 루프는 큐에 넣기만 함 (JSON 직렬화/PostGIS 변환/DB 왕복은 쓰기 스레드에서)
+# - FRAME_FLUSH_SIZE개 또는 FRAME_FLUSH_INTERVAL초마다 세션 하나로 executemany INSERT + commit 한 번
+# - 세션 종료 시 flush()로 남은 프레임을 모두 쓴 뒤 workouts 요약을 갱신
+# - DB 오류가 나면 그 배치만 rollback 하고 실패 행 수를 세며 기록은 계속함 (기존 save_frame_data와 같은 동작)
+# 큐/배치 통계(high-water, 대기 시간, 버린 프레임)는 async_writer.BufferedSink와 같은 형식
+# 사용법:
+#   ingestor = FrameIngestor()
+#   ingestor.put_frame(workout_id, frame_number, knee, hip, tilt, kpts, (x, y))
+#   ingestor.flush()                      # 세션 종료 시
+#   ingestor.close(); print(ingestor.report())
+
+import json
+
+import numpy as np
+from sqlalchemy import insert
+
+# 상대 import와 절대 import 모두 지원
+try:
+    from .async_writer import BufferedSink
+    from .config import FRAME_FLUSH_SIZE, FRAME_FLUSH_INTERVAL, FRAME_QUEUE_SIZE
+    from .models import WorkoutFrame
+except ImportError:
+    from async_writer import BufferedSink
+    from config import FRAME_FLUSH_SIZE, FRAME_FLUSH_INTERVAL, FRAME_QUEUE_SIZE
+    from models import WorkoutFrame
+
+
+def frame_row(workout_id, frame_number, knee_angle, hip_angle, torso_tilt_angle, kpts_data, main_joint_loc):
+    """프레임 하나 → workout_frames INSERT 파라미터 dict"""
+    from geoalchemy2 import WKTElement
+
+    # 키포인트 데이터를 JSON 문자열로 변환 (NumPy 배열은 직접 JSON 직렬화 불가)
+    kpts_json_str = json.dumps(kpts_data.tolist()) if kpts_data is not None else None
+
+    # main_joint_loc (핵심 관절 위치)를 PostGIS POINT로 변환
+    point_geom = None
+    if main_joint_loc:
+        # 픽셀 좌표를 PostGIS Point로 변환 (SRID 4326은 위경도용이지만, 여기서는 픽셀 좌표이므로 0 사용)
+        point_geom = WKTElement(f"POINT({main_joint_loc[0]:.6f} {main_joint_loc[1]:.6f})", srid=0)
+
+    return {
+        "workout_id": workout_id,
+        "frame_number": frame_number,
+        "knee_angle": knee_angle,
+        "hip_angle": hip_angle,
+        "torso_tilt_angle": torso_tilt_angle,
+        "keypoints_json": kpts_json_str,
+        "main_joint_location": point_geom,
+    }
+
+
+class FrameIngestor(BufferedSink):
+    def __init__(self, session_factory=None, flush_size=FRAME_FLUSH_SIZE, flush_interval=FRAME_FLUSH_INTERVAL,
+                 maxsize=FRAME_QUEUE_SIZE, block=True):
+        """
+        Args:
+            session_factory: SQLAlchemy 세션 생성 함수 (None이면 database.SessionLocal, 엔진 커넥션 풀 사용)
+            flush_size: 이만큼 모이면 바로 INSERT
+            flush_interval: 마지막 INSERT 후 이 시간(초)이 지나면 모인 만큼 INSERT
+            maxsize: 큐 최대 프레임 수
+            block: 큐가 가득 찼을 때 True면 기다림, False면 버리고 dropped 증가
+        """
+        if session_factory is None:
+            try:
+                from .database import SessionLocal
+            except ImportError:
+                from database import SessionLocal
+            session_factory = SessionLocal
+        self._session_factory = session_factory
+        self._table = WorkoutFrame.__table__
+        self.rows_failed = 0
+        self.commits = 0
+        super().__init__(self._insert_rows, flush_size=flush_size, flush_interval=flush_interval,
+                         maxsize=maxsize, block=block, name="frames")
+
+    def put_frame(self, workout_id, frame_number, knee_angle, hip_angle, torso_tilt_angle, kpts_data,
+                  main_joint_loc):
+        """프레임 하나 넣기 (키포인트는 복사해 두므로 호출 후 배열을 재사용해도 됨, 버려졌으면 False)"""
+        kpts = np.array(kpts_data, dtype=float) if kpts_data is not None else None
+        return self.put((workout_id, frame_number, knee_angle, hip_angle, torso_tilt_angle, kpts, main_joint_loc))
+
+    def _insert_rows(self, items):
+        db = None
+        try:
+            # 행 변환 오류(잘못된 좌표, geoalchemy2 없음 등)도 이 배치만 실패로 처리하고 계속 기록
+            rows = [frame_row(*item) for item in items]
+            db = self._session_factory()
+            # 파라미터 리스트 하나로 executemany (프레임마다 세션/commit 하지 않음)
+            db.execute(insert(self._table), rows)
+            db.commit()
+            self.commits += 1
+        except Exception as error:
+            print(f"프레임 데이터 저장 실패 ({len(items)}행): {error}")
+            if db is not None:
+                db.rollback()
+            self.rows_failed += len(items)
+            return 0
+        finally:
+            if db is not None:
+                db.close()
+        return sum(len(r["keypoints_json"] or "") for r in rows)
+
+    def stats(self):
+        s = super().stats()
+        # rollback된 배치는 쓴 것으로 세지 않음
+        s["items_written"] -= self.rows_failed
+        s["rows_failed"] = self.rows_failed
+        s["commits"] = self.commits
+        return s
+
+    def report(self):
+        return f"{super().report()}, {self.commits} commits, {self.rows_failed} rows failed"
@@ -0,0 +1,331 @@
+# frame_source.py
+# 실시간 스크립트의 입력을 카메라 외 소스로도 바꿀 수 있게 하는 프레임 소스
+#   camera[:N]        웹캠 (기본 0번)
+#   <video file>      mp4/avi 등 동영상 파일
+#   <directory>       이미지 폴더 (파일 이름 순)
+#   <file>.csv        save_joint_coords.py로 기록한 관절 좌표 CSV (포즈 추정 생략)
+#   <dir>.session     session_store 세션 (키포인트 열이 있어야 함, 포즈 추정 생략)
+#   synthetic[:N]     스쿼트 동작을 흉내 낸 합성 키포인트 N프레임 (포즈 추정 생략)
+# keyed=True면 동영상/이미지 프레임에 내용 기반 키(frame.key)를 붙여서 landmark_cache로 포즈 추정 결과를 재사용
+# (키가 결과를 결정하도록 캐시와 함께 쓰는 detector는 정지 이미지 모드여야 함)
+# 사용법:
+#   with open_source(args.source) as src:
+#       for frame in src:
+#           kpts = frame_keypoints(pose, frame)
+
+import hashlib
+import time
+from pathlib import Path
+
+import numpy as np
+
+# MediaPipe Pose 랜드마크 이름 (인덱스 순서, save_joint_coords.py CSV 컬럼 이름에 사용)
+POSE_LANDMARK_NAMES = [
+    'nose', 'left_eye_inner', 'left_eye', 'left_eye_outer',
+    'right_eye_inner', 'right_eye', 'right_eye_outer',
+    'left_ear', 'right_ear', 'mouth_left', 'mouth_right',
+    'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
+    'left_wrist', 'right_wrist', 'left_pinky', 'right_pinky',
+    'left_index', 'right_index', 'left_thumb', 'right_thumb',
+    'left_hip', 'right_hip', 'left_knee', 'right_knee',
+    'left_ankle', 'right_ankle', 'left_heel', 'right_heel',
+    'left_foot_index', 'right_foot_index'
+]
+
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.bmp')
+
+
+class Frame:
+    """
+    소스에서 나온 프레임 하나
+
+    image: BGR 이미지 (키포인트 소스는 None)
+    kpts: (33, 3) 정규화 키포인트 (이미지 소스는 포즈 추정 전이라 None)
+    key: landmark_cache 키 (keyed 소스의 동영상/이미지 프레임만, 카메라는 None)
+    """
+    __slots__ = ("index", "t", "w", "h", "image", "kpts", "key")
+
+    def __init__(self, index, t, w, h, image=None, kpts=None, key=None):
+        self.index = index
+        self.t = t
+        self.w = w
+        self.h = h
+        self.image = image
+        self.kpts = kpts
+        self.key = key
+
+    def display_image(self):
+        """화면 표시용 이미지 (키포인트 소스는 검은 캔버스)"""
+        if self.image is None:
+            return np.zeros((self.h, self.w, 3), dtype=np.uint8)
+        return self.image
+
+
+class FrameSource:
+    realtime = False   # True면 소비가 느릴 때 프레임을 버려도 됨 (카메라)
+    has_images = True  # False면 포즈 추정 없이 키포인트가 바로 나옴
+    fps = 30.0
+
+    def read(self):
+        """다음 Frame (끝이면 None)"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def __iter__(self):
+        while True:
+            frame = self.read()
+            if frame is None:
+                return
+            yield frame
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class Camera(FrameSource):
+    realtime = True
+
+    def __init__(self, index=0):
+        import cv2
+        self.cap = cv2.VideoCapture(index)
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open camera {index}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._idx = 0
+
+    def read(self):
+        ok, image = self.cap.read()
+        if not ok:
+            return None
+        frame = Frame(self._idx, time.time(), image.shape[1], image.shape[0], image=image)
+        self._idx += 1
+        return frame
+
+    def close(self):
+        self.cap.release()
+
+
+class VideoFile(Camera):
+    realtime = False
+
+    def __init__(self, path, keyed=False):
+        """
+        Args:
+            keyed: True면 파일 내용 해시 + 프레임 번호로 frame.key 생성 (열 때 파일 전체를 한 번 해시)
+        """
+        import cv2
+        self.cap = cv2.VideoCapture(str(path))
+        if not self.cap.isOpened():
+            raise IOError(f"Could not open video {path}")
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS) or 30.0
+        self._idx = 0
+        self._digest = None
+        if keyed:
+            h = hashlib.blake2b(digest_size=16)
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    h.update(block)
+            self._digest = h.digest()
+
+    def read(self):
+        ok, image = self.cap.read()
+        if not ok:
+            return None
+        key = None
+        if self._digest is not None:
+            key = hashlib.blake2b(self._digest + self._idx.to_bytes(8, "little"), digest_size=16).digest()
+        # 재생 속도와 무관하게 영상 기준 시간 사용
+        frame = Frame(self._idx, self._idx / self.fps, image.shape[1], image.shape[0], image=image, key=key)
+        self._idx += 1
+        return frame
+
+
+class ImageDir(FrameSource):
+    def __init__(self, path, fps=30.0, keyed=False):
+        """
+        Args:
+            keyed: True면 이미지 파일 내용 해시를 frame.key로 사용 (landmark_cache와 같은 키)
+        """
+        self.paths = sorted(p for p in Path(path).iterdir() if p.suffix.lower() in IMAGE_EXTS)
+        self.fps = fps
+        self.keyed = keyed
+        self._idx = 0
+
+    def read(self):
+        import cv2
+        while self._idx < len(self.paths):
+            i = self._idx
+            self._idx += 1
+            key = None
+            if self.keyed:
+                # 한 번 읽은 바이트로 해시와 디코딩을 함께 처리
+                data = self.paths[i].read_bytes()
+                key = hashlib.blake2b(data, digest_size=16).digest()
+                image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+            else:
+                image = cv2.imread(str(self.paths[i]))
+            if image is not None:  # 읽을 수 없는 파일은 건너뜀
+                return Frame(i, i / self.fps, image.shape[1], image.shape[0], image=image, key=key)
+        return None
+
+
+class KeypointCSV(FrameSource):
+    has_images = False
+
+    def __init__(self, path, w=640, h=480, fps=30.0):
+        """
+        save_joint_coords.py 형식 CSV ({관절}_x, {관절}_y, {관절}_visibility, timestamp)
+
+        Args:
+            w, h: 기록 당시 카메라 해상도 (각도 계산 시 종횡비에 사용)
+        """
+        import pandas as pd
+        df = pd.read_csv(path)
+        cols = [f"{n}_{c}" for n in POSE_LANDMARK_NAMES for c in ("x", "y", "visibility")]
+        missing = [c for c in cols if c not in df.columns]
+        if missing:
+            raise ValueError(f"{path}: not a joint-coordinate CSV (missing {missing[:3]}...)")
+        self.kpts = df[cols].to_numpy(dtype=float).reshape(len(df), len(POSE_LANDMARK_NAMES), 3)
+        if "timestamp" in df.columns:
+            self.t = df["timestamp"].to_numpy(dtype=float)
+        else:
+            self.t = np.arange(len(df)) / fps
+        self.w, self.h, self.fps = w, h, fps
+        self._idx = 0
+
+    def read(self):
+        i = self._idx
+        if i >= len(self.kpts):
+            return None
+        self._idx += 1
+        return Frame(i, float(self.t[i]), self.w, self.h, kpts=self.kpts[i])
+
+
+class KeypointSession(FrameSource):
+    has_images = False
+
+    def __init__(self, path, fps=30.0):
+        """session_store 세션의 키포인트 열 재생 (memmap이라 긴 녹화도 바로 시작)"""
+        from session_store import SessionReader
+        r = SessionReader(path)
+        if r.kpts is None:
+            raise ValueError(f"{path}: session has no keypoint column")
+        self.kpts, self.t = r.kpts, r.t
+        self.w, self.h = r.meta.get("w", 640), r.meta.get("h", 480)
+        self.fps = fps
+        self._idx = 0
+
+    def read(self):
+        i = self._idx
+        if i >= len(self.kpts):
+            return None
+        self._idx += 1
+        return Frame(i, float(self.t[i]), self.w, self.h, kpts=self.kpts[i].astype(float))
+
+
+class Synthetic(FrameSource):
+    has_images = False
+
+    def __init__(self, n_frames=900, fps=30.0, period=2.0, w=640, h=480, noise=0.002, seed=0):
+        """
+        스쿼트를 반복하는 측면 자세 키포인트 생성 (무릎 약 170° ↔ 85°, period초마다 1회)
+
+        Args:
+            n_frames: 생성할 프레임 수
+            noise: 정규화 좌표에 더할 가우시안 노이즈 표준편차
+        """
+        self.n_frames, self.fps, self.period = n_frames, fps, period
+        self.w, self.h, self.noise = w, h, noise
+        self._rng = np.random.default_rng(seed)
+        self._idx = 0
+
+    def _pose(self, t):
+        depth = (1 - np.cos(2 * np.pi * t / self.period)) / 2   # 0(선 자세) ~ 1(최저점)
+        knee_deg = 170.0 - 85.0 * depth
+        lean = np.radians(10.0 + 30.0 * depth)                  # 상체 앞 기울기 (수직 기준)
+        phi = np.radians((180.0 - knee_deg) / 2)                # 정강이/허벅지가 수직과 이루는 각
+
+        # 픽셀 좌표에서 만든 뒤 정규화 (종횡비 유지)
+        seg = 0.2 * self.h
+        ankle = np.array([0.5 * self.w, 0.9 * self.h])
+        knee = ankle + seg * np.array([np.sin(phi), -np.cos(phi)])
+        hip = knee + seg * np.array([-np.sin(phi), -np.cos(phi)])
+        shoulder = hip + 1.3 * seg * np.array([np.sin(lean), -np.cos(lean)])
+        head = shoulder + 0.4 * seg * np.array([np.sin(lean), -np.cos(lean)])
+        elbow = shoulder + 0.6 * seg * np.array([0.8, 0.6])
+        wrist = elbow + 0.6 * seg * np.array([1.0, 0.0])
+        toe = ankle + np.array([0.3 * seg, 0.0])
+        heel = ankle + np.array([-0.1 * seg, 0.05 * seg])
+
+        pts = np.empty((33, 2))
+        pts[:11] = head
+        for left, right, p in ((11, 12, shoulder), (13, 14, elbow), (15, 16, wrist), (17, 18, wrist),
+                               (19, 20, wrist), (21, 22, wrist), (23, 24, hip), (25, 26, knee),
+                               (27, 28, ankle), (29, 30, heel), (31, 32, toe)):
+            pts[left] = pts[right] = p
+        kpts = np.empty((33, 3))
+        kpts[:, 0] = pts[:, 0] / self.w
+        kpts[:, 1] = pts[:, 1] / self.h
+        kpts[:, :2] += self._rng.normal(0.0, self.noise, (33, 2))
+        kpts[:, 2] = 0.99
+        return kpts
+
+    def read(self):
+        i = self._idx
+        if i >= self.n_frames:
+            return None
+        self._idx += 1
+        t = i / self.fps
+        return Frame(i, t, self.w, self.h, kpts=self._pose(t))
+
+
+def open_source(spec, fps=30.0, keyed=False):
+    """
+    --source 문자열로 프레임 소스 생성
+
+    Args:
+        spec: 'camera', 'camera:1', 'synthetic', 'synthetic:600', 이미지 폴더, .csv, .session, 동영상 경로
+        keyed: True면 동영상/이미지 프레임에 landmark_cache 키를 붙임
+    """
+    spec = str(spec)
+    name, _, arg = spec.partition(":")
+    if name == "camera":
+        return Camera(int(arg) if arg else 0)
+    if name == "synthetic":
+        return Synthetic(n_frames=int(arg) if arg else 900, fps=fps)
+    path = Path(spec)
+    if path.suffix == ".session":
+        return KeypointSession(path, fps=fps)
+    if path.is_dir():
+        return ImageDir(path, fps=fps, keyed=keyed)
+    if path.suffix.lower() == ".csv":
+        return KeypointCSV(path, fps=fps)
+    if not path.exists():
+        raise FileNotFoundError(f"Frame source not found: {spec}")
+    return VideoFile(path, keyed=keyed)
+
+
+def frame_keypoints(pose, frame, cache=None):
+    """
+    이미지 프레임이면 포즈 추정 결과, 키포인트 소스면 기록된 값 (미검출 시 None)
+
+    Args:
+        cache: landmark_cache.LandmarkCache (frame.key가 있는 프레임은 캐시를 먼저 보고, 없으면 추정 후 저장)
+               pose가 static_image_mode=True일 때만 사용 (추적 모드는 캐시 적중으로 건너뛴 프레임 때문에 상태가 어긋남)
+    """
+    if frame.image is None:
+        return frame.kpts
+    use_cache = cache is not None and frame.key is not None
+    if use_cache:
+        hit = cache.get(frame.key)
+        if hit is not None:
+            return hit[2]
+    kpts = pose.to_numpy() if pose.process(frame.image) is not None else None
+    if use_cache:
+        cache.put(frame.key, frame.w, frame.h, kpts)
+    return kpts
@@ -0,0 +1,93 @@
+# inference_executor.py
+# CPU를 많이 쓰는 포즈 추론을 FastAPI 이벤트 루프 밖(프로세스 풀)에서 실행
+# 워커 프로세스마다 미리 초기화한 PoseDetector를 하나씩 들고 있으므로
+# 처리량이 코어 수만큼 늘어나고, /login 같은 가벼운 요청이 추론 뒤에 밀리지 않는다.
+
+import asyncio
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from detector_pool import DetectorPool
+from pose_analysis import analyze_images
+from timing import METRICS, StageTimer
+
+# 워커(또는 스레드 모드의 메인 프로세스) 전역 detector 풀
+_pool = None
+
+
+def _init_worker(pool_size, model_complexity):
+    """워커 시작 시 1회 호출: detector를 미리 만들어 둠"""
+    global _pool
+    # 요청마다 무관한 이미지이므로 정지 이미지 모드 (추적 상태가 다른 요청으로 새지 않음)
+    _pool = DetectorPool(size=pool_size, model_complexity=model_complexity, static_image_mode=True)
+
+
+def _run_analyze(blobs, submitted_at):
+    """워커에서 실행: 분석 결과, 단계별 시간, 해당 워커의 풀 상태를 함께 반환"""
+    timer = StageTimer()
+    # 제출 → 워커 시작까지 대기 시간 (같은 호스트이므로 wall clock 비교)
+    timer.add("queue_wait", max(0.0, time.time() - submitted_at))
+    results = analyze_images(_pool, blobs, timer)
+    return results, timer, os.getpid(), _pool.stats()
+
+
+def _warmup():
+    return os.getpid()
+
+
+class InferenceExecutor:
+    def __init__(self, workers=0, pool_size=4, model_complexity=1):
+        """
+        포즈 추론 실행기
+
+        Args:
+            workers: 추론 워커 프로세스 수 (0이면 프로세스 대신 스레드 + 공유 detector 풀 사용)
+            pool_size: 스레드 모드에서 쓸 detector 풀 크기 (프로세스 모드는 워커당 1개)
+            model_complexity: PoseDetector 모델 복잡도
+        """
+        self.workers = workers
+        self._worker_stats = {}  # pid → 마지막으로 보고된 풀 상태
+        if workers > 0:
+            self.mode = "process"
+            self._executor = ProcessPoolExecutor(
+                max_workers=workers,
+                initializer=_init_worker,
+                initargs=(1, model_complexity),
+            )
+        else:
+            self.mode = "thread"
+            _init_worker(pool_size, model_complexity)
+            self._executor = ThreadPoolExecutor(max_workers=pool_size, thread_name_prefix="pose")
+
+    def warmup(self):
+        """워커 프로세스를 모두 띄워 detector 초기화 비용을 첫 요청 전에 치름"""
+        if self.mode == "process":
+            futures = [self._executor.submit(_warmup) for _ in range(self.workers)]
+            for fut in futures:
+                fut.result()
+
+    async def analyze(self, blobs):
+        """이미지 바이트 목록을 분석해 결과 dict 목록 반환 (요청 순서 유지)"""
+        if self.mode == "process":
+            # memoryview 조각은 pickle이 안 되므로 bytes로 넘김
+            blobs = [bytes(b) for b in blobs]
+        loop = asyncio.get_running_loop()
+        results, timer, pid, stats = await loop.run_in_executor(
+            self._executor, _run_analyze, blobs, time.time())
+        METRICS.record(timer)
+        self._worker_stats[pid] = stats
+        return results
+
+    def stats(self):
+        """실행기/detector 풀 상태"""
+        if self.mode == "thread":
+            return {"mode": self.mode, "pool": _pool.stats()}
+        return {
+            "mode": self.mode,
+            "workers": self.workers,
+            "pools": {str(pid): st for pid, st in self._worker_stats.items()},
+        }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
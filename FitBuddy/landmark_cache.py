@@ -0,0 +1,211 @@
+# landmark_cache.py
+# 이미지/동영상 프레임의 원본 랜드마크(33x3)를 내용 해시 기준으로 저장하는 캐시
+# - 키: 이미지 바이트의 blake2b-128 해시, 파일은 detector 설정(모델 복잡도, 정지 이미지 모드, 신뢰도, mediapipe 버전)별로 분리
+# - 형식: 고정 길이 레코드를 이어 붙인 바이너리 (<설정 키>.lmk) + 설정 설명 (<설정 키>.json)
+#     digest 16B | w uint32 | h uint32 | detected uint8 | (3B) | kpts (33,3) float32   = 424B/레코드
+# - 이어 쓰기만 하므로 중간에 끊겨도 앞의 레코드는 유효 (다음에 열 때 잘린 꼬리만 버림)
+# - 같은 해시가 여러 번 기록되면 마지막 것을 사용
+# 포즈 추정(extract_from_images 등)과 피처 계산을 분리해서, 각도/피처 정의를 바꿔도 MediaPipe를 다시 돌리지 않는다.
+# 사용법:
+#   cache = LandmarkCache(model_complexity=1, static_image_mode=True)
+#   digest, data = digest_file(path)
+#   hit = cache.get(digest)              # None(캐시 없음) 또는 (w, h, kpts 또는 None(미검출))
+#   cache.put(digest, w, h, kpts)
+#   cache.close()
+#   python landmark_cache.py info        # 캐시 파일별 레코드 수/설정
+
+import bisect
+import hashlib
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from config import LANDMARK_CACHE
+
+N_LANDMARKS = 33
+DIGEST_SIZE = 16
+CACHE_SUFFIX = ".lmk"
+RECORD = np.dtype([
+    ("digest", f"V{DIGEST_SIZE}"),
+    ("w", "<u4"),
+    ("h", "<u4"),
+    ("detected", "u1"),
+    ("pad", "V3"),
+    ("kpts", "<f4", (N_LANDMARKS, 3)),
+])
+
+
+def digest_bytes(data):
+    """바이트 내용 → 16바이트 해시"""
+    return hashlib.blake2b(data, digest_size=DIGEST_SIZE).digest()
+
+
+def digest_file(path):
+    """파일 내용 해시 (읽은 바이트도 함께 반환해서 디코딩에 다시 쓰도록)"""
+    with open(path, "rb") as f:
+        data = f.read()
+    return digest_bytes(data), data
+
+
+def detector_config(model_complexity=1, static_image_mode=False, min_detection_confidence=0.5,
+                    min_tracking_confidence=0.5):
+    """캐시를 나누는 detector 설정 (mediapipe 버전이 바뀌면 결과도 달라질 수 있으므로 포함)"""
+    try:
+        from importlib.metadata import version
+        mp_version = version("mediapipe")
+    except Exception:
+        mp_version = "unknown"
+    return {
+        "model_complexity": int(model_complexity),
+        "static_image_mode": bool(static_image_mode),
+        "min_detection_confidence": float(min_detection_confidence),
+        "min_tracking_confidence": float(min_tracking_confidence),
+        "mediapipe": mp_version,
+    }
+
+
+def config_key(config):
+    """설정 dict → 캐시 파일 이름에 쓰는 짧은 키"""
+    blob = json.dumps(config, sort_keys=True).encode("utf-8")
+    return hashlib.blake2b(blob, digest_size=6).hexdigest()
+
+
+class LandmarkCache:
+    def __init__(self, root=LANDMARK_CACHE, flush_every=256, **detector_kwargs):
+        """
+        Args:
+            root: 캐시 디렉터리
+            flush_every: 새 레코드가 이만큼 쌓이면 디스크에 씀
+            **detector_kwargs: detector_config 인자 (model_complexity, static_image_mode, ...)
+        """
+        self.config = detector_config(**detector_kwargs)
+        self.key = config_key(self.config)
+        self.root = Path(root)
+        self.path = self.root / f"{self.key}{CACHE_SUFFIX}"
+        self.flush_every = flush_every
+        self.root.mkdir(parents=True, exist_ok=True)
+        meta_path = self.root / f"{self.key}.json"
+        if not meta_path.exists():
+            meta_path.write_text(json.dumps(self.config, indent=1), encoding="utf-8")
+
+        self._f = open(self.path, "ab")
+        # 비정상 종료로 잘린 레코드가 있으면 잘라냄
+        n = self._f.tell() // RECORD.itemsize
+        if self._f.tell() != n * RECORD.itemsize:
+            self._f.truncate(n * RECORD.itemsize)
+            self._f.seek(0, os.SEEK_END)
+        rows = np.fromfile(self.path, dtype=RECORD, count=n) if n else np.empty(0, dtype=RECORD)
+        self._index = {bytes(d): i for i, d in enumerate(rows["digest"].tolist())}  # 해시 → 레코드 번호
+        self._chunks = [rows]   # 파일에 쓴 레코드 (flush마다 조각 추가, 전체 복사 없음)
+        self._starts = [0]      # 조각별 첫 레코드 번호
+        self._n_written = n
+        self._pending = []      # 아직 파일에 쓰지 않은 레코드
+
+        # 통계
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._index)
+
+    def __contains__(self, digest):
+        return digest in self._index
+
+    def _record(self, i):
+        if i >= self._n_written:
+            return self._pending[i - self._n_written]
+        k = bisect.bisect_right(self._starts, i) - 1
+        return self._chunks[k][i - self._starts[k]]
+
+    def _all_rows(self):
+        """파일에 쓴 레코드 전체를 한 배열로 (조각이 여러 개면 합쳐 둠)"""
+        if len(self._chunks) > 1:
+            self._chunks, self._starts = [np.concatenate(self._chunks)], [0]
+        return self._chunks[0]
+
+    def get(self, digest):
+        """
+        Returns:
+            None (캐시에 없음) 또는 (w, h, kpts) — 포즈를 찾지 못한 이미지는 kpts가 None
+        """
+        i = self._index.get(digest)
+        if i is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        rec = self._record(i)
+        kpts = rec["kpts"].astype(float) if rec["detected"] else None
+        return int(rec["w"]), int(rec["h"]), kpts
+
+    def get_many(self, digests):
+        """
+        여러 해시를 한 번에 조회 (피처 일괄 재계산용)
+
+        Returns:
+            found (N,) bool, w (N,), h (N,), detected (N,) bool, kpts (N, 33, 3) float32
+        """
+        self.flush()
+        idx = np.array([self._index.get(d, -1) for d in digests], dtype=np.int64)
+        found = idx >= 0
+        all_rows = self._all_rows()
+        rows = all_rows[np.where(found, idx, 0)] if len(all_rows) else np.zeros(len(idx), dtype=RECORD)
+        self.hits += int(found.sum())
+        self.misses += int((~found).sum())
+        detected = found & (rows["detected"] == 1)
+        return found, rows["w"], rows["h"], detected, rows["kpts"]
+
+    def put(self, digest, w, h, kpts):
+        """랜드마크 저장 (kpts가 None이면 '포즈 없음'으로 기록해서 다음에도 추론을 건너뜀)"""
+        rec = np.zeros((), dtype=RECORD)
+        rec["digest"] = np.void(digest)
+        rec["w"], rec["h"] = w, h
+        if kpts is not None:
+            rec["detected"] = 1
+            rec["kpts"] = np.asarray(kpts, dtype=np.float32)[:N_LANDMARKS]
+        self._index[digest] = self._n_written + len(self._pending)
+        self._pending.append(rec)
+        if len(self._pending) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        new = np.array(self._pending, dtype=RECORD)
+        self._f.write(new.tobytes())
+        self._f.flush()
+        self._chunks.append(new)
+        self._starts.append(self._n_written)
+        self._n_written += len(new)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        os.fsync(self._f.fileno())
+        self._f.close()
+
+    def stats(self):
+        return {"path": str(self.path), "records": len(self), "bytes": len(self) * RECORD.itemsize,
+                "hits": self.hits, "misses": self.misses, "config": self.config}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Landmark cache tools")
+    ap.add_argument("cmd", choices=["info"])
+    ap.add_argument("--root", default=str(LANDMARK_CACHE))
+    args = ap.parse_args()
+
+    root = Path(args.root)
+    for p in sorted(root.glob(f"*{CACHE_SUFFIX}")):
+        n = p.stat().st_size // RECORD.itemsize
+        meta = root / f"{p.stem}.json"
+        config = json.loads(meta.read_text(encoding="utf-8")) if meta.exists() else {}
+        print(f"{p.name}: {n} records ({p.stat().st_size / 1e6:.2f} MB) {config}")
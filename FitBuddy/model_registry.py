@@ -0,0 +1,210 @@
+# model_registry.py
+# config.MODELS 아래 모델을 프로세스 안에서 한 번만 로드해 카운터/스레드/API 핸들러가 공유
+# - (exercise, kind)로 처음 요청될 때 로드 (lazy)
+# - 트리 앙상블은 CompiledForest로 컴파일한 결과를 models/.compiled/ 에 캐시하고
+#   joblib mmap_mode='r'로 열어서, fork된 워커들이 같은 페이지(page cache)를 공유
+# - 파일 mtime이 바뀌면 재시작 없이 다시 로드 (실패하면 이전 모델 유지)
+# 사용법:
+#   from model_registry import MODEL_REGISTRY
+#   model = MODEL_REGISTRY.get("squat", "from_images")   # 없으면 None
+
+import os
+import threading
+import time
+from pathlib import Path
+
+import joblib
+import numpy as np
+
+from config import MODELS, MODEL_CHECK_INTERVAL
+from compiled_forest import CompiledForest, compile_model
+from posture_lut import LUTScorer
+
+# kind → 파일 이름 규칙
+MODEL_FILES = {
+    "rf": "{exercise}_rf.pkl",                          # train_baseline.py (rep 요약 피처)
+    "from_images": "{exercise}_from_images.pkl",        # train_from_images.py (프레임 각도)
+    "lut": "{exercise}_from_images_lut.npz",            # posture_lut.py
+}
+
+
+def _rss_bytes():
+    """현재 프로세스 RSS (리눅스 외에는 None)"""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _array_bytes(obj):
+    """모델이 들고 있는 NumPy 배열 크기: (mmap으로 공유되는 바이트, 프로세스 힙 바이트)"""
+    mapped = heap = 0
+    for v in vars(obj).values() if hasattr(obj, "__dict__") else ():
+        if isinstance(v, np.ndarray):
+            # mmap 배열은 base를 따라가면 np.memmap / mmap.mmap이 나옴
+            base = v
+            while getattr(base, "base", None) is not None and not isinstance(base, np.memmap):
+                base = base.base
+            if isinstance(base, np.memmap) or type(base).__name__ == "mmap":
+                mapped += v.nbytes
+            else:
+                heap += v.nbytes
+    return mapped, heap
+
+
+def _unwrap_memmaps(obj):
+    """np.memmap 속성을 일반 ndarray 뷰로 바꿈 (메모리는 그대로 공유, 연산 시 서브클래스 오버헤드 제거)"""
+    for k, v in list(vars(obj).items()):
+        if isinstance(v, np.memmap):
+            setattr(obj, k, np.asarray(v))
+    return obj
+
+
+class _Entry:
+    __slots__ = ("model", "path", "mtime_ns", "checked_at", "load_ms", "loaded_at", "version",
+                 "hits", "source")
+
+    def __init__(self):
+        self.model = None
+        self.version = 0
+        self.hits = 0
+
+
+class ModelRegistry:
+    def __init__(self, root=MODELS, check_interval=MODEL_CHECK_INTERVAL, mmap=True):
+        """
+        모델 공유 레지스트리
+
+        Args:
+            root: 모델 디렉터리
+            check_interval: 같은 모델의 mtime을 다시 확인하기까지 최소 간격 (초)
+            mmap: 컴파일 캐시를 mmap으로 열지 여부
+        """
+        self.root = Path(root)
+        self.check_interval = check_interval
+        self.mmap = mmap
+        self._entries = {}  # 절대 경로 → _Entry
+        self._lock = threading.Lock()
+
+    def path_for(self, exercise, kind="from_images"):
+        if kind not in MODEL_FILES:
+            raise KeyError(f"Unknown model kind: {kind} (expected one of {list(MODEL_FILES)})")
+        return self.root / MODEL_FILES[kind].format(exercise=exercise)
+
+    def get(self, exercise, kind="from_images"):
+        """(exercise, kind) 모델 반환. 파일이 없으면 None"""
+        return self.load(self.path_for(exercise, kind))
+
+    def load(self, path):
+        """
+        경로로 모델 반환 (처음이면 로드, 파일이 바뀌었으면 다시 로드)
+
+        Returns:
+            모델 객체 (트리 앙상블은 CompiledForest, .npz는 LUTScorer) 또는 None
+        """
+        key = str(Path(path).resolve())
+        now = time.monotonic()
+        entry = self._entries.get(key)
+        # 빠른 경로: 최근에 확인했으면 잠금 없이 바로 반환
+        if entry is not None and entry.model is not None and now - entry.checked_at < self.check_interval:
+            entry.hits += 1
+            return entry.model
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                entry = self._entries[key] = _Entry()
+                entry.path = key
+            try:
+                mtime_ns = os.stat(key).st_mtime_ns
+            except OSError:
+                # 파일이 지워졌으면 로드된 모델도 버림
+                entry.model = None
+                entry.checked_at = now
+                return None
+            entry.checked_at = now
+            if entry.model is not None and mtime_ns == entry.mtime_ns:
+                entry.hits += 1
+                return entry.model
+
+            t0 = time.perf_counter()
+            try:
+                model, source = self._load_file(Path(key), mtime_ns)
+            except Exception as e:
+                if entry.model is None:
+                    raise
+                # 저장 중인 파일을 읽었을 수 있음 → 이전 모델을 유지하고 다음 확인 때 다시 시도
+                print(f"Warning: reload of {key} failed ({e}); keeping version {entry.version}")
+                return entry.model
+            entry.model = model
+            entry.source = source
+            entry.mtime_ns = mtime_ns
+            entry.load_ms = (time.perf_counter() - t0) * 1000.0
+            entry.loaded_at = time.time()
+            entry.version += 1
+            entry.hits += 1
+            if entry.version > 1:
+                print(f"Reloaded model {key} (version {entry.version})")
+            return model
+
+    def _load_file(self, path, mtime_ns):
+        if path.suffix == ".npz":
+            return LUTScorer(path), "lut"
+        mmap_mode = "r" if self.mmap else None
+
+        cache = self._compiled_cache_path(path, mtime_ns)
+        if cache.exists():
+            return _unwrap_memmaps(joblib.load(cache, mmap_mode=mmap_mode)), "compiled_cache"
+
+        model = compile_model(joblib.load(path, mmap_mode=mmap_mode))
+        if not isinstance(model, CompiledForest):
+            return model, "pickle"
+
+        # 컴파일 결과를 비압축으로 저장해 두면 다음부터(다른 워커 포함) mmap으로 열 수 있음
+        try:
+            cache.parent.mkdir(parents=True, exist_ok=True)
+            for old in cache.parent.glob(f"{path.stem}.*.joblib"):
+                old.unlink()
+            tmp = cache.with_name(f"{cache.name}.{os.getpid()}.tmp")
+            joblib.dump(model, tmp)
+            os.replace(tmp, cache)  # 다른 프로세스가 쓰다 만 파일을 읽지 않도록 원자적 교체
+            if self.mmap:
+                model = _unwrap_memmaps(joblib.load(cache, mmap_mode=mmap_mode))
+            return model, "compiled_cache"
+        except OSError as e:
+            print(f"Warning: could not write compiled cache for {path}: {e}")
+            return model, "compiled"
+
+    def _compiled_cache_path(self, path, mtime_ns):
+        # 원본 mtime을 이름에 넣어서 모델이 바뀌면 캐시가 자동으로 무효화되게 함
+        return path.parent / ".compiled" / f"{path.stem}.{mtime_ns}.joblib"
+
+    def stats(self):
+        """로드된 모델별 상태와 프로세스 메모리"""
+        models = {}
+        with self._lock:
+            for key, e in self._entries.items():
+                if e.model is None:
+                    continue
+                mapped, heap = _array_bytes(e.model)
+                models[Path(key).name] = {
+                    "path": key,
+                    "type": type(e.model).__name__,
+                    "source": e.source,
+                    "version": e.version,
+                    "load_ms": round(e.load_ms, 2),
+                    "loaded_at": e.loaded_at,
+                    "hits": e.hits,
+                    "mapped_bytes": mapped,
+                    "heap_bytes": heap,
+                }
+        return {"models": models, "rss_bytes": _rss_bytes()}
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+# 프로세스 전역 레지스트리
+MODEL_REGISTRY = ModelRegistry()
@@ -0,0 +1,209 @@
+# pipeline.py
+# 실시간 루프를 스레드 단계(capture → inference → ...)로 나누고 크기 제한 큐로 연결
+# - 카메라 읽기/화면 출력이 추론을 막지 않고, 전체 FPS는 가장 느린 단계(추론)로 결정됨
+# - capture 큐는 가득 차면 가장 오래된 프레임을 버림 (지연이 쌓이지 않음, 파일 재생은 버리지 않게 설정 가능)
+# - cv2.imshow/waitKey는 메인 스레드에서만 호출해야 하므로 마지막 단계 출력은 메인 스레드가 꺼내 씀
+# 사용법:
+#   pipe = Pipeline()
+#   pipe.add_source("capture", read_frame)          # 프레임 반환, 끝이면 None
+#   pipe.add_stage("inference", analyze, maxsize=1)  # None을 반환하면 그 프레임은 버림
+#   for out in pipe.run():                           # 메인 스레드에서 렌더링
+#       ...
+#   print(pipe.report())
+
+import collections
+import threading
+import time
+
+_END = object()  # 스트림 종료 표시
+
+
+class DropOldestQueue:
+    """가득 차면 가장 오래된 항목을 버리고 넣는 큐 (put이 절대 막히지 않음)"""
+
+    def __init__(self, maxsize=1):
+        self.maxsize = maxsize
+        self._items = collections.deque()
+        self._cond = threading.Condition()
+        self.dropped = 0
+        self.high_water = 0
+
+    def put(self, item):
+        with self._cond:
+            if item is not _END:
+                while len(self._items) >= self.maxsize:
+                    self._items.popleft()
+                    self.dropped += 1
+            self._items.append(item)
+            if item is not _END:
+                self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify()
+
+    def get(self, timeout=None):
+        """항목 하나 꺼냄 (timeout 동안 없으면 None)"""
+        with self._cond:
+            if not self._items and not self._cond.wait_for(lambda: self._items, timeout):
+                return None
+            return self._items.popleft()
+
+    def qsize(self):
+        return len(self._items)
+
+
+class BlockingQueue(DropOldestQueue):
+    """가득 차면 put이 기다리는 큐 (프레임을 버리면 안 되는 단계 사이에 사용)"""
+
+    def __init__(self, maxsize=1, stop_event=None):
+        super().__init__(maxsize)
+        self._stop = stop_event
+
+    def put(self, item):
+        with self._cond:
+            while len(self._items) >= self.maxsize and item is not _END:
+                if self._stop is not None and self._stop.is_set():
+                    return
+                self._cond.wait(0.05)
+            self._items.append(item)
+            if item is not _END:
+                self.high_water = max(self.high_water, len(self._items))
+            self._cond.notify_all()
+
+    def get(self, timeout=None):
+        item = super().get(timeout)
+        with self._cond:
+            self._cond.notify_all()  # put에서 기다리는 생산자 깨움
+        return item
+
+
+class StageStats:
+    def __init__(self, name):
+        self.name = name
+        self.count = 0        # 처리한 항목 수
+        self.skipped = 0      # 함수가 None을 반환해 버린 항목 수
+        self.busy = 0.0       # 함수 실행에 쓴 시간 (초)
+        self.started = None
+        self.last = None
+
+    def as_dict(self, queue=None):
+        elapsed = (self.last - self.started) if self.started and self.last else 0.0
+        out = {
+            "count": self.count,
+            "skipped": self.skipped,
+            "fps": (self.count / elapsed) if elapsed > 0 else 0.0,
+            "avg_ms": (self.busy / self.count * 1000.0) if self.count else 0.0,
+        }
+        if queue is not None:
+            out.update(queue_depth=queue.qsize(), queue_max=queue.maxsize,
+                       queue_high_water=queue.high_water, dropped=queue.dropped)
+        return out
+
+
+class Pipeline:
+    def __init__(self):
+        self._stages = []   # [(name, fn, in_queue or None, out_queue, stats)]
+        self._threads = []
+        self._stop = threading.Event()
+        self.error = None
+
+    def add_source(self, name, read_fn, maxsize=1, drop_oldest=True):
+        """
+        첫 단계: read_fn()을 반복 호출 (None이면 종료)
+
+        Args:
+            drop_oldest: True면 출력 큐가 가득 찼을 때 오래된 프레임을 버림 (카메라)
+                         False면 뒤 단계를 기다림 (파일 재생처럼 모든 프레임을 처리해야 할 때)
+        """
+        out = DropOldestQueue(maxsize) if drop_oldest else BlockingQueue(maxsize, self._stop)
+        self._stages.append((name, read_fn, None, out, StageStats(name)))
+        return self
+
+    def add_stage(self, name, fn, maxsize=1, drop_oldest=False):
+        """
+        처리 단계 추가
+
+        Args:
+            fn: 이전 단계 출력 → 다음 단계 입력 (None을 반환하면 해당 항목 버림)
+            maxsize: 출력 큐 크기
+            drop_oldest: True면 출력 큐가 가득 찼을 때 오래된 것을 버림 (뒤 단계가 이 단계를 막지 않음)
+        """
+        if not self._stages:
+            raise RuntimeError("add_source() must be called before add_stage()")
+        inq = self._stages[-1][3]
+        out = DropOldestQueue(maxsize) if drop_oldest else BlockingQueue(maxsize, self._stop)
+        self._stages.append((name, fn, inq, out, StageStats(name)))
+        return self
+
+    def _run_stage(self, fn, inq, outq, stats):
+        stats.started = time.perf_counter()
+        try:
+            while not self._stop.is_set():
+                if inq is None:
+                    t0 = time.perf_counter()
+                    item = fn()
+                    if item is None:
+                        break
+                else:
+                    item = inq.get(timeout=0.1)
+                    if item is None:
+                        continue
+                    if item is _END:
+                        break
+                    t0 = time.perf_counter()
+                    item = fn(item)
+                t1 = time.perf_counter()
+                stats.busy += t1 - t0
+                stats.last = t1
+                if item is None:
+                    stats.skipped += 1
+                    continue
+                stats.count += 1
+                outq.put(item)
+        except Exception as e:
+            self.error = e
+            self._stop.set()
+        finally:
+            outq.put(_END)
+
+    def start(self):
+        for name, fn, inq, outq, stats in self._stages:
+            t = threading.Thread(target=self._run_stage, args=(fn, inq, outq, stats),
+                                 name=f"pipeline-{name}", daemon=True)
+            t.start()
+            self._threads.append(t)
+        return self
+
+    def run(self):
+        """스레드를 시작하고 마지막 단계 출력을 메인 스레드에서 하나씩 돌려줌"""
+        if not self._threads:
+            self.start()
+        outq = self._stages[-1][3]
+        try:
+            while True:
+                item = outq.get(timeout=0.1)
+                if item is None:
+                    if self._stop.is_set() and not any(t.is_alive() for t in self._threads):
+                        break
+                    continue
+                if item is _END:
+                    break
+                yield item
+        finally:
+            self.stop()
+        if self.error is not None:
+            raise self.error
+
+    def stop(self, timeout=2.0):
+        self._stop.set()
+        for t in self._threads:
+            t.join(timeout)
+
+    def stats(self):
+        """단계별 {count, skipped, fps, avg_ms, queue_depth, queue_max, queue_high_water, dropped}"""
+        return {name: stats.as_dict(outq) for name, _, _, outq, stats in self._stages}
+
+    def report(self):
+        lines = [f"{'stage':<12} {'count':>7} {'fps':>7} {'avg_ms':>8} {'queue':>7} {'hwm':>4} {'dropped':>8}"]
+        for name, s in self.stats().items():
+            lines.append(f"{name:<12} {s['count']:>7} {s['fps']:>7.1f} {s['avg_ms']:>8.2f} "
+                         f"{s['queue_depth']:>3}/{s['queue_max']:<3} {s['queue_high_water']:>4} {s['dropped']:>8}")
+        return "\n".join(lines)
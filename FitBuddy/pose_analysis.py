@@ -0,0 +1,94 @@
+# pose_analysis.py
+# 서버 포즈 분석 공통 로직 (이미지 디코딩 → 포즈 검출 → 각도 → 피드백)
+# FastAPI에 의존하지 않으므로 추론 워커 프로세스에서도 그대로 import 해서 쓴다.
+
+import cv2
+import numpy as np
+
+from angles import extract_angles_auto
+from timing import StageTimer
+
+
+def decode_image(img_bytes):
+    """JPEG/PNG 바이트를 복사 없이 OpenCV 이미지로 디코딩 (실패 시 None)"""
+    if not img_bytes:
+        return None
+    # NumPy의 frombuffer 함수 사용 (일부 버전에서는 없을 수 있음)
+    try:
+        np_arr = np.frombuffer(img_bytes, dtype=np.uint8)
+    except (AttributeError, TypeError):
+        # 대안: bytearray를 numpy 배열로 변환
+        np_arr = np.array(bytearray(img_bytes), dtype=np.uint8)
+    return cv2.imdecode(np_arr, cv2.IMREAD_COLOR)
+
+
+def knee_feedback(knee):
+    """무릎 각도 기반 피드백 문구 (예시)"""
+    if knee < 40:
+        return "너무 깊어요! 무릎을 조금 펴주세요."
+    elif knee < 70:
+        return "좋아요! 안정적인 자세입니다."
+    elif knee < 110:
+        return "조금 더 내려가보세요!"
+    return "무릎을 더 굽혀야 해요!"
+
+
+def failed_result(feedback):
+    """분석 실패 응답 (각도는 -1)"""
+    return {"knee_angle": -1.0, "hip_angle": -1.0, "torso_tilt": -1.0, "feedback": feedback}
+
+
+def analyze_frame(pose, frame, timer=None):
+    """이미 빌려온 detector로 프레임 한 장을 분석해 응답 dict 반환"""
+    timer = timer if timer is not None else StageTimer()
+    if frame is None:
+        return failed_result("이미지를 처리할 수 없습니다.")
+
+    # 1. Pose detection
+    with timer.stage("pose_process"):
+        lms = pose.process(frame)
+    with timer.stage("to_numpy"):
+        kpts = pose.to_numpy() if lms is not None else None
+
+    if kpts is None:
+        return failed_result("사람이 화면에 정확히 나타나지 않습니다.")
+
+    # 2. 각도 계산 (가시성이 더 좋은 쪽 자동 선택)
+    with timer.stage("extract_angles"):
+        h, w = frame.shape[:2]
+        ang, _, confident = extract_angles_auto(kpts, w=w, h=h)
+
+    if not confident:
+        return failed_result("관절이 가려져 잘 보이지 않습니다. 몸 옆면 전체가 보이도록 서주세요.")
+
+    knee = float(ang.get("knee", -1))
+    hip = float(ang.get("hip", -1))
+    tilt = float(ang.get("torso_tilt", -1))
+
+    # 3. 최종 응답
+    with timer.stage("feedback"):
+        fb = knee_feedback(knee)
+    return {
+        "knee_angle": knee,
+        "hip_angle": hip,
+        "torso_tilt": tilt,
+        "feedback": fb,
+    }
+
+
+def analyze_images(pool, blobs, timer=None):
+    """여러 이미지 바이트를 풀에서 빌린 detector 하나로 연달아 분석"""
+    timer = timer if timer is not None else StageTimer()
+    frames = []
+    for b in blobs:
+        with timer.stage("imdecode"):
+            frames.append(decode_image(b))
+    if all(frame is None for frame in frames):
+        return [analyze_frame(None, None) for _ in frames]
+
+    with timer.stage("detector_checkout"):
+        pose = pool.acquire()
+    try:
+        return [analyze_frame(pose, frame, timer) for frame in frames]
+    finally:
+        pool.release(pose)
@@ -4,9 +4,15 @@ mp_drawing = mp.solutions.drawing_utils
 mp_styles  = mp.solutions.drawing_styles
 
 class PoseDetector:
-    def __init__(self, model_complexity=1):
+    def __init__(self, model_complexity=1, static_image_mode=False):
+        """
+        Args:
+            model_complexity: 0/1/2 (클수록 정확하지만 느림)
+            static_image_mode: True면 프레임마다 새로 검출 (서로 무관한 사진용, 이전 프레임 추적 상태를 쓰지 않음)
+        """
         self.mp_pose = mp.solutions.pose
         self.pose = self.mp_pose.Pose(
+            static_image_mode=static_image_mode,
             model_complexity=model_complexity,
             enable_segmentation=False,
             min_detection_confidence=0.5,
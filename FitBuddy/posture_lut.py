@@ -0,0 +1,175 @@
+# posture_lut.py
+# 저차원 자세 모델(knee, hip, torso_tilt → 정자세 확률)을 각도 격자 룩업 테이블로 내보내고,
+# 실행 시에는 모델 대신 테이블 보간으로 O(1) 점수 계산
+# 사용법:
+#   python posture_lut.py --exercise squat --step 1
+#   (models/squat_from_images.pkl → models/squat_from_images_lut.npz)
+
+import time
+from pathlib import Path
+
+import numpy as np
+
+from config import MODELS
+from compiled_forest import compile_model
+
+FEATURES = ("knee", "hip", "torso_tilt")
+# 각도 범위: 관절 각도는 0~180°, 상체 기울기는 arctan2(|dy|, |dx|)라서 0~90°
+DEFAULT_BOUNDS = ((0.0, 180.0), (0.0, 180.0), (0.0, 90.0))
+
+
+def lut_path_for(model_path):
+    model_path = Path(model_path)
+    return model_path.with_name(model_path.stem + "_lut.npz")
+
+
+def _good_column(model):
+    classes = list(getattr(model, "classes_", [0, 1]))
+    return classes.index(1) if 1 in classes else len(classes) - 1
+
+
+def _predict_good(model, X, chunk=20000):
+    col = _good_column(model)
+    out = np.empty(len(X))
+    for s in range(0, len(X), chunk):
+        out[s:s + chunk] = model.predict_proba(X[s:s + chunk])[:, col]
+    return out
+
+
+def export_lut(model, out_path, step=1.0, bounds=DEFAULT_BOUNDS, dtype="uint8", n_check=20000, seed=0):
+    """
+    모델의 정자세 확률을 각도 격자 위에서 미리 계산해 저장
+
+    Args:
+        model: predict_proba를 가진 모델 (트리 앙상블은 자동 컴파일)
+        out_path: 저장할 .npz 경로
+        step: 격자 간격 (도)
+        bounds: 피처별 (최소, 최대) 각도
+        dtype: 'uint8' (확률을 0~255로 양자화), 'float16', 'float32'
+        n_check: 격자 밖 임의 지점에서 원래 모델과 비교할 샘플 수
+
+    Returns:
+        {'grid_max_err', 'offgrid_max_err', 'offgrid_mean_err', 'bytes', 'seconds'}
+    """
+    t0 = time.perf_counter()
+    model = compile_model(model)
+    axes = [np.arange(lo, hi + step * 0.5, step) for lo, hi in bounds]
+    shape = tuple(len(a) for a in axes)
+    grid = np.stack(np.meshgrid(*axes, indexing="ij"), axis=-1).reshape(-1, len(axes))
+    probs = _predict_good(model, grid)
+
+    if dtype == "uint8":
+        table = np.round(probs * 255).astype(np.uint8)
+        scale = 1.0 / 255
+    else:
+        table = probs.astype(dtype)
+        scale = 1.0
+    table = table.reshape(shape)
+
+    out_path = Path(out_path)
+    out_path.parent.mkdir(parents=True, exist_ok=True)
+    np.savez(out_path, table=table, lo=np.array([b[0] for b in bounds]), step=np.float64(step),
+             scale=np.float64(scale), features=np.array(FEATURES))
+
+    # 오차 확인: 격자점(양자화 오차) / 격자 사이 임의 지점(보간 오차)
+    scorer = LUTScorer(out_path)
+    grid_err = float(np.max(np.abs(table.reshape(-1) * scale - probs)))
+    rng = np.random.default_rng(seed)
+    X = np.column_stack([rng.uniform(lo, hi, n_check) for lo, hi in bounds])
+    diff = np.abs(scorer.score_many(X) - _predict_good(model, X))
+    return {
+        "grid_max_err": grid_err,
+        "offgrid_max_err": float(diff.max()),
+        "offgrid_mean_err": float(diff.mean()),
+        "bytes": int(table.nbytes),
+        "seconds": time.perf_counter() - t0,
+    }
+
+
+class LUTScorer:
+    """룩업 테이블 기반 정자세 확률 (삼선형 보간, 범위 밖 입력은 경계로 자름)"""
+
+    def __init__(self, path, interpolate=True):
+        with np.load(path) as z:
+            self.table = np.ascontiguousarray(z["table"])
+            self.lo = z["lo"].astype(float)
+            self.step = float(z["step"])
+            self.scale = float(z["scale"])
+        self.interpolate = interpolate
+        self.shape = self.table.shape
+        # 스칼라 경로는 memoryview로 읽음 (NumPy 스칼라 인덱싱보다 훨씬 빠름)
+        # (memoryview는 float16을 못 읽으므로 float16 테이블은 float32 사본을 씀)
+        flat = self.table.reshape(-1)
+        self._flat = memoryview(flat.astype(np.float32) if flat.dtype == np.float16 else flat)
+        self._lo = [float(v) for v in self.lo]
+        self._hi = [float(n - 1) for n in self.shape]
+        self._strides = [self.shape[1] * self.shape[2], self.shape[2], 1]
+        self.classes_ = np.array([0, 1])
+
+    def prob_good(self, knee, hip, tilt):
+        """프레임 하나의 정자세 확률"""
+        flat, st = self._flat, self._strides
+        idx, frac = [], []
+        for v, lo, hi in zip((knee, hip, tilt), self._lo, self._hi):
+            g = (v - lo) / self.step
+            g = 0.0 if g < 0.0 else (hi if g > hi else g)
+            i = int(g)
+            if i >= hi:
+                i = int(hi) - 1 if hi >= 1 else 0
+            idx.append(i)
+            frac.append(g - i)
+        base = idx[0] * st[0] + idx[1] * st[1] + idx[2]
+        if not self.interpolate:
+            return float(flat[base + (frac[0] >= 0.5) * st[0] + (frac[1] >= 0.5) * st[1] + (frac[2] >= 0.5)]) * self.scale
+        fx, fy, fz = frac
+        c00 = flat[base] * (1 - fz) + flat[base + 1] * fz
+        c01 = flat[base + st[1]] * (1 - fz) + flat[base + st[1] + 1] * fz
+        c10 = flat[base + st[0]] * (1 - fz) + flat[base + st[0] + 1] * fz
+        c11 = flat[base + st[0] + st[1]] * (1 - fz) + flat[base + st[0] + st[1] + 1] * fz
+        c0 = c00 * (1 - fy) + c01 * fy
+        c1 = c10 * (1 - fy) + c11 * fy
+        return float(c0 * (1 - fx) + c1 * fx) * self.scale
+
+    def score_many(self, X):
+        """(n, 3) 각도 → (n,) 정자세 확률"""
+        X = np.asarray(X, dtype=float)
+        hi = np.array(self._hi)
+        g = np.clip((X - self.lo) / self.step, 0.0, hi)
+        i = np.minimum(g.astype(np.intp), np.maximum(hi.astype(np.intp) - 1, 0))
+        f = g - i
+        if not self.interpolate:
+            i = i + (f >= 0.5)
+            return self.table[i[:, 0], i[:, 1], i[:, 2]] * self.scale
+        out = np.zeros(len(X))
+        for dx in (0, 1):
+            wx = f[:, 0] if dx else 1 - f[:, 0]
+            for dy in (0, 1):
+                wy = f[:, 1] if dy else 1 - f[:, 1]
+                for dz in (0, 1):
+                    wz = f[:, 2] if dz else 1 - f[:, 2]
+                    out += wx * wy * wz * self.table[i[:, 0] + dx, i[:, 1] + dy, i[:, 2] + dz]
+        return out * self.scale
+
+    def predict_proba(self, X):
+        """sklearn 모델과 같은 형태의 (n, 2) 확률 (기존 호출부 호환용)"""
+        p = self.score_many(X)
+        return np.column_stack([1 - p, p])
+
+
+if __name__ == "__main__":
+    import argparse
+    import joblib
+    ap = argparse.ArgumentParser(description="Export a posture model to an angle lookup table")
+    ap.add_argument("--exercise", required=True, help="Exercise name (e.g., squat)")
+    ap.add_argument("--model", default=None, help="Model path (default: models/{exercise}_from_images.pkl)")
+    ap.add_argument("--step", type=float, default=1.0, help="Grid step in degrees")
+    ap.add_argument("--dtype", default="uint8", choices=["uint8", "float16", "float32"])
+    args = ap.parse_args()
+
+    model_path = Path(args.model) if args.model else MODELS / f"{args.exercise}_from_images.pkl"
+    out = lut_path_for(model_path)
+    report = export_lut(joblib.load(model_path), out, step=args.step, dtype=args.dtype)
+    print(f"LUT saved to: {out} ({report['bytes'] / 1e6:.1f} MB, {report['seconds']:.1f}s)")
+    print(f"  max error on grid:     {report['grid_max_err']:.4f}")
+    print(f"  max error off grid:    {report['offgrid_max_err']:.4f}")
+    print(f"  mean error off grid:   {report['offgrid_mean_err']:.4f}")
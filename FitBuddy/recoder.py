@@ -1,43 +1,70 @@
 # recorder.py
-import csv, time
+import time
 from pathlib import Path
 import cv2
 from pose_detector import PoseDetector
-from angles import extract_angles
+from angles import extract_angles_auto, compute_angles
 from utils import EMA
-from config import RAW, FPS
+from config import RAW, FPS, EXERCISE_ANGLES
+from frame_source import open_source, frame_keypoints
+from session_store import SessionWriter, SESSION_SUFFIX
+from landmark_cache import LandmarkCache
+from async_writer import CSVSink, SessionSink
 
-def record_session(exercise, subject="U000", view="side"):
+def record_session(exercise, subject="U000", view="side", source="camera", headless=False, fmt="session",
+                   landmark_cache=False):
     out_dir = RAW / exercise / subject
     out_dir.mkdir(parents=True, exist_ok=True)
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open camera")
+    try:
+        src = open_source(source, keyed=landmark_cache)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
         return
-    pose = PoseDetector()
+    # 동영상/이미지 소스는 포즈 추정 결과를 내용 해시로 캐시 (같은 파일을 다시 기록할 때 MediaPipe 생략)
+    # 추적 모드 결과는 앞 프레임에 따라 달라서 내용 키로 저장할 수 없으므로 캐시할 때는 정지 이미지 모드로 추정
+    cached = landmark_cache and src.has_images and not src.realtime
+    pose = PoseDetector(static_image_mode=cached) if src.has_images else None
+    cache = LandmarkCache(model_complexity=1, static_image_mode=True) if cached else None
     ema = EMA(0.25)
     t0 = time.time()
     idx = 0
-    csv_path = out_dir / f"S{int(t0)}_{view}.csv"
-    with open(csv_path, "w", newline="", encoding="utf-8") as f:
-        cols = ["t","frame","knee","hip","torso_tilt"]  # 필요시 확장
-        w = csv.DictWriter(f, fieldnames=cols); w.writeheader()
-        while True:
-            ok, frame = cap.read()
-            if not ok: break
-            h, wid = frame.shape[:2]
-            lm = pose.process(frame)
-            if lm is not None:
-                kpts = pose.to_numpy()
-                if kpts is not None:
-                    ang = extract_angles(kpts, w=wid, h=h)
+    # 기본 각도 + 운동별 카탈로그 각도 (config.EXERCISE_ANGLES)
+    extra = list(EXERCISE_ANGLES.get(exercise, []))
+    names = ["knee","hip","torso_tilt", *extra]
+    if fmt == "csv":
+        out_path = out_dir / f"S{int(t0)}_{view}.csv"
+        sink = CSVSink(out_path, fieldnames=["t","frame", *names])
+        write = lambda t, i, ang, kpts: sink.put({"t":t, "frame":i, **ang})
+    else:
+        # 열 단위 바이너리 세션 (각도 + float16 키포인트, 청크 단위로 이어 씀)
+        out_path = out_dir / f"S{int(t0)}_{view}{SESSION_SUFFIX}"
+        sink = SessionSink(SessionWriter(out_path, angle_names=names, exercise=exercise, subject=subject, view=view))
+        write = lambda t, i, ang, kpts: sink.put((t, i, ang, kpts))
+    # 파일 쓰기는 백그라운드 스레드가 모아서 처리 (디스크 지연이 캡처 루프를 막지 않음)
+    try:
+        for frame in src:
+            h, wid = frame.h, frame.w
+            kpts = frame_keypoints(pose, frame, cache)
+            if kpts is not None:
+                ang, _, confident = extract_angles_auto(kpts, w=wid, h=h)
+                if confident:  # 가려진 프레임은 기록하지 않음
                     ang["knee"] = float(ema(ang["knee"]))
-                    w.writerow({"t":time.time(), "frame":idx, **ang})
-            cv2.imshow("REC - q to stop", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'): break
+                    if extra:
+                        ang.update(zip(extra, compute_angles(kpts[None], extra, wid, h)[0].tolist()))
+                    write(frame.t, idx, ang, kpts)
+            if fmt != "csv" and idx == 0:
+                sink.update_meta(w=wid, h=h)  # 각도 재계산 시 종횡비에 필요
+            if not headless:
+                cv2.imshow("REC - q to stop", frame.display_image())
+                if cv2.waitKey(1) & 0xFF == ord('q'): break
             idx += 1
-    cap.release(); cv2.destroyAllWindows()
-    print("saved:", csv_path)
+    finally:
+        sink.close()  # 남은 행 쓰기 + fsync
+        src.close()
+        if cache is not None: cache.close()
+    if not headless: cv2.destroyAllWindows()
+    print(f"saved: {out_path} ({idx} frames, {idx / max(time.time() - t0, 1e-9):.1f} frames/sec)")
+    print(f"writer: {sink.report()}")
 
 if __name__ == "__main__":
     import argparse
@@ -45,5 +72,9 @@ if __name__ == "__main__":
     ap.add_argument("--exercise", required=True)
     ap.add_argument("--subject", default="U000")
     ap.add_argument("--view", default="side")
+    ap.add_argument("--source", default="camera", help="camera[:N] / video / image dir / joint CSV / synthetic[:N]")
+    ap.add_argument("--headless", action="store_true", help="Run without a display window")
+    ap.add_argument("--format", default="session", choices=["session", "csv"], help="Output format")
+    ap.add_argument("--landmark_cache", action="store_true", help="Reuse cached pose landmarks for video/image sources (detector runs in static-image mode)")
     args = ap.parse_args()
-    record_session(args.exercise, args.subject, args.view)
+    record_session(args.exercise, args.subject, args.view, args.source, args.headless, args.format, args.landmark_cache)
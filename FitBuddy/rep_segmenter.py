@@ -1,11 +1,15 @@
 # rep_segmenter.py
-import pandas as pd, numpy as np
+import math
+import numpy as np
 from scipy.signal import find_peaks
 from pathlib import Path
+from session_store import is_session, load_frames, write_column, SessionReader
+
+STREAM_CHUNK = 65536  # 세션 분할 시 한 번에 읽는 프레임 수
 
 def segment_by_knee(df, knee_col="knee", min_prom=10, min_dist=10):
     # 낮을수록 하강 → valley 기반 분할 (운동별로 규칙 바꿔도 됨)
-    inv = -df[knee_col].values
+    inv = -np.asarray(df[knee_col], dtype=float)
     peaks, _ = find_peaks(inv, prominence=min_prom, distance=min_dist)
     # valley 사이의 구간을 rep로
     reps = []
@@ -14,13 +18,245 @@ def segment_by_knee(df, knee_col="knee", min_prom=10, min_dist=10):
         reps.append((s, e))
     return reps
 
-def write_with_rep_ids(csv_path):
-    df = pd.read_csv(csv_path)
-    reps = segment_by_knee(df)
-    rep_ids = np.full(len(df), -1, dtype=int)
+class _Valley:
+    __slots__ = ("idx", "h", "left_min", "right_min", "kept", "prominent")
+
+    def __init__(self, idx, h, left_min):
+        self.idx = idx              # 프레임 번호 (평탄 구간이면 가운데)
+        self.h = h                  # -knee 값
+        self.left_min = left_min
+        self.right_min = h
+        self.kept = None            # distance 필터 결과 (None=미정)
+        self.prominent = None       # prominence 필터 결과 (None=미정)
+
+
+class StreamingValleyDetector:
+    """
+    무릎 각도를 한 프레임씩 받아 valley(rep 경계)를 확정되는 대로 돌려주는 온라인 검출기
+    find_peaks(-knee, prominence=min_prom, distance=min_dist)와 같은 규칙이라 결과가 segment_by_knee와 같다.
+    단, 깊이가 정확히 같은 valley 둘이 min_dist 안에 있으면 항상 뒤쪽을 남긴다.
+    (find_peaks는 불안정 정렬 순서에 따라 어느 쪽이든 남을 수 있음 → write_with_rep_ids는 CSV/세션 모두 이 검출기를 씀)
+      - 국소 최대: 평탄 구간은 가운데 인덱스, 양 끝 프레임은 제외
+      - distance: 더 깊은 valley가 min_dist 안에 있으면 제거 (남은 valley끼리만 경쟁, find_peaks와 같이 prominence보다 먼저)
+      - prominence: 왼쪽은 자기보다 깊은 지점까지의 최대 각도를 스택으로 유지,
+                    오른쪽은 각도가 min_prom 이상 올라오면 확정 / 더 깊어지면 탈락
+    확정 지연은 보통 max(min_dist, valley 후 무릎이 min_prom만큼 펴질 때까지) 프레임이고 메모리는 지연 구간만큼만 씀.
+    (valley 깊이가 min_dist 간격으로 계속 깊어지는 경우처럼 distance 판정이 연쇄되면 그만큼 늦어짐)
+
+    사용법:
+        det = StreamingValleyDetector()
+        for knee in stream:
+            for v in det.update(knee): ...   # 확정된 valley 프레임 번호
+        det.finish()                         # 스트림 끝에서 남은 판정 마무리
+    """
+
+    def __init__(self, min_prom=10, min_dist=10):
+        if min_dist < 1:
+            raise ValueError("`min_dist` must be greater or equal to 1")
+        self.min_prom = min_prom
+        self.dist = math.ceil(min_dist)
+        self.n = 0                  # 지금까지 받은 프레임 수
+        self.max_lag = 0            # valley 프레임 ~ 확정 프레임 최대 간격
+        self._prev = None
+        self._plat_start = None     # 상승 후 평탄 구간 시작 (국소 최대 후보)
+        self._plat_val = None
+        self._plat_left = None
+        self._stack = []            # [(값, 직전 항목 다음부터 이 항목까지의 최소값)], 값은 단조 감소
+        self._cands = []            # 인덱스 순 후보 (distance 판정에 필요한 동안 유지)
+        self._emit = 0              # _cands에서 다음에 내보낼 위치
+        self._open = []             # 오른쪽 prominence가 미정인 후보
+        self._finished = False
+
+    @property
+    def settled(self):
+        """이 프레임 번호 이전의 valley는 모두 확정됨 (실시간에서 지연 구간 버퍼를 비우는 기준)"""
+        if self._emit < len(self._cands):
+            return self._cands[self._emit].idx
+        return self._frontier()
+
+    def _frontier(self):
+        # 앞으로 새로 나올 수 있는 국소 최대의 최소 인덱스
+        if self._finished:
+            return math.inf
+        return self._plat_start if self._plat_start is not None else self.n
+
+    def update(self, knee):
+        """
+        프레임 하나 반영
+
+        Returns:
+            이번 프레임으로 확정된 valley 프레임 번호 리스트 (대부분 빈 리스트)
+        """
+        x = -float(knee)
+        i = self.n
+        self.n += 1
+        prom = self.min_prom
+
+        # 왼쪽 prominence: 자기보다 큰 값 직후부터 i까지의 최소값
+        seg = x
+        st = self._stack
+        while st and st[-1][0] <= x:
+            s = st.pop()[1]
+            if s < seg:
+                seg = s
+        st.append((x, seg))
+
+        # 국소 최대 (평탄 구간 처리 포함, NaN은 비교가 모두 거짓이라 후보가 되지 않음)
+        new = None
+        if self._plat_start is not None and x != self._plat_val:
+            if x < self._plat_val:
+                new = _Valley((self._plat_start + i - 1) // 2, self._plat_val, self._plat_left)
+                self._cands.append(new)
+                if new.h - new.left_min >= prom:
+                    self._open.append(new)
+                else:
+                    new.prominent = False
+            self._plat_start = None
+        if self._plat_start is None and self._prev is not None and self._prev < x:
+            self._plat_start, self._plat_val, self._plat_left = i, x, seg
+        self._prev = x
+
+        # 오른쪽 prominence: 자기보다 큰 값(또는 NaN)을 만나기 전에 min_prom만큼 내려가면 확정
+        if self._open:
+            still = []
+            for c in self._open:
+                if c.kept is False:
+                    continue
+                if not x <= c.h:
+                    c.prominent = False
+                    continue
+                if x < c.right_min:
+                    c.right_min = x
+                    if c.h - x >= prom:
+                        c.prominent = True
+                        continue
+                still.append(c)
+            self._open = still
+
+        return self._resolve()
+
+    def update_many(self, values):
+        """여러 프레임을 차례로 반영 (청크 단위 파일 처리용), 확정된 valley 리스트"""
+        out = []
+        update = self.update
+        for v in np.asarray(values, dtype=float).tolist():
+            r = update(v)
+            if r:
+                out.extend(r)
+        return out
+
+    def finish(self):
+        """스트림 종료: 오른쪽이 끝까지 확정되지 않은 후보는 탈락, 남은 valley 반환"""
+        self._finished = True
+        self._plat_start = None
+        for c in self._open:
+            c.prominent = False
+        self._open = []
+        return self._resolve()
+
+    def _distance_verdict(self, k):
+        # find_peaks는 우선순위 순으로 남은 peak이 이웃을 지우므로: 우선순위가 높은 이웃 중
+        # 남은 것이 있으면 제거(False), 모두 제거됐으면 유지(True), 아직 미정인 이웃이 있으면 None
+        cands, c = self._cands, self._cands[k]
+        verdict = True
+        for j in range(k - 1, -1, -1):
+            q = cands[j]
+            if c.idx - q.idx >= self.dist:
+                break
+            if q.h > c.h:
+                if q.kept:
+                    return False
+                if q.kept is None:
+                    verdict = None
+        for j in range(k + 1, len(cands)):
+            q = cands[j]
+            if q.idx - c.idx >= self.dist:
+                break
+            if q.h >= c.h:
+                if q.kept:
+                    return False
+                if q.kept is None:
+                    verdict = None
+        return verdict
+
+    def _resolve(self):
+        cands, dist = self._cands, self.dist
+        frontier = self._frontier()
+
+        # distance: 더 높은 우선순위(더 깊은 valley, 같으면 뒤쪽)의 '남은' 후보가 dist 안에 있으면 제거
+        changed = True
+        while changed:
+            changed = False
+            for k in range(self._emit, len(cands)):
+                c = cands[k]
+                if c.kept is not None:
+                    continue
+                if c.idx + dist > frontier:
+                    break
+                verdict = self._distance_verdict(k)
+                if verdict is not None:
+                    c.kept = verdict
+                    changed = True
+
+        # 앞에서부터 판정이 끝난 후보를 순서대로 내보냄
+        out = []
+        while self._emit < len(cands):
+            c = cands[self._emit]
+            if c.kept is None or (c.kept and c.prominent is None):
+                break
+            if c.kept and c.prominent:
+                out.append(c.idx)
+                self.max_lag = max(self.max_lag, self.n - 1 - c.idx)
+            self._emit += 1
+
+        # 더 이상 distance 판정에 쓰이지 않는 후보 정리
+        lo = cands[self._emit].idx if self._emit < len(cands) else frontier
+        drop = 0
+        while drop < self._emit and cands[drop].idx + dist <= lo:
+            drop += 1
+        if drop:
+            del cands[:drop]
+            self._emit -= drop
+        return out
+
+
+def iter_valleys(chunks, min_prom=10, min_dist=10):
+    """knee 값 청크를 차례로 받아 valley 프레임 번호를 확정되는 대로 내보냄 (파일 전체를 메모리에 올리지 않음)"""
+    det = StreamingValleyDetector(min_prom, min_dist)
+    for chunk in chunks:
+        yield from det.update_many(chunk)
+    yield from det.finish()
+
+
+def segment_stream(chunks, min_prom=10, min_dist=10):
+    """segment_by_knee의 스트리밍 버전: 연속한 valley 쌍 (s, e)를 차례로 내보냄"""
+    prev = None
+    for v in iter_valleys(chunks, min_prom, min_dist):
+        if prev is not None:
+            yield (prev, v)
+        prev = v
+
+
+def rep_ids_from_reps(reps, n):
+    # rep은 [s, e) 반개구간: 닫는 valley 프레임은 다음 rep의 시작 (마지막 rep도 같음, score_live.LiveScorer와 일치)
+    rep_ids = np.full(n, -1, dtype=int)
     for rid,(s,e) in enumerate(reps, 1):
-        rep_ids[s:e+1] = rid
-    df["rep_id"] = rep_ids
+        rep_ids[s:e] = rid
+    return rep_ids
+
+def write_with_rep_ids(csv_path):
+    if is_session(csv_path):
+        # 세션은 무릎 각도 열(memmap)을 청크 단위로 스트리밍 분할하고 rep_id 열을 세션 안에 추가
+        knee = SessionReader(csv_path).angle("knee")
+        chunks = (knee[i:i + STREAM_CHUNK] for i in range(0, len(knee), STREAM_CHUNK))
+        reps = list(segment_stream(chunks))
+        write_column(csv_path, "rep_id", rep_ids_from_reps(reps, len(knee)), dtype=np.int32)
+        print("segmented ->", csv_path)
+        return
+    df = load_frames(csv_path)
+    # 세션/실시간 채점과 같은 경계가 나오도록 CSV도 스트리밍 검출기로 분할
+    reps = list(segment_stream([df["knee"].to_numpy(dtype=float)]))
+    df["rep_id"] = rep_ids_from_reps(reps, len(df))
     out = Path(csv_path).with_name(Path(csv_path).stem + "_seg.csv")
     df.to_csv(out, index=False)
     print("segmented ->", out)
@@ -28,6 +264,6 @@ def write_with_rep_ids(csv_path):
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
-    ap.add_argument("--csv", required=True)
+    ap.add_argument("--csv", required=True, help="raw_kpt CSV 또는 .session 디렉터리")
     a = ap.parse_args()
     write_with_rep_ids(a.csv)
@@ -0,0 +1,82 @@
+# rep_summary.py
+# rep(1회 동작) 요약 피처를 프레임마다 제자리 갱신하는 누적기
+# 실시간(score_live)과 오프라인(features_agg)이 같은 코드로 같은 피처 dict를 만든다.
+# 프레임 목록을 들고 있지 않으므로 rep이 끝나지 않아도 메모리가 늘지 않고, rep 종료 시 계산도 O(1)
+
+import math
+
+import numpy as np
+
+DEEP_KNEE = 95.0  # 이 각도 미만이면 '깊은' 프레임 (pct_deep)
+
+# summary() 결과 키 순서
+REP_FEATURES = ("frames", "knee_min", "knee_max", "knee_rom", "hip_min", "tilt_max", "pct_deep", "duration")
+
+
+class RepAccumulator:
+    def __init__(self, deep_knee=DEEP_KNEE):
+        self.deep_knee = deep_knee
+        self.reset()
+
+    def reset(self):
+        self.frames = 0
+        self.n_deep = 0
+        self.knee_min = math.inf
+        self.knee_max = -math.inf
+        self.hip_min = math.inf
+        self.tilt_max = -math.inf
+        self.t_first = None
+        self.t_last = None
+
+    def update(self, t, knee, hip, tilt):
+        """프레임 하나 반영 (NaN 값은 min/max에서 제외, 깊이 비율에서는 '깊지 않음')"""
+        self.frames += 1
+        if self.t_first is None:
+            self.t_first = t
+        self.t_last = t
+        if knee < self.knee_min:
+            self.knee_min = knee
+        if knee > self.knee_max:
+            self.knee_max = knee
+        if knee < self.deep_knee:
+            self.n_deep += 1
+        if hip < self.hip_min:
+            self.hip_min = hip
+        if tilt > self.tilt_max:
+            self.tilt_max = tilt
+
+    def update_many(self, t, knee, hip, tilt):
+        """프레임 배열을 한 번에 반영 (오프라인 집계용, update를 반복한 것과 결과 동일)"""
+        t = np.asarray(t, dtype=float)
+        if len(t) == 0:
+            return
+        knee = np.asarray(knee, dtype=float)
+        hip = np.asarray(hip, dtype=float)
+        tilt = np.asarray(tilt, dtype=float)
+        self.frames += len(t)
+        if self.t_first is None:
+            self.t_first = float(t[0])
+        self.t_last = float(t[-1])
+        self.n_deep += int(np.count_nonzero(knee < self.deep_knee))
+        # NaN은 비교에서 빠지도록 fmin/fmax로 축약
+        self.knee_min = min(self.knee_min, float(np.fmin.reduce(knee, initial=math.inf)))
+        self.knee_max = max(self.knee_max, float(np.fmax.reduce(knee, initial=-math.inf)))
+        self.hip_min = min(self.hip_min, float(np.fmin.reduce(hip, initial=math.inf)))
+        self.tilt_max = max(self.tilt_max, float(np.fmax.reduce(tilt, initial=-math.inf)))
+
+    def summary(self):
+        """현재까지의 rep 피처 dict (프레임이 없으면 {})"""
+        if self.frames == 0:
+            return {}
+        knee_min = self.knee_min if self.knee_min != math.inf else math.nan
+        knee_max = self.knee_max if self.knee_max != -math.inf else math.nan
+        return {
+            "frames"   : int(self.frames),
+            "knee_min" : float(knee_min),
+            "knee_max" : float(knee_max),
+            "knee_rom" : float(knee_max - knee_min),
+            "hip_min"  : float(self.hip_min if self.hip_min != math.inf else math.nan),
+            "tilt_max" : float(self.tilt_max if self.tilt_max != -math.inf else math.nan),
+            "pct_deep" : self.n_deep / self.frames,
+            "duration" : float(self.t_last - self.t_first) if self.frames > 1 else 0.0,
+        }
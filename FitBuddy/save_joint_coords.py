@@ -1,67 +1,68 @@
 # save_joint_coords.py
 # 카메라에서 관절 좌표를 추출하여 저장 (나중에 모델 학습용)
 # 사용법:
+#   python save_joint_coords.py --exercise squat                      # data/raw_joints/squat_<시각>.session
 #   python save_joint_coords.py --exercise squat --output data/raw_joints/squat_session1.csv
 
 import argparse
 import cv2
-import csv
 import time
-import numpy as np
 from pathlib import Path
 from pose_detector import PoseDetector
-from angles import extract_angles
-from utils import EMA, RingBuffer
+from angles import extract_angles_auto
+from utils import FilterBank
 from config import DATA
+from frame_source import open_source, frame_keypoints, POSE_LANDMARK_NAMES
+from session_store import SessionWriter, SESSION_SUFFIX
+from landmark_cache import LandmarkCache
+from async_writer import CSVSink, SessionSink
 
-def save_joint_coordinates(exercise, output_path, duration_sec=None):
+def save_joint_coordinates(exercise, output_path, duration_sec=None, source="camera", headless=False,
+                           landmark_cache=False):
     """
-    카메라에서 관절 좌표를 추출하여 CSV로 저장
+    카메라(또는 다른 프레임 소스)에서 관절 좌표를 추출하여 저장
     
     Args:
         exercise: 운동 이름
-        output_path: 저장할 CSV 파일 경로
+        output_path: 저장 경로 (.session이면 열 단위 바이너리 세션, 아니면 CSV)
         duration_sec: 녹화 시간 (초), None이면 수동 종료
+        source: 프레임 소스 (frame_source.open_source 형식)
+        headless: True면 화면 표시 없이 처리
+        landmark_cache: True면 동영상/이미지 소스의 포즈 추정 결과를 landmark_cache에 저장/재사용 (정지 이미지 모드로 추정)
     """
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open camera")
+    try:
+        src = open_source(source, keyed=landmark_cache)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
         return
     
-    pose = PoseDetector(model_complexity=1)
-    ema = EMA(alpha=0.25)
-    rb = RingBuffer(size=5)
+    # 추적 모드 결과는 앞 프레임에 따라 달라서 내용 키로 저장할 수 없으므로 캐시할 때는 정지 이미지 모드로 추정
+    cached = landmark_cache and src.has_images and not src.realtime
+    pose = PoseDetector(model_complexity=1, static_image_mode=cached) if src.has_images else None
+    cache = LandmarkCache(model_complexity=1, static_image_mode=True) if cached else None
+    smoother = FilterBank(3, method='ema_window', alpha=0.25, window=5)  # knee/hip/tilt 동시 스무딩
     
     # 출력 디렉토리 생성
     output_path = Path(output_path)
     output_path.parent.mkdir(parents=True, exist_ok=True)
     
-    # CSV 작성 준비
-    f = open(output_path, 'w', newline='', encoding='utf-8')
-    
     # 관절 좌표 컬럼 (MediaPipe Pose는 33개 관절)
-    joint_names = [
-        'nose', 'left_eye_inner', 'left_eye', 'left_eye_outer',
-        'right_eye_inner', 'right_eye', 'right_eye_outer',
-        'left_ear', 'right_ear', 'mouth_left', 'mouth_right',
-        'left_shoulder', 'right_shoulder', 'left_elbow', 'right_elbow',
-        'left_wrist', 'right_wrist', 'left_pinky', 'right_pinky',
-        'left_index', 'right_index', 'left_thumb', 'right_thumb',
-        'left_hip', 'right_hip', 'left_knee', 'right_knee',
-        'left_ankle', 'right_ankle', 'left_heel', 'right_heel',
-        'left_foot_index', 'right_foot_index'
-    ]
-    
-    # CSV 헤더 작성
-    fieldnames = ['timestamp', 'frame_idx']
-    # 각 관절의 x, y, visibility
-    for joint in joint_names:
-        fieldnames.extend([f'{joint}_x', f'{joint}_y', f'{joint}_visibility'])
-    # 계산된 각도
-    fieldnames.extend(['knee_angle', 'hip_angle', 'torso_tilt'])
+    joint_names = POSE_LANDMARK_NAMES
     
-    writer = csv.DictWriter(f, fieldnames=fieldnames)
-    writer.writeheader()
+    # 파일 쓰기는 백그라운드 스레드가 모아서 처리 (디스크 지연이 캡처 루프를 막지 않음)
+    is_session = output_path.suffix == SESSION_SUFFIX
+    if is_session:
+        # 세션: 키포인트 (N,33,3) float16 + 각도 + 타임스탬프를 청크 단위로 이어 씀 (프레임별 dict 생성 없음)
+        sink = SessionSink(SessionWriter(output_path, angle_names=('knee', 'hip', 'torso_tilt'), exercise=exercise))
+    else:
+        # CSV 헤더
+        fieldnames = ['timestamp', 'frame_idx']
+        # 각 관절의 x, y, visibility
+        for joint in joint_names:
+            fieldnames.extend([f'{joint}_x', f'{joint}_y', f'{joint}_visibility'])
+        # 계산된 각도
+        fieldnames.extend(['knee_angle', 'hip_angle', 'torso_tilt'])
+        sink = CSVSink(output_path, fieldnames)
     
     print(f"Recording joint coordinates...")
     print(f"Press 'q' to stop or wait {duration_sec} seconds")
@@ -71,34 +72,31 @@ def save_joint_coordinates(exercise, output_path, duration_sec=None):
     frame_idx = 0
     
     try:
-        while True:
-            ok, frame = cap.read()
-            if not ok:
-                break
-            
-            h, w = frame.shape[:2]
+        for src_frame in src:
+            h, w = src_frame.h, src_frame.w
+            if is_session and frame_idx == 0:
+                sink.update_meta(w=w, h=h)  # 각도 재계산 시 종횡비에 필요
+            frame = None if headless else src_frame.display_image()
             
             # 관절 좌표 추출
-            lms = pose.process(frame)
-            if lms is not None:
-                kpts = pose.to_numpy()
-                if kpts is not None:
-                    # 각도 계산
-                    ang = extract_angles(kpts, side='right', w=w, h=h)
-                    
-                    # 각도 스무딩
-                    knee_s = ema(ang['knee'])
-                    rb.push(knee_s)
-                    knee = rb.mean()
-                    if np.isnan(knee):
-                        knee = knee_s
-                    
+            kpts = frame_keypoints(pose, src_frame, cache)
+            if kpts is not None:
+                # 각도 계산
+                # 가시성이 더 좋은 쪽 자동 선택 (원본 좌표는 신뢰도와 관계없이 모두 저장)
+                ang, _, confident = extract_angles_auto(kpts, w=w, h=h)
+                
+                # 각도 스무딩
+                knee, hip, tilt = smoother([ang['knee'], ang['hip'], ang['torso_tilt']]).tolist()
+                
+                if is_session:
+                    sink.put((src_frame.t, frame_idx, (knee, hip, tilt), kpts))
+                else:
                     # CSV 행 작성
                     row = {
-                        'timestamp': time.time(),
+                        'timestamp': src_frame.t,
                         'frame_idx': frame_idx,
                     }
-                    
+                
                     # 관절 좌표 저장 (정규화 좌표)
                     for i, joint_name in enumerate(joint_names):
                         if i < len(kpts):
@@ -109,22 +107,31 @@ def save_joint_coordinates(exercise, output_path, duration_sec=None):
                             row[f'{joint_name}_x'] = 0.0
                             row[f'{joint_name}_y'] = 0.0
                             row[f'{joint_name}_visibility'] = 0.0
-                    
+                
                     # 계산된 각도 저장
-                    row['knee_angle'] = float(knee)
-                    row['hip_angle'] = float(ang['hip'])
-                    row['torso_tilt'] = float(ang['torso_tilt'])
-                    
-                    writer.writerow(row)
-                    
-                    # 화면 표시
+                    row['knee_angle'] = knee
+                    row['hip_angle'] = hip
+                    row['torso_tilt'] = tilt
+                
+                    sink.put(row)
+                
+                # 화면 표시
+                if not headless:
                     cv2.putText(frame, f"Recording... Frame: {frame_idx}", (20, 30),
                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0, 255, 0), 2)
-                    cv2.putText(frame, f"knee:{knee:.1f} hip:{ang['hip']:.1f} tilt:{ang['torso_tilt']:.1f}",
+                    cv2.putText(frame, f"knee:{knee:.1f} hip:{hip:.1f} tilt:{tilt:.1f}",
                                (20, 60), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 255, 255), 2)
                     
                     # 스켈레톤 표시
-                    pose.draw_landmarks(frame)
+                    if pose is not None:
+                        pose.draw_landmarks(frame)
+            
+            if duration_sec and (time.time() - start_time) >= duration_sec:
+                break
+            
+            frame_idx += 1
+            if headless:
+                continue
             
             cv2.putText(frame, "Press 'q' to stop", (20, h - 20),
                        cv2.FONT_HERSHEY_SIMPLEX, 0.6, (180, 180, 180), 1)
@@ -136,11 +143,6 @@ def save_joint_coordinates(exercise, output_path, duration_sec=None):
             if key == ord('q') or key == 27:
                 break
             
-            if duration_sec and (time.time() - start_time) >= duration_sec:
-                break
-            
-            frame_idx += 1
-            
             # 창 닫기 확인
             try:
                 if cv2.getWindowProperty('Recording Joint Coordinates', cv2.WND_PROP_VISIBLE) < 1:
@@ -149,23 +151,33 @@ def save_joint_coordinates(exercise, output_path, duration_sec=None):
                 break
     
     finally:
-        f.close()
-        cap.release()
-        cv2.destroyAllWindows()
-        print(f"\nSaved {frame_idx} frames to {output_path}")
+        sink.close()  # 남은 행 쓰기 + fsync
+        src.close()
+        if cache is not None:
+            cache.close()
+        if not headless:
+            cv2.destroyAllWindows()
+        elapsed = time.time() - start_time
+        print(f"\nSaved {frame_idx} frames to {output_path} ({frame_idx / max(elapsed, 1e-9):.1f} frames/sec)")
+        print(f"Writer: {sink.report()}")
 
 if __name__ == "__main__":
     ap = argparse.ArgumentParser(description="Save joint coordinates from camera")
     ap.add_argument("--exercise", required=True, help="Exercise name")
-    ap.add_argument("--output", default=None, help="Output CSV path")
+    ap.add_argument("--output", default=None, help="Output path (.session or .csv)")
     ap.add_argument("--duration", type=int, default=None, help="Recording duration in seconds")
+    ap.add_argument("--source", default="camera", help="camera[:N] / video / image dir / joint CSV / synthetic[:N]")
+    ap.add_argument("--headless", action="store_true", help="Run without a display window")
+    ap.add_argument("--landmark_cache", action="store_true", help="Reuse cached pose landmarks for video/image sources (detector runs in static-image mode)")
+    ap.add_argument("--format", default="session", choices=["session", "csv"], help="Default output format")
     args = ap.parse_args()
     
     if args.output:
         output_path = Path(args.output)
     else:
         timestamp = int(time.time())
-        output_path = DATA / "raw_joints" / f"{args.exercise}_{timestamp}.csv"
+        suffix = SESSION_SUFFIX if args.format == "session" else ".csv"
+        output_path = DATA / "raw_joints" / f"{args.exercise}_{timestamp}{suffix}"
     
-    save_joint_coordinates(args.exercise, output_path, args.duration)
+    save_joint_coordinates(args.exercise, output_path, args.duration, args.source, args.headless, args.landmark_cache)
 
@@ -3,40 +3,29 @@
 # 사용법:
 #   python score_live.py --exercise squat --model models/squat_rf.pkl
 #   (모델 파일 없이 실행하면 피처만 콘솔로 출력)
+#   python score_live.py --exercise squat --source data/clip.mp4 --headless   # 화면 없이 처리량 측정
+#   python score_live.py --exercise squat --source synthetic:3000 --headless
 
-import argparse, time, csv, os
+import argparse, time, csv, os, collections
 from pathlib import Path
 import numpy as np
-import joblib
 
 import cv2
 from pose_detector import PoseDetector
-from angles import extract_angles
-from utils import EMA, RingBuffer
-from counter import SquatCounter  # rep 경계 감지에 사용(스쿼트 기준)
-
-# ---- 피처 요약 (rep 종료 시 계산) ----
-def summarize_rep(rep_buf):
-    # rep_buf: [{'t':..,'knee':..,'hip':..,'torso_tilt':..}, ...]
-    if not rep_buf:
-        return {}
-    ks  = np.array([r['knee'] for r in rep_buf], dtype=float)
-    hs  = np.array([r['hip'] for r in rep_buf], dtype=float)
-    ts  = np.array([r['torso_tilt'] for r in rep_buf], dtype=float)
-    ts_sec = np.array([r['t'] for r in rep_buf], dtype=float)
-    duration = float(ts_sec[-1] - ts_sec[0]) if len(ts_sec) > 1 else 0.0
-
-    out = {
-        "frames"   : int(len(rep_buf)),
-        "knee_min" : float(np.nanmin(ks)),
-        "knee_max" : float(np.nanmax(ks)),
-        "knee_rom" : float(np.nanmax(ks) - np.nanmin(ks)),
-        "hip_min"  : float(np.nanmin(hs)),
-        "tilt_max" : float(np.nanmax(ts)),
-        "pct_deep" : float(np.mean(ks < 95.0)),  # 무릎 각도 95° 미만 비율
-        "duration" : duration,
-    }
-    return out
+from angles import extract_angles_auto, compute_angles
+from utils import FilterBank
+from counter import RepCounter, spec_angle_name  # 운동별 스펙(config.REP_SPECS)으로 rep 경계 감지
+from config import REP_SPECS
+from timing import METRICS
+from model_registry import MODEL_REGISTRY
+from pipeline import Pipeline
+from rep_summary import RepAccumulator  # rep 요약 피처를 프레임마다 제자리 갱신
+from rep_segmenter import StreamingValleyDetector  # 오프라인 분할과 같은 valley 기준 rep 경계
+from frame_source import open_source
+
+# rep 피드백 오버레이를 유지하는 시간(소스 시간 기준 초)
+# 렌더 큐가 drop-oldest라 rep이 끝난 프레임 한 장에만 붙이면 화면에서 사라질 수 있음
+REP_HOLD_SEC = 2.0
 
 # ---- 피드백 문구 합성 ----
 def feedback_from_features(feat, prob_good=None):
@@ -61,31 +50,180 @@ def feedback_from_features(feat, prob_good=None):
 
     return " / ".join(msgs)
 
+class LiveScorer:
+    """추론 단계: 프레임 → 포즈/각도/카운터/rep 요약/모델 점수 (이 단계의 상태는 추론 스레드에서만 사용)"""
+
+    def __init__(self, exercise, model_path=None, csv_writer=None, on_rep=None):
+        self.pose = PoseDetector(model_complexity=1)
+        # 운동별 스펙의 up/down 상태머신으로 rep 경계 검출 (스펙이 없는 운동은 스쿼트 기준)
+        self.spec_ex = exercise if exercise in REP_SPECS else "squat"
+        self.counter = RepCounter.from_spec(self.spec_ex)
+        self.drive_knee = REP_SPECS[self.spec_ex]["angle"] == "knee"
+        # knee/hip/tilt 동시 스무딩 (카운터 각도가 무릎이 아니면 4번째 채널로 같이 스무딩)
+        self.smoother = FilterBank(3 if self.drive_knee else 4, method='ema_window', alpha=0.25, window=5)
+        self.model_path = model_path
+        self.csv_writer = csv_writer
+
+        # 점수용 rep 경계는 학습 데이터(rep_segmenter.write_with_rep_ids)와 같은 무릎 valley 사이 구간
+        # valley가 확정될 때까지의 프레임(지연 구간)만 _tail에 두고, 확정되면 누적기에 반영
+        self.valleys = StreamingValleyDetector()
+        self._tail = collections.deque()  # (프레임 번호, t, knee, hip, tilt)
+        self.frame_no = 0
+        self.rep_open = False  # 첫 valley 전 프레임은 어느 rep에도 속하지 않음
+
+        # 현재 rep 요약 (프레임 목록 대신 min/max/개수 등만 유지)
+        self.rep_acc = RepAccumulator()
+        self.rep_idx = 0
+
+        # 마지막 rep 피드백은 REP_HOLD_SEC 동안 이후 프레임에도 붙임, on_rep(text)는 rep마다 호출
+        self.on_rep = on_rep
+        self.last_rep = None
+        self.last_rep_t = 0.0
+
+    def process(self, frame):
+        """
+        프레임 하나 처리
+
+        Args:
+            frame: frame_source.Frame (이미지 소스면 포즈 추정, 키포인트 소스면 기록된 좌표 사용)
+
+        Returns:
+            (frame, overlays): overlays는 렌더 단계에서 그릴 [(text, (x, y), scale, color), ...]
+        """
+        frame, overlays = self._process(frame)
+        if self.last_rep is not None:
+            if frame.t - self.last_rep_t <= REP_HOLD_SEC:
+                overlays.append(self.last_rep)
+            else:
+                self.last_rep = None
+        return frame, overlays
+
+    def _process(self, frame):
+        overlays = []
+        w, h = frame.w, frame.h
+
+        kpts = frame.kpts
+        if frame.image is not None:
+            with METRICS.time("pose_process"):
+                lms = self.pose.process(frame.image)
+            if lms is None:
+                return frame, overlays
+            with METRICS.time("to_numpy"):
+                kpts = self.pose.to_numpy()
+        confident = False
+        if kpts is not None:
+            with METRICS.time("extract_angles"):
+                ang, side, confident = extract_angles_auto(kpts, w=w, h=h)
+        # 양쪽 모두 가려진 프레임은 카운터/모델에 넣지 않음
+        if not confident:
+            return frame, overlays
+
+        raw = [ang['knee'], ang['hip'], ang['torso_tilt']]
+        if not self.drive_knee:
+            raw.append(float(compute_angles(kpts[None], [spec_angle_name(self.spec_ex, side)], w, h)[0, 0]))
+        smoothed = self.smoother(raw).tolist()
+        knee, hip, tilt = smoothed[:3]
+
+        # 현재 프레임 피처(실시간 표시용)
+        overlays.append((f"knee:{knee:.1f} hip:{hip:.1f} tilt:{tilt:.1f}", (20, 90), 0.7, (255,255,255)))
+
+        # rep 경계 감지 (스펙 각도도 무릎과 같은 스무딩을 거친 값)
+        drive = knee if self.drive_knee else smoothed[3]
+        count, state = self.counter.update(drive)
+
+        # valley가 확정되면 [이전 valley, 이번 valley) 구간을 한 rep으로 요약/점수/피드백
+        # (시간은 소스 기준이라 파일 재생에서도 duration이 실제와 같음)
+        self._tail.append((self.frame_no, frame.t, knee, hip, tilt))
+        self.frame_no += 1
+        for v in self.valleys.update(knee):
+            self._fold(v)
+            if self.rep_open:
+                self.last_rep = self._finish_rep()
+                self.last_rep_t = frame.t
+            self.rep_open = True
+        self._fold(self.valleys.settled)
+
+        # 카운트/상태 표시
+        overlays.append((f"COUNT: {count}  STATE:{state}", (20, 55), 1.0, (0,255,0)))
+        return frame, overlays
+
+    def finish(self):
+        """스트림 끝: 남은 valley 판정을 마무리하고 마지막 rep까지 요약/점수 (오버레이 목록 반환)"""
+        overlays = []
+        for v in self.valleys.finish():
+            self._fold(v)
+            if self.rep_open:
+                overlays.append(self._finish_rep())
+            self.rep_open = True
+        # 마지막 valley 뒤 프레임은 닫히지 않은 rep이므로 버림 (segment_by_knee와 같음)
+        self._tail.clear()
+        return overlays
+
+    def _fold(self, limit):
+        """프레임 번호가 limit 미만인 지연 구간 프레임을 현재 rep 누적기에 반영"""
+        tail = self._tail
+        while tail and tail[0][0] < limit:
+            _, t, knee, hip, tilt = tail.popleft()
+            if self.rep_open:
+                self.rep_acc.update(t, knee, hip, tilt)
+
+    def _finish_rep(self):
+        """현재 rep 요약 → 모델 점수 → 피드백 오버레이 (누적기는 다음 rep을 위해 초기화)"""
+        self.rep_idx += 1
+        with METRICS.time("summarize_rep"):
+            feat = self.rep_acc.summary()
+        prob_good = None
+        model = MODEL_REGISTRY.load(self.model_path) if self.model_path is not None else None
+
+        if model is not None and feat:
+            # 학습 스크립트(train_baseline.py)와 동일한 피처 집합 사용
+            cols = ["knee_min","knee_rom","hip_min","tilt_max","duration"]
+            x = np.array([[feat.get(c, 0.0) for c in cols]], dtype=float)
+            try:
+                with METRICS.time("model_score"):
+                    if hasattr(model, "predict_proba"):
+                        prob_good = float(model.predict_proba(x)[0, 1])
+                    else:
+                        # 일부 모델은 decision_function만 제공
+                        pred = model.predict(x)[0]
+                        prob_good = float(pred)
+            except Exception:
+                prob_good = None
+
+        msg = feedback_from_features(feat, prob_good)
+
+        if self.csv_writer is not None:
+            row = {**{"rep_id": self.rep_idx}, **feat, "prob_good": (None if prob_good is None else float(prob_good))}
+            self.csv_writer.writerow(row)
+
+        self.rep_acc.reset()
+        text = f"REP {self.rep_idx}: {msg}"
+        if self.on_rep is not None:
+            self.on_rep(text)
+        return (text, (20, 130), 0.7, (0,200,255))
+
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--exercise", required=True, help="squat/lunge/deadlift/pushup/... (현재 스쿼트 로직 기반)")
+    ap.add_argument("--exercise", required=True, help="squat/lunge/deadlift/pushup/... (config.REP_SPECS, 피처 요약은 스쿼트 기준)")
     ap.add_argument("--model", default=None, help="학습 모델(pkl) 경로 (옵션)")
     ap.add_argument("--save_csv", action="store_true", help="rep 요약 피처를 CSV로 저장")
+    ap.add_argument("--source", default="camera",
+                    help="camera[:N] / 동영상 / 이미지 폴더 / 관절 좌표 CSV / synthetic[:N] (frame_source.py)")
+    ap.add_argument("--headless", action="store_true", help="화면 없이 최대 속도로 처리하고 처리량만 출력")
     args = ap.parse_args()
 
-    model = None
-    if args.model and Path(args.model).exists():
-        model = joblib.load(args.model)
+    # 모델은 레지스트리에서 공유 (트리 앙상블은 컴파일된 노드 배열, 파일이 바뀌면 다음 rep부터 새 모델)
+    model_path = args.model if args.model and Path(args.model).exists() else None
+    if model_path is not None:
+        MODEL_REGISTRY.load(model_path)
 
-    # 카메라/모듈 초기화
-    cap = cv2.VideoCapture(0)
-    if not cap.isOpened():
-        print("Error: Could not open camera")
+    # 프레임 소스 초기화
+    try:
+        src = open_source(args.source)
+    except (IOError, ValueError) as e:
+        print(f"Error: {e}")
         return
-    pose = PoseDetector(model_complexity=1)
-    ema = EMA(alpha=0.25)
-    rb = RingBuffer(size=5)
-    counter = SquatCounter()  # 스쿼트 기준의 up/down 상태머신으로 rep 경계 검출
-
-    # rep 버퍼
-    rep_buf = []      # 현재 rep에 속하는 프레임 피처들
-    last_state = "up" # 상태 전이 감지용
-    rep_idx = 0
 
     # CSV 저장 설정
     csv_writer = None
@@ -98,80 +236,59 @@ def main():
         ])
         csv_writer.writeheader()
 
-    while True:
-        ok, frame = cap.read()
-        if not ok:
-            break
-        h, w = frame.shape[:2]
-
-        lms = pose.process(frame)
-        if lms is not None:
-            kpts = pose.to_numpy()
-            if kpts is not None:
-                ang = extract_angles(kpts, side='right', w=w, h=h)
-
-                knee_s = ema(ang['knee'])
-                rb.push(knee_s)
-                knee = float(rb.mean())
-                # NaN 체크 (버퍼가 비어있을 때)
-                if np.isnan(knee):
-                    knee = float(knee_s)  # EMA 값 사용
-                hip = float(ang['hip'])
-                tilt = float(ang['torso_tilt'])
-
-                # 현재 프레임 피처(실시간 표시용)
-                cv2.putText(frame, f"knee:{knee:.1f} hip:{hip:.1f} tilt:{tilt:.1f}", (20, 90),
-                            cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255,255,255), 2)
-
-                # rep 경계 감지
-                count, state = counter.update(knee)
-
-                # 상태가 down으로 들어간 동안 프레임 누적
-                rep_buf.append({"t": time.time(), "knee": knee, "hip": hip, "torso_tilt": tilt})
-
-                # up으로 전환될 때(한 rep 종료) → 요약/점수/피드백
-                if last_state == "down" and state == "up":
-                    rep_idx += 1
-                    feat = summarize_rep(rep_buf)
-                    prob_good = None
-
-                    if model is not None and feat:
-                        # 학습 스크립트(train_baseline.py)와 동일한 피처 집합 사용
-                        cols = ["knee_min","knee_rom","hip_min","tilt_max","duration"]
-                        x = np.array([[feat.get(c, 0.0) for c in cols]], dtype=float)
-                        try:
-                            if hasattr(model, "predict_proba"):
-                                prob_good = float(model.predict_proba(x)[0, 1])
-                            else:
-                                # 일부 모델은 decision_function만 제공
-                                pred = model.predict(x)[0]
-                                prob_good = float(pred)
-                        except Exception:
-                            prob_good = None
-
-                    msg = feedback_from_features(feat, prob_good)
-                    cv2.putText(frame, f"REP {rep_idx}: {msg}", (20, 130),
-                                cv2.FONT_HERSHEY_SIMPLEX, 0.7, (0,200,255), 2)
-
-                    if csv_writer is not None:
-                        row = {**{"rep_id": rep_idx}, **feat, "prob_good": (None if prob_good is None else float(prob_good))}
-                        csv_writer.writerow(row)
-
-                    # 다음 rep을 위해 버퍼 비우기
-                    rep_buf = []
-
-                last_state = state
-
-                # 카운트/상태 표시
-                cv2.putText(frame, f"COUNT: {count}  STATE:{state}", (20, 55),
-                            cv2.FONT_HERSHEY_SIMPLEX, 1.0, (0,255,0), 2)
-
-        cv2.imshow("FitBuddy - Live Scoring (q to quit)", frame)
-        if cv2.waitKey(1) & 0xFF == ord('q'):
-            break
-
-    cap.release()
-    cv2.destroyAllWindows()
+    # 헤드리스 모드는 화면 오버레이 대신 rep 피드백을 콘솔로 출력
+    scorer = LiveScorer(args.exercise, model_path, csv_writer, on_rep=print if args.headless else None)
+
+    def read_frame():
+        with METRICS.time("capture"):
+            return src.read()
+
+    # capture → inference는 스레드로, 렌더링(imshow)은 메인 스레드에서
+    # 카메라는 capture 큐에 최신 프레임 1장만 유지 (추론이 느리면 오래된 프레임을 버림)
+    # 파일/합성 소스는 모든 프레임을 처리해야 rep 수가 재현되므로 버리지 않고 기다림
+    # 렌더 큐는 drop-oldest라서 화면 출력이 추론을 막지 않음
+    pipe = Pipeline()
+    pipe.add_source("capture", read_frame, maxsize=1 if src.realtime else 8, drop_oldest=src.realtime)
+    pipe.add_stage("inference", scorer.process, maxsize=1, drop_oldest=True)
+
+    t_start = time.perf_counter()
+    last_report = t_start
+    try:
+        for frame, overlays in pipe.run():
+            if not args.headless:
+                with METRICS.time("render"):
+                    image = frame.display_image()
+                    for text, pos, scale, color in overlays:
+                        cv2.putText(image, text, pos, cv2.FONT_HERSHEY_SIMPLEX, scale, color, 2)
+                    st = pipe.stats()
+                    cv2.putText(image, f"FPS cap:{st['capture']['fps']:.0f} infer:{st['inference']['fps']:.0f}",
+                                (20, 25), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (200,200,200), 1)
+                    cv2.imshow("FitBuddy - Live Scoring (q to quit)", image)
+                    key = cv2.waitKey(1) & 0xFF
+                if key == ord('q'):
+                    break
+            # 단계별 FPS/큐 상태를 주기적으로 콘솔에 출력
+            if time.perf_counter() - last_report >= 10.0:
+                print(pipe.report())
+                last_report = time.perf_counter()
+    finally:
+        pipe.stop()
+        elapsed = time.perf_counter() - t_start
+        # 추론 스레드가 끝난 뒤 검출기에 남은 valley를 확정해 마지막 rep도 점수/CSV에 반영
+        for text, _, _, _ in scorer.finish():
+            if not args.headless:
+                print(text)
+        src.close()
+        if not args.headless:
+            cv2.destroyAllWindows()
+
+    processed = pipe.stats()["inference"]["count"]
+    print(f"\n처리한 프레임: {processed} ({elapsed:.2f}s, {processed / max(elapsed, 1e-9):.1f} frames/sec)")
+    print(f"최종 카운트: {scorer.counter.count}  (rep 요약 {scorer.rep_idx}개)")
+    print("\n파이프라인 단계별 FPS / 큐:")
+    print(pipe.report())
+    print("\n단계별 처리 시간:")
+    print(METRICS.report())
 
     if csv_writer is not None:
         f.close()
@@ -0,0 +1,349 @@
+# session_store.py
+# 녹화 세션을 CSV 대신 열(column)별 바이너리 파일로 저장하는 형식
+#   <name>.session/
+#     meta.json     프레임 수, 열별 dtype/shape, 각도 이름, 해상도 등
+#     t.bin         (N,) float64 타임스탬프
+#     frame.bin     (N,) int32 프레임 번호
+#     angles.bin    (N, k) float32 각도 (meta의 angle_names 순서)
+#     kpts.bin      (N, 33, 3) float16/float32 정규화 키포인트 (x, y, visibility)
+#     rep_id.bin    (N,) int32 rep 번호 (rep_segmenter가 추가, -1은 rep 밖)
+# - rep_id처럼 나중에 추가한 파생 열은 세션에 프레임을 이어 쓰면 지워짐 (다시 계산해야 함)
+# - 청크 단위로 이어 쓰기 (meta의 n_frames는 완전히 쓴 프레임까지만 반영 → 중간에 끊겨도 앞부분은 유효)
+# - 읽을 때는 np.memmap이라 큰 세션도 전체를 메모리에 올리지 않음
+# 사용법:
+#   python session_store.py convert data/raw_kpt data/raw_joints   # 기존 CSV → .session
+#   python session_store.py info data/raw_kpt/squat/U000/S1700000000_side.session
+
+import json
+import os
+import time
+from pathlib import Path
+
+import numpy as np
+
+SESSION_SUFFIX = ".session"
+META_FILE = "meta.json"
+FORMAT_VERSION = 1
+N_LANDMARKS = 33
+BASE_COLUMNS = ("t", "frame", "angles", "kpts")  # SessionWriter가 프레임마다 채우는 열
+
+
+def is_session(path):
+    path = Path(path)
+    return path.suffix == SESSION_SUFFIX and (path / META_FILE).exists()
+
+
+def _write_meta(path, meta):
+    tmp = path / (META_FILE + ".tmp")
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(meta, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path / META_FILE)  # 읽는 쪽이 쓰다 만 meta를 보지 않도록 원자적 교체
+
+
+def _read_meta(path):
+    with open(Path(path) / META_FILE, encoding="utf-8") as f:
+        return json.load(f)
+
+
+class SessionWriter:
+    def __init__(self, path, angle_names=("knee", "hip", "torso_tilt"), with_kpts=True, kpt_dtype="float16",
+                 chunk_frames=256, **meta):
+        """
+        세션 쓰기 (이미 있는 세션이면 뒤에 이어 씀)
+
+        Args:
+            path: 세션 디렉터리 (.session)
+            angle_names: angles 열의 각도 이름
+            with_kpts: 키포인트 열 저장 여부 (각도만 기록하는 recoder는 False)
+            kpt_dtype: 'float16' (정규화 좌표에는 충분, 용량 절반) 또는 'float32'
+            chunk_frames: 이만큼 모이면 디스크에 씀
+            **meta: meta.json에 함께 저장할 값 (exercise, w, h 등)
+        """
+        self.path = Path(path)
+        self.chunk_frames = chunk_frames
+        if (self.path / META_FILE).exists():
+            self.meta = _read_meta(self.path)
+            if list(self.meta["angle_names"]) != list(angle_names):
+                raise ValueError(f"{self.path}: angle columns {self.meta['angle_names']} != {list(angle_names)}")
+            self.meta.update(meta)
+            # 파생 열(write_column)은 이어 쓴 프레임 값이 없으므로 무효화 (meta를 먼저 바꾼 뒤 파일 삭제)
+            derived = [name for name in self.meta["columns"] if name not in BASE_COLUMNS]
+            for name in derived:
+                del self.meta["columns"][name]
+        else:
+            derived = []
+            self.path.mkdir(parents=True, exist_ok=True)
+            columns = {
+                "t": {"dtype": "float64", "shape": []},
+                "frame": {"dtype": "int32", "shape": []},
+                "angles": {"dtype": "float32", "shape": [len(angle_names)]},
+            }
+            if with_kpts:
+                columns["kpts"] = {"dtype": str(np.dtype(kpt_dtype)), "shape": [N_LANDMARKS, 3]}
+            self.meta = {"version": FORMAT_VERSION, "created": time.time(), "n_frames": 0,
+                         "angle_names": list(angle_names), "columns": columns, **meta}
+        self.n_frames = self.meta["n_frames"]
+
+        # 청크 버퍼 (열별 미리 할당)
+        self._bufs = {}
+        self._files = {}
+        for name, spec in self.meta["columns"].items():
+            shape = (chunk_frames, *spec["shape"])
+            self._bufs[name] = np.empty(shape, dtype=spec["dtype"])
+            fp = self.path / f"{name}.bin"
+            f = open(fp, "ab")
+            # 이전에 비정상 종료됐으면 meta보다 긴 꼬리를 잘라냄
+            row_bytes = int(np.prod(spec["shape"], dtype=np.int64)) * np.dtype(spec["dtype"]).itemsize
+            if f.tell() != self.n_frames * row_bytes:
+                f.truncate(self.n_frames * row_bytes)
+                f.seek(0, os.SEEK_END)
+            self._files[name] = f
+        self._n = 0
+        self.bytes_written = 0
+        _write_meta(self.path, self.meta)
+        for name in derived:
+            (self.path / f"{name}.bin").unlink(missing_ok=True)
+
+    @property
+    def angle_names(self):
+        return self.meta["angle_names"]
+
+    def append(self, t, frame, angles, kpts=None):
+        """
+        프레임 하나 추가
+
+        Args:
+            angles: angle_names 순서의 시퀀스 또는 {이름: 값} dict (없는 각도는 NaN)
+            kpts: (33, 3) 키포인트 (키포인트 열이 있을 때, None이면 NaN)
+        """
+        i = self._n
+        self._bufs["t"][i] = t
+        self._bufs["frame"][i] = frame
+        if isinstance(angles, dict):
+            row = self._bufs["angles"][i]
+            for j, name in enumerate(self.angle_names):
+                row[j] = angles.get(name, np.nan)
+        else:
+            self._bufs["angles"][i] = angles
+        if "kpts" in self._bufs:
+            self._bufs["kpts"][i] = np.nan if kpts is None else kpts
+        self._n += 1
+        if self._n == self.chunk_frames:
+            self.flush()
+
+    def append_many(self, t, frame, angles, kpts=None):
+        """여러 프레임을 배열로 한 번에 추가 (변환기/오프라인용)"""
+        t = np.asarray(t)
+        cols = {"t": t, "frame": np.asarray(frame), "angles": np.asarray(angles, dtype=np.float32)}
+        if "kpts" in self._bufs:
+            cols["kpts"] = np.full((len(t), N_LANDMARKS, 3), np.nan) if kpts is None else np.asarray(kpts)
+        self.flush()
+        for name, arr in cols.items():
+            data = np.ascontiguousarray(arr, dtype=self._bufs[name].dtype)
+            self._files[name].write(data.tobytes())
+            self.bytes_written += data.nbytes
+        self._commit(len(t))
+
+    def flush(self):
+        """버퍼에 모인 프레임을 디스크에 쓰고 meta 갱신"""
+        n = self._n
+        if n == 0:
+            return
+        for name, buf in self._bufs.items():
+            data = buf[:n]
+            self._files[name].write(data.tobytes())
+            self.bytes_written += data.nbytes
+        self._n = 0
+        self._commit(n)
+
+    def _commit(self, n):
+        for f in self._files.values():
+            f.flush()
+        self.n_frames += n
+        self.meta["n_frames"] = self.n_frames
+        _write_meta(self.path, self.meta)
+
+    def close(self, fsync=True):
+        self.flush()
+        for f in self._files.values():
+            if fsync:
+                os.fsync(f.fileno())
+            f.close()
+        self._files = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class SessionReader:
+    def __init__(self, path):
+        """세션 읽기 (열은 np.memmap, 읽기 전용)"""
+        self.path = Path(path)
+        self.meta = _read_meta(self.path)
+        self.n_frames = self.meta["n_frames"]
+        self.angle_names = list(self.meta["angle_names"])
+        self._cols = {}
+
+    def __len__(self):
+        return self.n_frames
+
+    def has(self, name):
+        return name in self.meta["columns"]
+
+    def column(self, name):
+        if name not in self._cols:
+            spec = self.meta["columns"][name]
+            shape = (self.n_frames, *spec["shape"])
+            if self.n_frames == 0:
+                self._cols[name] = np.empty(shape, dtype=spec["dtype"])
+            else:
+                self._cols[name] = np.memmap(self.path / f"{name}.bin", dtype=spec["dtype"], mode="r", shape=shape)
+        return self._cols[name]
+
+    @property
+    def t(self):
+        return self.column("t")
+
+    @property
+    def frame(self):
+        return self.column("frame")
+
+    @property
+    def angles(self):
+        return self.column("angles")
+
+    @property
+    def kpts(self):
+        return self.column("kpts") if self.has("kpts") else None
+
+    def angle(self, name):
+        """각도 한 열 (N,)"""
+        return self.angles[:, self.angle_names.index(name)]
+
+    def to_frame(self):
+        """기존 raw_kpt CSV와 같은 모양의 DataFrame (t, frame, 각도들, rep_id)"""
+        import pandas as pd
+        data = {"t": np.asarray(self.t), "frame": np.asarray(self.frame)}
+        angles = np.asarray(self.angles, dtype=float)
+        for j, name in enumerate(self.angle_names):
+            data[name] = angles[:, j]
+        if self.has("rep_id"):
+            data["rep_id"] = np.asarray(self.column("rep_id"))
+        return pd.DataFrame(data)
+
+
+def write_column(path, name, values, dtype=None):
+    """세션에 프레임별 열 하나를 통째로 쓰거나 교체 (예: rep_segmenter의 rep_id)"""
+    path = Path(path)
+    meta = _read_meta(path)
+    values = np.asarray(values, dtype=dtype)
+    if len(values) != meta["n_frames"]:
+        raise ValueError(f"{path}: column '{name}' has {len(values)} rows, session has {meta['n_frames']}")
+    tmp = path / f"{name}.bin.tmp"
+    with open(tmp, "wb") as f:
+        f.write(np.ascontiguousarray(values).tobytes())
+    os.replace(tmp, path / f"{name}.bin")
+    meta["columns"][name] = {"dtype": str(values.dtype), "shape": list(values.shape[1:])}
+    _write_meta(path, meta)
+
+
+def load_frames(path):
+    """CSV 또는 세션 → DataFrame (rep_segmenter / features_agg 공용 입력)"""
+    if is_session(path):
+        return SessionReader(path).to_frame()
+    import pandas as pd
+    return pd.read_csv(path)
+
+
+# ---- 기존 CSV 변환 ----
+# save_joint_coords.py (data/raw_joints) 각도 컬럼 → 세션 각도 이름
+_JOINT_CSV_ANGLES = {"knee_angle": "knee", "hip_angle": "hip", "torso_tilt": "torso_tilt"}
+
+
+def convert_csv(csv_path, out_path=None, kpt_dtype="float16", chunksize=20000, w=None, h=None):
+    """
+    raw_kpt(recoder.py) 또는 raw_joints(save_joint_coords.py) CSV를 세션으로 변환
+
+    Returns:
+        생성된 세션 경로
+    """
+    import pandas as pd
+    from frame_source import POSE_LANDMARK_NAMES
+
+    csv_path = Path(csv_path)
+    out_path = Path(out_path) if out_path else csv_path.with_suffix(SESSION_SUFFIX)
+    header = pd.read_csv(csv_path, nrows=0).columns.tolist()
+    kpt_cols = [f"{n}_{c}" for n in POSE_LANDMARK_NAMES for c in ("x", "y", "visibility")]
+    joints = all(c in header for c in kpt_cols)
+
+    if joints:
+        t_col, f_col = "timestamp", "frame_idx"
+        angle_cols = [c for c in _JOINT_CSV_ANGLES if c in header]
+        angle_names = [_JOINT_CSV_ANGLES[c] for c in angle_cols]
+    else:
+        t_col, f_col = "t", "frame"
+        angle_cols = [c for c in header if c not in ("t", "frame", "rep_id")]
+        angle_names = angle_cols
+
+    meta = {"source": csv_path.name}
+    if w and h:
+        meta.update(w=w, h=h)
+    # SessionWriter는 열리면서 기존 세션의 파생 열(rep_id 등)을 지우므로 열기 전에 거부
+    if (out_path / META_FILE).exists():
+        raise FileExistsError(f"{out_path} already exists")
+    rep_ids = []
+    with SessionWriter(out_path, angle_names=angle_names, with_kpts=joints, kpt_dtype=kpt_dtype, **meta) as wr:
+        for chunk in pd.read_csv(csv_path, chunksize=chunksize):
+            n = len(chunk)
+            t = chunk[t_col].to_numpy(dtype=float) if t_col in chunk else np.arange(n, dtype=float)
+            fr = chunk[f_col].to_numpy() if f_col in chunk else np.arange(wr.n_frames, wr.n_frames + n)
+            kpts = chunk[kpt_cols].to_numpy(dtype=float).reshape(n, N_LANDMARKS, 3) if joints else None
+            wr.append_many(t, fr, chunk[angle_cols].to_numpy(dtype=float), kpts)
+            if "rep_id" in chunk:
+                rep_ids.append(chunk["rep_id"].to_numpy(dtype=np.int32))
+    if rep_ids:
+        write_column(out_path, "rep_id", np.concatenate(rep_ids))
+    return out_path
+
+
+def _iter_csvs(paths):
+    # *_seg.csv는 변환하지 않음: 세그멘터가 원본 세션에 rep_id 열을 직접 추가하므로 변환하면 rep가 중복 집계됨
+    for p in map(Path, paths):
+        if p.is_dir():
+            yield from (q for q in sorted(p.rglob("*.csv")) if not q.stem.endswith("_seg"))
+        elif p.suffix == ".csv" and not p.stem.endswith("_seg"):
+            yield p
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Columnar session store")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+    c = sub.add_parser("convert", help="Convert raw_kpt / raw_joints CSV files (or directories) to sessions")
+    c.add_argument("paths", nargs="+")
+    c.add_argument("--dtype", default="float16", choices=["float16", "float32"], help="Keypoint dtype")
+    c.add_argument("--overwrite", action="store_true")
+    i = sub.add_parser("info", help="Print session metadata")
+    i.add_argument("path")
+    args = ap.parse_args()
+
+    if args.cmd == "convert":
+        import shutil
+        for csv_path in _iter_csvs(args.paths):
+            out = csv_path.with_suffix(SESSION_SUFFIX)
+            if out.exists():
+                if not args.overwrite:
+                    print(f"skip (exists): {out}")
+                    continue
+                shutil.rmtree(out)
+            t0 = time.perf_counter()
+            convert_csv(csv_path, out, kpt_dtype=args.dtype)
+            size = sum(f.stat().st_size for f in out.iterdir())
+            print(f"{csv_path} -> {out} ({csv_path.stat().st_size / 1e6:.2f} MB -> {size / 1e6:.2f} MB, "
+                  f"{time.perf_counter() - t0:.2f}s)")
+    else:
+        r = SessionReader(args.path)
+        print(json.dumps(r.meta, ensure_ascii=False, indent=1))
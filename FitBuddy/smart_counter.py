@@ -1,61 +1,93 @@
 # smart_counter.py
 # 모델 기반 스마트 카운터 - 정자세일 때만 카운트
 import numpy as np
-import joblib
 from pathlib import Path
 from config import MODELS
+from model_registry import MODEL_REGISTRY
+from posture_lut import lut_path_for
+from counter import RepCounter  # 운동별 스펙(config.REP_SPECS)으로 rep 경계 감지
+from config import REP_SPECS
 
 class SmartSquatCounter:
-    def __init__(self, exercise="squat", model_path=None, down_knee_thresh=95, up_knee_thresh=160, min_depth_frames=3, min_good_prob=0.5):
+    def __init__(self, exercise="squat", model_path=None, down_knee_thresh=None, up_knee_thresh=None, min_depth_frames=None, min_good_prob=0.5, use_lut=True):
         """
         모델 기반 스마트 카운터
         
         Args:
             exercise: 운동 이름
             model_path: 모델 파일 경로 (None이면 자동으로 찾음)
-            down_knee_thresh: 하강 임계값 (무릎 각도)
-            up_knee_thresh: 상승 임계값 (무릎 각도)
-            min_depth_frames: 최소 깊이 유지 프레임 수
+            down_knee_thresh: 하강 임계값 (None이면 REP_SPECS 값, 스펙이 없는 운동은 스쿼트 기준)
+            up_knee_thresh: 상승 임계값 (None이면 REP_SPECS 값)
+            min_depth_frames: 최소 깊이 유지 프레임 수 (None이면 REP_SPECS 값)
             min_good_prob: 정자세로 인정할 최소 확률 (0~1)
+            use_lut: 모델 옆에 룩업 테이블(*_lut.npz)이 있으면 모델 대신 사용
         """
-        self.state = 'up'
+        # rep 경계는 RepCounter 상태머신이 판단하고, 이 클래스는 카운트 증가만 자세로 거름
+        overrides = {k: v for k, v in (("down", down_knee_thresh), ("up", up_knee_thresh),
+                                       ("min_dwell", min_depth_frames)) if v is not None}
+        self.counter = RepCounter.from_spec(exercise if exercise in REP_SPECS else "squat", **overrides)
         self.count = 0
-        self.depth_frames = 0
-        self.down_knee_thresh = down_knee_thresh
-        self.up_knee_thresh = up_knee_thresh
-        self.min_depth_frames = min_depth_frames
         self.min_good_prob = min_good_prob
         
-        # 모델 로드
-        self.model = None
+        # 모델 로드 (프로세스 전역 레지스트리에서 공유, 파일이 바뀌면 자동으로 다시 로드)
+        self.model_path = None
         if model_path is None:
             model_path = MODELS / f"{exercise}_from_images.pkl"
         
-        if Path(model_path).exists():
+        lut_path = lut_path_for(model_path)
+        if use_lut and lut_path.exists() and (
+                not Path(model_path).exists() or lut_path.stat().st_mtime >= Path(model_path).stat().st_mtime):
+            # 모델보다 오래된 테이블은 재학습 전 것이므로 쓰지 않음
             try:
-                self.model = joblib.load(model_path)
-                print(f"Loaded model from {model_path}")
+                MODEL_REGISTRY.load(lut_path)
+                self.model_path = lut_path
+                print(f"Loaded posture lookup table from {lut_path}")
             except Exception as e:
-                print(f"Warning: Could not load model: {e}")
+                print(f"Warning: Could not load lookup table: {e}")
+        if self.model_path is None:
+            if Path(model_path).exists():
+                try:
+                    # 트리 앙상블은 노드 배열로 컴파일된 것을 받음 (프레임마다 호출해도 가벼움)
+                    MODEL_REGISTRY.load(model_path)
+                    self.model_path = model_path
+                    print(f"Loaded model from {model_path}")
+                except Exception as e:
+                    print(f"Warning: Could not load model: {e}")
+                    print("Falling back to rule-based counter")
+            else:
+                print(f"Warning: Model not found at {model_path}")
                 print("Falling back to rule-based counter")
-        else:
-            print(f"Warning: Model not found at {model_path}")
-            print("Falling back to rule-based counter")
+
+    @property
+    def state(self):
+        return self.counter.state
+
+    @property
+    def model(self):
+        if self.model_path is None:
+            return None
+        return MODEL_REGISTRY.load(self.model_path)
     
     def predict_posture(self, knee, hip, tilt):
         """현재 자세가 정자세인지 예측"""
-        if self.model is None:
-            # 모델이 없으면 규칙 기반으로 판단
-            return 1.0  # 항상 정자세로 간주 (기본 카운터 동작)
-        
         try:
+            # 레지스트리가 처음 로드/다시 로드하다 실패해도 규칙 기반으로 계속 동작
+            model = self.model
+            if model is None:
+                # 모델이 없으면 규칙 기반으로 판단
+                return 1.0  # 항상 정자세로 간주 (기본 카운터 동작)
+
+            if hasattr(model, "prob_good"):
+                # 룩업 테이블: 배열을 만들지 않고 바로 보간
+                return model.prob_good(knee, hip, tilt)
+
             # 모델에 맞는 피처 형식으로 변환
             X = np.array([[knee, hip, tilt]], dtype=float)
             
-            if hasattr(self.model, "predict_proba"):
-                prob_good = self.model.predict_proba(X)[0, 1]  # 정자세 확률
+            if hasattr(model, "predict_proba"):
+                prob_good = model.predict_proba(X)[0, 1]  # 정자세 확률
             else:
-                pred = self.model.predict(X)[0]
+                pred = model.predict(X)[0]
                 prob_good = float(pred)
             
             return float(prob_good)
@@ -68,7 +100,7 @@ class SmartSquatCounter:
         카운터 업데이트
         
         Args:
-            knee: 무릎 각도
+            knee: 기준 각도 (스쿼트는 무릎, 그 외 운동은 REP_SPECS의 angle)
             hip: 고관절 각도 (선택, 모델 사용 시 필요)
             tilt: 상체 기울기 (선택, 모델 사용 시 필요)
         
@@ -78,24 +110,15 @@ class SmartSquatCounter:
         is_good_posture = True
         
         # 모델이 있으면 자세 평가
-        if self.model is not None and hip is not None and tilt is not None:
+        if self.model_path is not None and hip is not None and tilt is not None:
             prob_good = self.predict_posture(knee, hip, tilt)
             is_good_posture = prob_good >= self.min_good_prob
         
-        if self.state == 'up':
-            if knee < self.down_knee_thresh:
-                self.depth_frames += 1
-                if self.depth_frames >= self.min_depth_frames:
-                    self.state = 'down'
-            else:
-                self.depth_frames = 0
-        elif self.state == 'down':
-            if knee > self.up_knee_thresh:
-                # 정자세일 때만 카운트
-                if is_good_posture:
-                    self.count += 1
-                self.state = 'up'
-                self.depth_frames = 0
+        prev = self.counter.count
+        self.counter.update(knee)
+        # rep이 끝난 프레임이 정자세일 때만 카운트
+        if self.counter.count > prev and is_good_posture:
+            self.count += 1
         
         return self.count, self.state, is_good_posture
 
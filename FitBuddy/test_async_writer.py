@@ -0,0 +1,87 @@
+# test_async_writer.py
+# async_writer.BufferedSink 쓰기 실패 경로 테스트 (쓰기 스레드가 죽어도 put/flush/close가 멈추지 않고 예외를 올림)
+# 사용법:
+#   python -m pytest -q test_async_writer.py
+
+import threading
+
+from async_writer import BufferedSink
+
+
+def _failing_sink(**kwargs):
+    """release가 설정될 때까지 첫 배치를 붙잡고 있다가 실패하는 싱크"""
+    started = threading.Event()
+    release = threading.Event()
+
+    def write_batch(batch):
+        started.set()
+        release.wait(5.0)
+        raise OSError("disk full")
+
+    sink = BufferedSink(write_batch, flush_size=1, flush_interval=0.01, **kwargs)
+    return sink, started, release
+
+
+def _run(fn, timeout=5.0):
+    """fn을 별도 스레드에서 실행하고 (끝났는지, 발생한 예외) 반환"""
+    result = {}
+
+    def target():
+        try:
+            fn()
+        except BaseException as e:
+            result["error"] = e
+
+    t = threading.Thread(target=target, daemon=True)
+    t.start()
+    t.join(timeout)
+    return not t.is_alive(), result.get("error")
+
+
+def test_put_raises_after_writer_failure_with_full_queue():
+    sink, started, release = _failing_sink(maxsize=2)
+    sink.put(0)
+    assert started.wait(1.0)
+    # 쓰기 스레드가 붙잡혀 있는 동안 큐를 채워 put이 기다리게 만든 뒤 실패시킴
+    threading.Timer(0.3, release.set).start()
+
+    def fill():
+        for i in range(1, 100):
+            sink.put(i)
+
+    finished, error = _run(fill)
+    assert finished, "put() hung after the writer thread died"
+    assert isinstance(error, OSError)
+
+
+def test_flush_raises_after_writer_failure():
+    sink, started, release = _failing_sink(maxsize=100)
+    sink.put(1)
+    assert started.wait(1.0)
+    threading.Timer(0.3, release.set).start()
+    finished, error = _run(sink.flush)
+    assert finished, "flush() hung after the writer thread died"
+    assert isinstance(error, (OSError, RuntimeError))
+
+
+def test_close_raises_after_writer_failure_with_full_queue():
+    sink, started, release = _failing_sink(maxsize=2)
+    sink.put(0)
+    assert started.wait(1.0)
+    sink.put(1)
+    sink.put(2)  # 큐가 가득 찬 상태
+    threading.Timer(0.3, release.set).start()
+    finished, error = _run(sink.close)
+    assert finished, "close() hung after the writer thread died"
+    assert isinstance(error, OSError)
+
+
+def test_items_written_in_order():
+    out = []
+    sink = BufferedSink(out.extend, flush_size=4, flush_interval=0.01)
+    for i in range(50):
+        sink.put(i)
+    sink.flush(timeout=5.0)
+    assert out == list(range(50))
+    sink.close()
+    assert sink.stats()["items_written"] == 50
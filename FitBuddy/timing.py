@@ -0,0 +1,146 @@
+# timing.py
+# 단계별 처리 시간 측정 (히스토그램) 및 Prometheus 텍스트 출력
+# 사용법:
+#   with METRICS.time("pose"):           # 같은 프로세스에서 바로 기록
+#       pose.process(frame)
+#
+#   timer = StageTimer()                 # 워커 프로세스에서 모아서 반환 → 메인에서 METRICS.record(timer)
+#   with timer.stage("imdecode"):
+#       ...
+
+import bisect
+import threading
+import time
+from contextlib import contextmanager
+
+# 히스토그램 버킷 상한 (초)
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+
+class Histogram:
+    def __init__(self, buckets=DEFAULT_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)  # 마지막 칸은 +Inf
+        self.total = 0.0
+        self.count = 0
+        self.max = 0.0
+
+    def observe(self, seconds):
+        self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+        self.total += seconds
+        self.count += 1
+        if seconds > self.max:
+            self.max = seconds
+
+    def quantile(self, q):
+        """버킷 경계 기준 근사 분위수 (초)"""
+        if self.count == 0:
+            return 0.0
+        target = q * self.count
+        acc = 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= target:
+                return min(self.buckets[i], self.max) if i < len(self.buckets) else self.max
+        return self.max
+
+
+class StageTimer:
+    """단계별 시간을 로컬에 모아 두는 기록기 (pickle 가능, 워커 → 메인 전달용)"""
+    def __init__(self):
+        self.samples = []  # [(stage, seconds), ...]
+
+    def add(self, stage, seconds):
+        self.samples.append((stage, seconds))
+
+    @contextmanager
+    def stage(self, name):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.samples.append((name, time.perf_counter() - t0))
+
+
+class MetricsRegistry:
+    def __init__(self, prefix="fitbuddy", buckets=DEFAULT_BUCKETS):
+        self.prefix = prefix
+        self.buckets = buckets
+        self._hists = {}
+        self._gauges = {}
+        self._lock = threading.Lock()
+
+    def observe(self, stage, seconds):
+        with self._lock:
+            hist = self._hists.get(stage)
+            if hist is None:
+                hist = self._hists[stage] = Histogram(self.buckets)
+            hist.observe(seconds)
+
+    def record(self, timer):
+        """StageTimer에 모인 샘플을 한꺼번에 반영"""
+        for stage, seconds in timer.samples:
+            self.observe(stage, seconds)
+
+    def set_gauge(self, name, value):
+        with self._lock:
+            self._gauges[name] = float(value)
+
+    @contextmanager
+    def time(self, stage):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(stage, time.perf_counter() - t0)
+
+    def reset(self):
+        with self._lock:
+            self._hists.clear()
+            self._gauges.clear()
+
+    def summary(self):
+        """단계별 요약 {stage: {count, avg_ms, p50_ms, p99_ms, max_ms}}"""
+        with self._lock:
+            return {
+                stage: {
+                    "count": h.count,
+                    "avg_ms": (h.total / h.count * 1000.0) if h.count else 0.0,
+                    "p50_ms": h.quantile(0.50) * 1000.0,
+                    "p99_ms": h.quantile(0.99) * 1000.0,
+                    "max_ms": h.max * 1000.0,
+                }
+                for stage, h in self._hists.items()
+            }
+
+    def report(self):
+        """콘솔 출력용 표 문자열"""
+        lines = [f"{'stage':<16} {'count':>8} {'avg_ms':>9} {'p50_ms':>9} {'p99_ms':>9} {'max_ms':>9}"]
+        for stage, s in self.summary().items():
+            lines.append(f"{stage:<16} {s['count']:>8} {s['avg_ms']:>9.2f} {s['p50_ms']:>9.2f} "
+                         f"{s['p99_ms']:>9.2f} {s['max_ms']:>9.2f}")
+        return "\n".join(lines)
+
+    def render_prometheus(self):
+        """Prometheus text exposition format"""
+        name = f"{self.prefix}_stage_seconds"
+        out = [f"# HELP {name} Processing time per pipeline stage.",
+               f"# TYPE {name} histogram"]
+        with self._lock:
+            for stage, h in sorted(self._hists.items()):
+                acc = 0
+                for le, c in zip(h.buckets, h.counts):
+                    acc += c
+                    out.append(f'{name}_bucket{{stage="{stage}",le="{le}"}} {acc}')
+                out.append(f'{name}_bucket{{stage="{stage}",le="+Inf"}} {h.count}')
+                out.append(f'{name}_sum{{stage="{stage}"}} {h.total:.9f}')
+                out.append(f'{name}_count{{stage="{stage}"}} {h.count}')
+            for gname, value in sorted(self._gauges.items()):
+                full = f"{self.prefix}_{gname}"
+                out.append(f"# TYPE {full} gauge")
+                out.append(f"{full} {value}")
+        return "\n".join(out) + "\n"
+
+
+# 프로세스 전역 레지스트리
+METRICS = MetricsRegistry()
@@ -0,0 +1,345 @@
+# train_all.py
+# config.EXERCISES 전체를 한 번에 학습하는 드라이버
+# - (운동, 모델 종류)마다 프로세스 하나, 각 프로세스 안에서 교차 검증 하이퍼파라미터 탐색 (코어를 나눠 씀)
+# - 후보마다 1행/배치 추론 지연을 측정 (sklearn 그대로, CompiledForest 컴파일 후)
+# - 지연 상한(--budget_ms, 실시간 경로와 같은 컴파일 모델 1행 기준) 안에서 CV 점수가 가장 높은 후보를 저장
+#   상한을 넘지 않는 후보가 없으면 가장 빠른 후보를 저장하고 경고
+# - 모델 옆에 <모델>.meta.json (피처, 파라미터, 지표, 학습 시간, 데이터 해시, 후보별 지연 표)
+# - 데이터 파일이 없거나 클래스가 하나뿐이거나 층화 분할에 샘플이 모자란 운동은 건너뜀
+# 모델 파일 이름은 model_registry.MODEL_FILES를 따르므로 실행 중인 서버/카운터가 바로 다시 로드함
+# 사용법:
+#   python train_all.py                                   # 전체 운동, rf + from_images
+#   python train_all.py --exercise squat lunge --kind from_images --budget_ms 0.5
+#   python train_all.py --dry_run                          # 저장 없이 후보 표만 출력
+
+import hashlib
+import json
+import math
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import joblib
+import numpy as np
+import pandas as pd
+from sklearn.ensemble import ExtraTreesClassifier, RandomForestClassifier
+from sklearn.metrics import accuracy_score, f1_score, roc_auc_score
+from sklearn.model_selection import GridSearchCV, ParameterGrid, StratifiedKFold, train_test_split
+
+from config import EXERCISES, LABELED, REPS, MODELS, MODEL_LATENCY_BUDGET_MS, TRAIN_WORKERS
+from compiled_forest import CompiledForest, compile_model
+from model_registry import MODEL_FILES
+from train_baseline import FEATURES as REP_FEATURES, load_reps
+from train_from_images import FEATURES as ANGLE_FEATURES
+
+# 모델 종류 → (데이터 경로, 피처) (종류 이름은 model_registry.MODEL_FILES와 같음)
+DATASETS = {
+    "rf": (lambda ex: REPS / f"{ex}_reps.csv", REP_FEATURES),
+    "from_images": (lambda ex: LABELED / f"{ex}_labeled.csv", ANGLE_FEATURES),
+}
+
+# 탐색 공간 (모델 클래스, 파라미터 그리드)
+SEARCH_SPACE = [
+    (RandomForestClassifier, {"n_estimators": [50, 100, 200], "max_depth": [6, 10, None], "min_samples_leaf": [1, 3]}),
+    (ExtraTreesClassifier, {"n_estimators": [100, 200], "max_depth": [10, None], "min_samples_leaf": [1, 3]}),
+]
+
+SCORING = "f1_macro"
+CV_FOLDS = 5
+TEST_SIZE = 0.2       # 보류 테스트 비율 (클래스 비율 유지)
+BATCH_ROWS = 256      # 배치 지연 측정에 쓰는 행 수
+BENCH_SECONDS = 0.05  # 측정 항목당 최소 반복 시간
+
+
+def data_hash(path):
+    """학습 데이터 파일 내용 해시 (모델이 어떤 데이터로 학습됐는지 추적)"""
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()[:16]
+
+
+def load_dataset(exercise, kind):
+    """
+    Returns:
+        (X DataFrame, y Series, 데이터 경로) 또는 건너뛸 이유 문자열
+    """
+    path_fn, features = DATASETS[kind]
+    path = path_fn(exercise)
+    if not path.exists():
+        return f"no data ({path.name})"
+    if kind == "rf":
+        X, y = load_reps(path)
+    else:
+        df = pd.read_csv(path)
+        missing = [c for c in [*features, "label"] if c not in df.columns]
+        if missing:
+            return f"missing columns {missing}"
+        X, y = df[features].fillna(0), df["label"].astype(int)
+    if y.nunique() < 2:
+        return "need both good and bad samples"
+    if y.value_counts().min() < 2:
+        return "need at least 2 samples per class"
+    # train_test_split(stratify=y)는 테스트 셋에 클래스마다 1개 이상이 필요 (ceil(TEST_SIZE * n) >= 클래스 수)
+    n_test, n_classes = math.ceil(TEST_SIZE * len(y)), y.nunique()
+    if n_test < n_classes:
+        return f"too few samples for a stratified split ({len(y)} rows -> {n_test} test, {n_classes} classes)"
+    return X, y, path
+
+
+def bench_ms(fn, X):
+    """fn(X) 한 번 호출 지연 (ms, 여러 번 반복한 중앙값)"""
+    fn(X)  # 워밍업
+    times = []
+    end = time.perf_counter() + BENCH_SECONDS
+    while len(times) < 5 or (time.perf_counter() < end and len(times) < 1000):
+        t0 = time.perf_counter()
+        fn(X)
+        times.append(time.perf_counter() - t0)
+    return float(np.median(times)) * 1000.0
+
+
+def latency(model, X):
+    """sklearn 모델과 컴파일 모델의 1행/배치 predict_proba 지연 (ms)"""
+    rng = np.random.default_rng(0)
+    row = X[:1]
+    batch = X[rng.integers(0, len(X), BATCH_ROWS)]
+    compiled = compile_model(model)
+    out = {
+        "sklearn_row_ms": bench_ms(model.predict_proba, row),
+        "sklearn_batch_ms": bench_ms(model.predict_proba, batch),
+    }
+    if isinstance(compiled, CompiledForest):
+        out["compiled_row_ms"] = bench_ms(compiled.predict_proba, row)
+        out["compiled_batch_ms"] = bench_ms(compiled.predict_proba, batch)
+    # 실시간 경로(model_registry)가 실제로 쓰는 쪽
+    out["live_row_ms"] = out.get("compiled_row_ms", out["sklearn_row_ms"])
+    out["batch_rows"] = BATCH_ROWS
+    return out
+
+
+def metrics(model, X, y):
+    prob = model.predict_proba(X)[:, 1]
+    pred = model.classes_[(prob >= 0.5).astype(int)]
+    out = {"accuracy": float(accuracy_score(y, pred)), "f1_macro": float(f1_score(y, pred, average="macro"))}
+    if len(np.unique(y)) > 1:
+        out["roc_auc"] = float(roc_auc_score(y, prob))
+    return out
+
+
+def search(Xtr, ytr, folds, n_jobs=1):
+    """
+    모델 클래스별 GridSearchCV (후보 × 폴드를 n_jobs로 병렬)
+
+    Returns:
+        [(모델 클래스, params, cv_mean, cv_std)] (폴드가 2개 미만이면 CV 점수 없이 nan)
+    """
+    out = []
+    for cls, grid in SEARCH_SPACE:
+        if folds < 2:
+            out += [(cls, p, float("nan"), float("nan")) for p in ParameterGrid(grid)]
+            continue
+        gs = GridSearchCV(cls(random_state=42), grid, scoring=SCORING, n_jobs=n_jobs, refit=False,
+                          cv=StratifiedKFold(folds, shuffle=True, random_state=42))
+        gs.fit(Xtr, ytr)
+        res = gs.cv_results_
+        out += [(cls, p, float(m), float(sd))
+                for p, m, sd in zip(res["params"], res["mean_test_score"], res["std_test_score"])]
+    return out
+
+
+def train_one(exercise, kind, n_jobs=1, budget_ms=MODEL_LATENCY_BUDGET_MS, save=True):
+    """
+    운동 하나, 모델 종류 하나 학습
+
+    Args:
+        n_jobs: 교차 검증에 쓸 작업 수
+        budget_ms: 컴파일 모델 1행 추론 지연 상한
+        save: False면 후보 표만 만들고 저장하지 않음
+
+    Returns:
+        결과 dict (skipped면 이유만)
+    """
+    loaded = load_dataset(exercise, kind)
+    if isinstance(loaded, str):
+        return {"exercise": exercise, "kind": kind, "skipped": loaded}
+    X, y, path = loaded
+    features = list(X.columns)
+    # 실시간 경로와 같은 ndarray 입력으로 학습/측정 (피처 이름 경고 방지)
+    X, y = X.to_numpy(dtype=float), y.to_numpy()
+    Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=TEST_SIZE, random_state=42, stratify=y)
+    min_train = int(np.unique(ytr, return_counts=True)[1].min())
+    if min_train < 2:
+        return {"exercise": exercise, "kind": kind,
+                "skipped": f"need at least 2 samples per class in the train split (got {min_train})"}
+    folds = min(CV_FOLDS, min_train)
+    t_start = time.perf_counter()
+
+    rows = []
+    for cls, params, cv_mean, cv_std in search(Xtr, ytr, folds, n_jobs=n_jobs):
+        est = cls(random_state=42, n_jobs=n_jobs, **params)
+        t0 = time.perf_counter()
+        est.fit(Xtr, ytr)
+        fit_seconds = time.perf_counter() - t0
+        # 추론은 실시간 경로처럼 단일 스레드로 측정/저장
+        est.set_params(n_jobs=None)
+        rows.append({
+            "model": cls.__name__,
+            "params": params,
+            "cv_mean": cv_mean,
+            "cv_std": cv_std,
+            "fit_seconds": fit_seconds,
+            "test": metrics(est, Xte, yte),
+            "latency": latency(est, Xte),
+            "estimator": est,
+        })
+
+    # CV 점수가 없으면(샘플 부족) 테스트 F1로 비교
+    score = (lambda r: r["test"]["f1_macro"]) if folds < 2 else (lambda r: r["cv_mean"])
+    fits = [r for r in rows if r["latency"]["live_row_ms"] <= budget_ms]
+    if fits:
+        best = max(fits, key=lambda r: (score(r), -r["latency"]["live_row_ms"]))
+        within_budget = True
+    else:
+        best = min(rows, key=lambda r: r["latency"]["live_row_ms"])
+        within_budget = False
+    train_seconds = time.perf_counter() - t_start
+
+    model_path = MODELS / MODEL_FILES[kind].format(exercise=exercise)
+    meta = {
+        "exercise": exercise,
+        "kind": kind,
+        "model": best["model"],
+        "params": best["params"],
+        "features": features,
+        "data": str(path),
+        "data_hash": data_hash(path),
+        "n_samples": int(len(y)),
+        "class_counts": {str(c): int(n) for c, n in zip(*np.unique(y, return_counts=True))},
+        "scoring": SCORING,
+        "cv_folds": folds,
+        "cv_mean": best["cv_mean"],
+        "cv_std": best["cv_std"],
+        "test": best["test"],
+        "latency": best["latency"],
+        "budget_ms": budget_ms,
+        "within_budget": within_budget,
+        "train_seconds": train_seconds,
+        "trained_at": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "candidates": [{k: v for k, v in r.items() if k != "estimator"} for r in rows],
+    }
+    if save:
+        MODELS.mkdir(parents=True, exist_ok=True)
+        # 메타데이터 먼저, 모델은 임시 파일에 쓴 뒤 교체 (레지스트리가 쓰다 만 파일을 읽지 않도록)
+        meta_path = model_path.with_suffix(".meta.json")
+        tmp = meta_path.with_suffix(".tmp")
+        tmp.write_text(json.dumps(meta, indent=1), encoding="utf-8")
+        os.replace(tmp, meta_path)
+        tmp = model_path.with_suffix(".tmp")
+        joblib.dump(best["estimator"], tmp)
+        os.replace(tmp, model_path)
+        meta["model_path"] = str(model_path)
+    return meta
+
+
+def _train_job(job):
+    exercise, kind, n_jobs, budget_ms, save = job
+    try:
+        return train_one(exercise, kind, n_jobs=n_jobs, budget_ms=budget_ms, save=save)
+    except Exception as e:  # 한 운동이 실패해도 나머지는 계속
+        return {"exercise": exercise, "kind": kind, "error": f"{type(e).__name__}: {e}"}
+
+
+def train_all(exercises=None, kinds=None, workers=None, budget_ms=MODEL_LATENCY_BUDGET_MS, save=True):
+    """
+    여러 운동/모델 종류를 병렬 학습
+
+    Args:
+        exercises: 운동 목록 (None이면 config.EXERCISES 전체)
+        kinds: 모델 종류 목록 (None이면 DATASETS 전체)
+        workers: 전체 코어 수 (None이면 config.TRAIN_WORKERS)
+
+    Returns:
+        작업별 결과 dict 리스트
+    """
+    exercises = list(EXERCISES) if exercises is None else exercises
+    kinds = list(DATASETS) if kinds is None else kinds
+    workers = TRAIN_WORKERS if workers is None else workers
+
+    # 데이터가 있는 작업만 프로세스에 보냄
+    results, jobs = [], []
+    for ex in exercises:
+        for kind in kinds:
+            path = DATASETS[kind][0](ex)
+            if path.exists():
+                jobs.append((ex, kind))
+            else:
+                results.append({"exercise": ex, "kind": kind, "skipped": f"no data ({path.name})"})
+    if not jobs:
+        return results
+
+    # 코어를 (동시에 도는 작업 수) × (작업 안의 교차 검증 작업 수)로 나눔
+    outer = max(1, min(workers, len(jobs)))
+    inner = max(1, workers // outer)
+    args = [(ex, kind, inner, budget_ms, save) for ex, kind in jobs]
+    print(f"training {len(jobs)} models: {outer} processes x {inner} CV jobs")
+    if outer > 1:
+        with ProcessPoolExecutor(max_workers=outer) as pool:
+            results += list(pool.map(_train_job, args))
+    else:
+        results += [_train_job(a) for a in args]
+    return results
+
+
+def print_report(results, top=5):
+    """작업별 선택 모델 + 후보 표 (CV 점수 순, 상위 top개)"""
+    no_data = [f"{r['exercise']}/{r['kind']}" for r in results if r.get("skipped", "").startswith("no data")]
+    if no_data:
+        print(f"- no data: {', '.join(no_data)}")
+    for r in results:
+        name = f"{r['exercise']}/{r['kind']}"
+        if r.get("skipped", "").startswith("no data"):
+            continue
+        if "skipped" in r:
+            print(f"- {name}: skipped ({r['skipped']})")
+            continue
+        if "error" in r:
+            print(f"- {name}: FAILED ({r['error']})")
+            continue
+        lat = r["latency"]
+        flag = "" if r["within_budget"] else f"  WARNING: no candidate within {r['budget_ms']} ms, saved the fastest"
+        print(f"\n- {name}: {r['model']} {r['params']} (n={r['n_samples']}, {r['train_seconds']:.1f}s){flag}")
+        print(f"  cv {r['scoring']} {r['cv_mean']:.3f}±{r['cv_std']:.3f}, test f1 {r['test']['f1_macro']:.3f}, "
+              f"live row {lat['live_row_ms']:.3f} ms, data {r['data_hash']}")
+        print(f"  {'model':<24} {'params':<52} {'cv':>6} {'test':>6} {'row ms':>8} {'cmp ms':>8} "
+              f"{'batch ms':>9} {'cmp batch':>9}")
+        ranked = sorted(r["candidates"], key=lambda c: -np.nan_to_num(c["cv_mean"], nan=-1.0))
+        for c in ranked[:top]:
+            cl = c["latency"]
+            params = ", ".join(f"{k}={v}" for k, v in c["params"].items())
+            print(f"  {c['model']:<24} {params:<52} {c['cv_mean']:>6.3f} {c['test']['f1_macro']:>6.3f} "
+                  f"{cl['sklearn_row_ms']:>8.3f} {cl.get('compiled_row_ms', float('nan')):>8.3f} "
+                  f"{cl['sklearn_batch_ms']:>9.3f} {cl.get('compiled_batch_ms', float('nan')):>9.3f}")
+        if "model_path" in r:
+            print(f"  saved: {r['model_path']}")
+
+
+if __name__ == "__main__":
+    import argparse
+    ap = argparse.ArgumentParser(description="Train every exercise with cross-validated search and latency report")
+    ap.add_argument("--exercise", nargs="+", default=None, help="Exercises to train (default: all in config.EXERCISES)")
+    ap.add_argument("--kind", nargs="+", choices=list(DATASETS), default=None, help="Model kinds (default: all)")
+    ap.add_argument("--workers", type=int, default=None, help="Total cores to use (default: config.TRAIN_WORKERS)")
+    ap.add_argument("--budget_ms", type=float, default=MODEL_LATENCY_BUDGET_MS,
+                    help="Max single-row inference latency of the compiled model (ms)")
+    ap.add_argument("--top", type=int, default=5, help="Candidates to show per model")
+    ap.add_argument("--dry_run", action="store_true", help="Report candidates without saving models")
+    args = ap.parse_args()
+
+    t0 = time.perf_counter()
+    results = train_all(args.exercise, args.kind, workers=args.workers, budget_ms=args.budget_ms,
+                        save=not args.dry_run)
+    print_report(results, top=args.top)
+    trained = sum("latency" in r for r in results)
+    print(f"\n{trained} trained, {len(results) - trained} skipped/failed in {time.perf_counter() - t0:.1f}s")
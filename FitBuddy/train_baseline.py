@@ -7,11 +7,18 @@ import joblib
 from pathlib import Path
 from config import REPS, MODELS
 
-def train(exercise):
-    df = pd.read_csv(REPS / f"{exercise}_reps.csv")
+FEATURES = ["knee_min","knee_rom","hip_min","tilt_max","duration"]
+
+def load_reps(path):
+    """rep 요약 CSV → (X, y)"""
+    df = pd.read_csv(path)
     # 임시 라벨: 깊이 충족을 good으로 (나중에 수동 라벨로 교체)
     y = (df["pct_deep"] >= 0.5).astype(int)
-    X = df[["knee_min","knee_rom","hip_min","tilt_max","duration"]].fillna(0)
+    X = df[FEATURES].fillna(0)
+    return X, y
+
+def train(exercise):
+    X, y = load_reps(REPS / f"{exercise}_reps.csv")
     # stratify는 클래스가 2개 이상일 때만 사용 가능
     if len(y.unique()) > 1:
         Xtr,Xte,ytr,yte = train_test_split(X,y,test_size=0.2,random_state=42,stratify=y)
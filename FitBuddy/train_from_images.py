@@ -2,6 +2,7 @@
 # 정자세/오자세 라벨링된 이미지에서 추출한 피처로 모델 학습
 # 사용법:
 #   python train_from_images.py --exercise squat
+#   python train_from_images.py --exercise squat --augment 5   # 학습 분할만 이미지당 5개 증강 (landmark_cache 사용)
 
 import pandas as pd
 from sklearn.model_selection import train_test_split
@@ -11,8 +12,17 @@ import joblib
 from pathlib import Path
 from config import LABELED, MODELS
 
-def train_from_labeled_images(exercise):
-    """라벨링된 이미지에서 추출한 피처로 모델 학습"""
+# 피처 선택 (각도 기반)
+FEATURES = ['knee', 'hip', 'torso_tilt']
+
+def train_from_labeled_images(exercise, lut_step=None, augment=0):
+    """
+    라벨링된 이미지에서 추출한 피처로 모델 학습
+
+    Args:
+        lut_step: 있으면 실시간 채점용 룩업 테이블도 내보냄
+        augment: 0보다 크면 학습 분할의 이미지마다 증강 변형을 이만큼 추가 (테스트 분할은 원본만)
+    """
     csv_path = LABELED / f"{exercise}_labeled.csv"
     
     if not csv_path.exists():
@@ -26,8 +36,7 @@ def train_from_labeled_images(exercise):
         print("Error: 'label' column not found in CSV")
         return
     
-    # 피처 선택 (각도 기반)
-    feature_cols = ['knee', 'hip', 'torso_tilt']
+    feature_cols = FEATURES
     missing_cols = [col for col in feature_cols if col not in df.columns]
     if missing_cols:
         print(f"Error: Missing columns: {missing_cols}")
@@ -53,6 +62,17 @@ def train_from_labeled_images(exercise):
     else:
         Xtr, Xte, ytr, yte = train_test_split(X, y, test_size=0.2, random_state=42)
     
+    # 랜드마크 증강 (포즈 추정 없이 캐시된 랜드마크에서 각도 재계산, 평가 누수 방지를 위해 학습 분할만)
+    if augment > 0:
+        if 'image_path' not in df.columns:
+            print("Warning: 'image_path' column not found, skipping augmentation")
+        else:
+            from augment import augmented_features
+            aug = augmented_features(df.loc[Xtr.index, 'image_path'], ytr.values, n=augment, seed=42)
+            Xtr = pd.concat([Xtr, aug[feature_cols].fillna(0)], ignore_index=True)
+            ytr = pd.concat([ytr, aug['label']], ignore_index=True)
+            print(f"  Augmented training set: +{len(aug)} samples ({len(Xtr)} total)")
+    
     # 모델 학습
     clf = RandomForestClassifier(n_estimators=200, random_state=42, max_depth=10)
     clf.fit(Xtr, ytr)
@@ -75,10 +95,21 @@ def train_from_labeled_images(exercise):
     for col, imp in zip(feature_cols, clf.feature_importances_):
         print(f"  {col}: {imp:.4f}")
 
+    # 실시간 채점용 각도 룩업 테이블
+    if lut_step:
+        from posture_lut import export_lut, lut_path_for
+        lut_path = lut_path_for(model_path)
+        report = export_lut(clf, lut_path, step=lut_step)
+        print(f"\nLUT saved to: {lut_path} (max error off grid: {report['offgrid_max_err']:.4f})")
+
 if __name__ == "__main__":
     import argparse
     ap = argparse.ArgumentParser()
     ap.add_argument("--exercise", required=True, help="Exercise name (e.g., squat)")
+    ap.add_argument("--lut", type=float, default=None, metavar="STEP",
+                    help="Also export an angle lookup table with this grid step (degrees)")
+    ap.add_argument("--augment", type=int, default=0, metavar="N",
+                    help="Add N keypoint-space augmented variants per training image (uses the landmark cache)")
     args = ap.parse_args()
-    train_from_labeled_images(args.exercise)
+    train_from_labeled_images(args.exercise, lut_step=args.lut, augment=args.augment)
 
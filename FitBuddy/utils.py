@@ -18,3 +18,105 @@ class RingBuffer:
         self.buf.append(x)
     def mean(self):
         return float(np.mean(self.buf)) if self.buf else np.nan
+
+class FilterBank:
+    """
+    여러 신호(각도 k개, 또는 랜드마크 33x3 전체)를 미리 할당한 NumPy 배열로 한 번에 스무딩
+
+    method:
+        'ema'        : 지수 이동 평균
+        'window'     : 최근 window개 평균 (누적합으로 O(1) 갱신)
+        'ema_window' : EMA 후 window 평균 (기존 EMA → RingBuffer 조합과 동일)
+        'one_euro'   : One-Euro 필터 (느릴 땐 강하게, 빠를 땐 약하게 스무딩)
+    """
+    def __init__(self, shape, method='ema_window', alpha=0.25, window=5,
+                 freq=30.0, min_cutoff=1.0, beta=0.007, d_cutoff=1.0):
+        self.shape = (shape,) if isinstance(shape, int) else tuple(shape)
+        self.method = method
+        self.alpha = alpha
+        self.window = window
+        self.freq = freq
+        self.min_cutoff = min_cutoff
+        self.beta = beta
+        self.d_cutoff = d_cutoff
+
+        self._ema = np.zeros(self.shape)
+        self._buf = np.zeros((window,) + self.shape)
+        self._sum = np.zeros(self.shape)
+        self._dx = np.zeros(self.shape)
+        self._out = np.zeros(self.shape)
+        self._seen = np.zeros(self.shape, dtype=bool)  # 유한값이 한 번이라도 들어온 원소
+        self.reset()
+
+    def reset(self):
+        """세션 시작 시 상태 초기화 (배열은 재사용)"""
+        self._n = 0          # 지금까지 들어온 프레임 수
+        self._pos = 0        # 윈도 버퍼의 다음 쓰기 위치
+        self._count = 0      # 윈도 버퍼에 찬 개수
+        self._t_prev = None
+        self._sum.fill(0.0)
+        self._dx.fill(0.0)
+        self._seen.fill(False)
+
+    @staticmethod
+    def _smoothing(te, cutoff):
+        return 1.0 / (1.0 + 1.0 / (2 * np.pi * cutoff * te))
+
+    def _push_window(self, x):
+        # 빠지는 값을 빼고 들어오는 값을 더해 평균을 O(1)로 유지
+        if self._count == self.window:
+            self._sum -= self._buf[self._pos]
+        else:
+            self._count += 1
+        self._buf[self._pos] = x
+        self._sum += x
+        self._pos = (self._pos + 1) % self.window
+        if self._pos == 0:
+            # 부동소수점 오차가 쌓이지 않도록 한 바퀴마다 다시 합산
+            np.sum(self._buf[:self._count], axis=0, out=self._sum)
+        return self._sum / self._count
+
+    def __call__(self, x, t=None):
+        """
+        새 관측값으로 필터 갱신
+
+        Args:
+            x: shape과 같은 배열 (NaN인 원소는 직전 출력값을 유지, 아직 유한값이 없던 원소는 NaN 출력)
+            t: 타임스탬프 (초, one_euro에서만 사용, None이면 1/freq 간격으로 간주)
+
+        Returns:
+            스무딩된 배열 (내부 버퍼이므로 보관하려면 copy)
+        """
+        x = np.asarray(x, dtype=float)
+        missing = np.isnan(x)
+        if missing.any():
+            # 아직 시작 안 된 원소는 0을 넣어 두고 첫 유한값이 들어올 때 상태를 다시 시드
+            x = np.where(missing, np.where(self._seen, self._out, 0.0), x)
+        # 처음 유한값이 들어온 원소는 그 값으로 상태를 시드 (앞쪽 NaN이 상태를 오염시키지 않도록)
+        fresh = ~self._seen & ~missing
+        if fresh.any():
+            np.copyto(self._ema, x, where=fresh)
+            np.copyto(self._dx, 0.0, where=fresh)
+            np.copyto(self._buf, x, where=fresh)
+            np.copyto(self._sum, x * self._count, where=fresh)
+            self._seen |= fresh
+        self._n += 1
+
+        if self.method == 'window':
+            self._out[...] = self._push_window(x)
+        elif self.method == 'one_euro':
+            # 시드된 원소는 _ema == x, _dx == 0이라 갱신해도 값이 그대로
+            te = (t - self._t_prev) if (t is not None and self._t_prev is not None) else 1.0 / self.freq
+            te = max(te, 1e-6)
+            dx = (x - self._ema) / te
+            self._dx += self._smoothing(te, self.d_cutoff) * (dx - self._dx)
+            a = self._smoothing(te, self.min_cutoff + self.beta * np.abs(self._dx))
+            self._ema += a * (x - self._ema)
+            self._t_prev = t
+            self._out[...] = self._ema
+        else:
+            self._ema[...] = self.alpha * x + (1 - self.alpha) * self._ema
+            self._out[...] = self._push_window(self._ema) if self.method == 'ema_window' else self._ema
+        if not self._seen.all():
+            np.copyto(self._out, np.nan, where=~self._seen)
+        return self._out